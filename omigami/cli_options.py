@@ -52,6 +52,53 @@ local_run = click.option(
     help="Flag that triggers in memory run of the training flow",
     show_default=True,
 )
+incremental = click.option(
+    "--incremental",
+    is_flag=True,
+    help="Flag that only cleans the spectra that were added or modified since the "
+    "previous incremental run, and reuses the cleaned spectra of that run for the "
+    "rest",
+    show_default=True,
+)
+
+response_cache_size = click.option(
+    "--response-cache-size",
+    type=int,
+    default=0,
+    show_default=True,
+    help="Number of prediction responses the registered model keeps in each "
+    "process. 0 disables the cache",
+)
+response_cache_ttl = click.option(
+    "--response-cache-ttl",
+    type=int,
+    default=None,
+    required=False,
+    help="Seconds the prediction responses of the registered model are shared "
+    "through Redis. If not given, they are not written to Redis",
+)
+chunk_format = click.option(
+    "--chunk-format",
+    type=click.Choice(["json", "jsonl"]),
+    default="json",
+    show_default=True,
+    help="Format of the raw chunks, a json list of spectra or one json spectrum per "
+    "line",
+)
+chunk_all_ion_modes = click.option(
+    "--chunk-all-ion-modes",
+    is_flag=True,
+    help="Flag that also chunks the spectra of the other ion mode while reading the "
+    "dataset, so that its training flow finds them already chunked",
+    show_default=True,
+)
+cleaning_processes = click.option(
+    "--cleaning-processes",
+    type=int,
+    default=1,
+    show_default=True,
+    help="Number of processes that clean the spectra of each chunk",
+)
 
 common_training_options = [
     dataset_id,
@@ -59,4 +106,10 @@ common_training_options = [
     dataset_directory,
     schedule,
     local_run,
+    incremental,
+    chunk_format,
+    chunk_all_ion_modes,
+    cleaning_processes,
+    response_cache_size,
+    response_cache_ttl,
 ]
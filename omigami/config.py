@@ -52,6 +52,14 @@ SPECTRUM_ID_PRECURSOR_MZ_SORTED_SET = config["storage"]["redis"][
     "spectrum_id_sorted_set"
 ].get(str)
 SPECTRUM_HASHES = config["storage"]["redis"]["spectrum_hashes"].get(str)
+SPECTRUM_METADATA_HASHES = config["storage"]["redis"]["spectrum_metadata_hashes"].get(
+    str
+)
+EMBEDDING_GENERATION = config["storage"]["redis"]["embedding_generation"].get(str)
+RESPONSE_CACHE = config["storage"]["redis"]["response_cache"].get(str)
+BINARY_EMBEDDING_PROJECTS = config["storage"]["redis"]["binary_embedding_projects"].get(
+    list
+)
 
 # URIs for downloading GNPS files
 GNPS_URIS = {
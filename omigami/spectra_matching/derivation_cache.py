@@ -0,0 +1,102 @@
+import pickle
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from omigami.spectra_matching.storage import FSDataGateway
+
+DERIVATION_CACHE_FILE = "structure_derivation_cache.pickle"
+
+# inchi, smiles and inchikey of a spectrum
+Structure = Tuple[Optional[str], Optional[str], Optional[str]]
+
+
+def new_entries_directory(path: str, namespace: str) -> str:
+    """Directory where the structures derived while cleaning each chunk are saved,
+    until they are merged into the cache saved at `path`. Each `namespace` has a
+    directory of its own, so that the flows sharing the cache only merge the
+    structures they derived themselves."""
+    return f"{path}.new/{namespace}"
+
+
+class DerivationCache:
+    """Least recently used cache of the structures derived with RDKit from the
+    structure of a spectrum. It maps the harmonized inchi, smiles and inchikey of a
+    spectrum to the ones derived from them, so that the compounds that GNPS repeats
+    across spectra and across runs are converted only once.
+
+    Parameters
+    ----------
+    max_size:
+        Number of structures kept. The least recently used ones are dropped first.
+    """
+
+    def __init__(self, max_size: int = 200000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[Structure, Structure] = OrderedDict()
+        self._new_entries: Dict[Structure, Structure] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+    def get(self, structure: Structure) -> Optional[Structure]:
+        derived = self._entries.get(structure)
+        if derived is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(structure)
+        return derived
+
+    def put(self, structure: Structure, derived: Structure):
+        self._new_entries[structure] = derived
+        self._add(structure, derived)
+
+    def _add(self, structure: Structure, derived: Structure):
+        self._entries[structure] = derived
+        self._entries.move_to_end(structure)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def pop_new_entries(self) -> Dict[Structure, Structure]:
+        """Returns the entries put since the last call, so that the entries derived
+        in another process can be merged back."""
+        new_entries, self._new_entries = self._new_entries, {}
+        return new_entries
+
+    def merge(self, entries: Dict[Structure, Structure], hits: int, misses: int):
+        for structure, derived in entries.items():
+            self._new_entries[structure] = derived
+            self._add(structure, derived)
+        self.hits += hits
+        self.misses += misses
+
+    @classmethod
+    def load(
+        cls, fs_dgw: FSDataGateway, path: str, max_size: int = 200000
+    ) -> "DerivationCache":
+        """Loads the cache saved at `path`, or starts an empty one if there is none
+        or it cannot be read."""
+        cache = cls(max_size)
+        if not fs_dgw.exists(path):
+            return cache
+
+        try:
+            entries = fs_dgw.read_from_file(path)
+        except (EOFError, pickle.UnpicklingError):
+            return cache
+
+        for structure, derived in entries:
+            cache._add(structure, derived)
+        return cache
+
+    def save(self, fs_dgw: FSDataGateway, path: str):
+        """Saves the entries from the least to the most recently used."""
+        fs_dgw.serialize_to_file(path, list(self._entries.items()))
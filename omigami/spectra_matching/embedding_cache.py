@@ -0,0 +1,103 @@
+import ast
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from omigami.spectra_matching.entities.embedding import Embedding
+
+
+def query_key(data: Dict, run_id: Optional[str]) -> Optional[str]:
+    """Key of the embedding of an input spectrum of a prediction: a hash of its
+    peaks sorted by m/z, its precursor m/z, its spectrum id and the run id of the
+    model. Returns None if the peaks or the precursor m/z can't be read, so that the
+    input is not cached.
+    """
+    try:
+        peaks = data["peaks_json"]
+        if isinstance(peaks, str):
+            peaks = ast.literal_eval(peaks)
+        peaks = np.asarray(peaks, dtype=np.float64).reshape(-1, 2)
+        peaks = peaks[np.lexsort((peaks[:, 1], peaks[:, 0]))]
+        precursor_mz = float(data["Precursor_MZ"])
+    except (KeyError, TypeError, ValueError, SyntaxError):
+        return None
+
+    key = hashlib.blake2b(digest_size=16)
+    key.update(np.ascontiguousarray(peaks).tobytes())
+    key.update(repr((precursor_mz, data.get("spectrum_id"), run_id)).encode())
+    return key.hexdigest()
+
+
+class EmbeddingCache:
+    """Thread-safe least recently used cache of the embeddings of the input spectra
+    of predictions, so that the spectra that clients submit again are not parsed,
+    cleaned and embedded again.
+
+    Parameters
+    ----------
+    max_size:
+        Number of embeddings kept. The least recently used ones are dropped first.
+    max_bytes:
+        Number of bytes of the vectors kept. The least recently used ones are dropped
+        first.
+    """
+
+    def __init__(self, max_size: int = 10000, max_bytes: int = 2 ** 26):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.n_bytes = 0
+        self._entries: Dict[str, Tuple[Embedding, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getstate__(self):
+        # the predictors are pickled with their cache, which starts empty when loaded
+        state = self.__dict__.copy()
+        state.update(hits=0, misses=0, n_bytes=0, _entries=OrderedDict())
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+    def get(self, key: Optional[str]) -> Optional[Embedding]:
+        with self._lock:
+            entry = self._entries.get(key) if key is not None else None
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Optional[str], embedding: Embedding):
+        n_bytes = np.asarray(embedding.vector).nbytes + len(key or "")
+        if key is None or n_bytes > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.n_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (embedding, n_bytes)
+            self.n_bytes += n_bytes
+            while len(self._entries) > self.max_size or self.n_bytes > self.max_bytes:
+                self.n_bytes -= self._entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.n_bytes = 0
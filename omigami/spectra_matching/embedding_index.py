@@ -0,0 +1,196 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from omigami.spectra_matching.entities.embedding import EmbeddingMatrix
+from omigami.spectra_matching.top_k_scorer import (
+    TopKResult,
+    select_top_k,
+    empty_top_k,
+)
+from omigami.spectra_matching.util import normalize_vectors
+
+EMBEDDING_INDEX_FILE = "embedding_index.pkl"
+
+
+class EmbeddingIndex:
+    """Approximate nearest neighbour index over the embeddings of a spectra library.
+
+    It is an inverted file index: the normalized embeddings are clustered with
+    spherical k-means and stored contiguously per cluster. A query is only scored
+    against the embeddings of the `n_probe` clusters whose centroids are the most
+    similar to it, instead of against the whole library.
+
+    Parameters
+    ----------
+    centroids:
+        Unit length centroid of each cluster, one per row.
+    list_offsets:
+        Row where the embeddings of each cluster start. The last element is the
+        number of embeddings.
+    vectors:
+        Normalized embedding vectors, sorted by cluster.
+    spectrum_ids, precursor_mz:
+        Spectrum ID and precursor m/z of each row of `vectors`.
+    generation:
+        Generation of the embeddings the index was built from. The index is stale
+        once the embeddings of the ion mode are rewritten with another generation.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        list_offsets: np.ndarray,
+        vectors: np.ndarray,
+        spectrum_ids: List[str],
+        precursor_mz: np.ndarray,
+        generation: Optional[int] = None,
+    ):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.vectors = vectors
+        self.spectrum_ids = spectrum_ids
+        self.precursor_mz = precursor_mz
+        self.generation = generation
+
+    def __len__(self) -> int:
+        return len(self.spectrum_ids)
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: EmbeddingMatrix,
+        n_lists: Optional[int] = None,
+        n_iterations: int = 10,
+        seed: int = 0,
+        generation: Optional[int] = None,
+    ) -> "EmbeddingIndex":
+        """Clusters the embeddings into `n_lists` clusters, the square root of the
+        number of embeddings by default, and builds the index over them.
+        """
+        vectors = embeddings.vectors
+        if not embeddings.normalized:
+            vectors = normalize_vectors(vectors)
+        if len(vectors) == 0:
+            return cls(
+                centroids=vectors,
+                list_offsets=np.zeros(1, dtype=np.int64),
+                vectors=vectors,
+                spectrum_ids=[],
+                precursor_mz=embeddings.precursor_mz,
+                generation=generation,
+            )
+        n_lists = min(n_lists or max(1, int(np.sqrt(len(vectors)))), len(vectors))
+
+        # zero vectors have undefined scores and are clustered as the origin
+        points = np.nan_to_num(vectors)
+        rng = np.random.default_rng(seed)
+        centroids = points[rng.choice(len(points), n_lists, replace=False)]
+        for _ in range(n_iterations):
+            assignments = cls._assign(points, centroids)
+            centroids = cls._update_centroids(points, assignments, centroids)
+        assignments = cls._assign(points, centroids)
+
+        rows = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=n_lists)
+        return cls(
+            centroids=centroids,
+            list_offsets=np.concatenate([[0], np.cumsum(counts)]),
+            vectors=np.ascontiguousarray(vectors[rows]),
+            spectrum_ids=[embeddings.spectrum_ids[row] for row in rows],
+            precursor_mz=embeddings.precursor_mz[rows],
+            generation=generation,
+        )
+
+    @staticmethod
+    def _assign(
+        points: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536
+    ) -> np.ndarray:
+        return np.concatenate(
+            [
+                np.argmax(points[start : start + chunk_size] @ centroids.T, axis=1)
+                for start in range(0, len(points), chunk_size)
+            ]
+        )
+
+    @staticmethod
+    def _update_centroids(
+        points: np.ndarray, assignments: np.ndarray, centroids: np.ndarray
+    ) -> np.ndarray:
+        """Moves each centroid to the normalized mean of its points. Centroids of
+        empty clusters stay where they are."""
+        counts = np.bincount(assignments, minlength=len(centroids))
+        non_empty = counts > 0
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums = np.add.reduceat(
+            points[np.argsort(assignments, kind="stable")], starts[non_empty]
+        )
+
+        centroids = centroids.copy()
+        centroids[non_empty] = np.nan_to_num(normalize_vectors(sums))
+        return centroids
+
+    def search(
+        self,
+        queries: np.ndarray,
+        n_best: int,
+        n_probe: int = 8,
+        min_mz: Optional[Sequence[float]] = None,
+        max_mz: Optional[Sequence[float]] = None,
+    ) -> List[TopKResult]:
+        """Returns, for each query, the rows of the `n_best` highest scoring
+        embeddings among the `n_probe` closest clusters and their scores, sorted from
+        the highest score. Rows refer to `spectrum_ids`.
+
+        If `min_mz` and `max_mz` are given, the candidates of each query are filtered
+        to the ones whose precursor m/z is within its own range.
+        """
+        if n_best < 1 or len(self) == 0:
+            return [empty_top_k() for _ in range(len(queries))]
+
+        queries = normalize_vectors(queries)
+        n_probe = min(n_probe, self.n_lists)
+        probes = np.argpartition(
+            -np.nan_to_num(queries @ self.centroids.T), n_probe - 1, axis=1
+        )[:, :n_probe]
+
+        results = []
+        for i, query in enumerate(queries):
+            candidates = np.concatenate(
+                [
+                    np.arange(self.list_offsets[probe], self.list_offsets[probe + 1])
+                    for probe in probes[i]
+                ]
+            )
+            if min_mz is not None and max_mz is not None:
+                mz = self.precursor_mz[candidates]
+                candidates = candidates[(mz >= min_mz[i]) & (mz <= max_mz[i])]
+            if len(candidates) == 0:
+                results.append(empty_top_k())
+                continue
+
+            scores = self.vectors[candidates] @ query
+            scores[np.isnan(scores)] = -np.inf
+            columns, best_scores = select_top_k(scores[None, :], n_best)
+            valid = np.isfinite(best_scores[0])
+            results.append((candidates[columns[0][valid]], best_scores[0][valid]))
+        return results
+
+
+def recall(
+    approximate: List[Sequence[str]], exact: List[Sequence[str]]
+) -> Optional[float]:
+    """Fraction of the exact matches of all queries that the approximate search
+    found too. None if there are no exact matches."""
+    n_exact = sum(len(matches) for matches in exact)
+    if n_exact == 0:
+        return None
+    n_found = sum(
+        len(set(approximate_matches) & set(exact_matches))
+        for approximate_matches, exact_matches in zip(approximate, exact)
+    )
+    return n_found / n_exact
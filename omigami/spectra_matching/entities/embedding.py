@@ -1,9 +1,78 @@
 from dataclasses import dataclass
+from typing import List, Sequence
 
 import numpy as np
 
+from omigami.spectra_matching.entities.precursor_mz_index import PrecursorMzIndex
+from omigami.spectra_matching.util import normalize_vectors
+
 
 @dataclass
 class Embedding:
+    """Embedding of a spectrum. `normalized` tells whether its vector has unit
+    length already. Embeddings pickled before they were normalized read it as False.
+    """
+
     vector: np.ndarray
     spectrum_id: str
+    normalized: bool = False
+
+
+@dataclass
+class EmbeddingMatrix(PrecursorMzIndex):
+    """Embeddings of a spectra library held as a single contiguous float32 matrix.
+    Rows are sorted by precursor m/z so a precursor window maps to a row range.
+    `normalized` tells whether every row has unit length already.
+    """
+
+    vectors: np.ndarray
+    normalized: bool = False
+
+    def __post_init__(self):
+        self._rows = {
+            spectrum_id: row for row, spectrum_id in enumerate(self.spectrum_ids)
+        }
+
+    def row(self, spectrum_id: str) -> int:
+        return self._rows[spectrum_id]
+
+    @classmethod
+    def from_embeddings(
+        cls,
+        embeddings: List[Embedding],
+        spectrum_ids: Sequence[str],
+        precursor_mz: Sequence[float],
+    ) -> "EmbeddingMatrix":
+        """Builds the matrix from embedding objects following the order of
+        `spectrum_ids`, which must be sorted by `precursor_mz`. Spectrum ids without an
+        embedding are left out.
+        """
+        embeddings = {embedding.spectrum_id: embedding for embedding in embeddings}
+        rows = [i for i, sp_id in enumerate(spectrum_ids) if sp_id in embeddings]
+        ids = [spectrum_ids[i] for i in rows]
+        normalized = all(embeddings[sp_id].normalized for sp_id in ids)
+
+        dim = np.size(embeddings[ids[0]].vector) if ids else 0
+        vectors = np.empty((len(ids), dim), dtype=np.float32)
+        for row, sp_id in enumerate(ids):
+            vectors[row] = np.ravel(embeddings[sp_id].vector)
+
+        return cls(
+            vectors=vectors,
+            spectrum_ids=ids,
+            precursor_mz=np.asarray(precursor_mz, dtype=np.float64)[rows],
+            normalized=normalized,
+        )
+
+
+def normalize_embeddings(embeddings: List[Embedding]) -> List[Embedding]:
+    """Scales the vector of each embedding to unit length, in place, and flags it as
+    `normalized`, so scoring it only takes a dot product.
+    """
+    for embedding in embeddings:
+        vector = np.asarray(embedding.vector)
+        embedding.vector = normalize_vectors(vector.reshape(1, -1)).reshape(
+            vector.shape
+        )
+        embedding.normalized = True
+    return embeddings
@@ -0,0 +1,35 @@
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+@dataclass
+class PrecursorMzIndex:
+    """Spectrum IDs sorted by their precursor m/z. Precursor windows are answered
+    locally with `searchsorted` and map to contiguous row ranges.
+    """
+
+    spectrum_ids: List[str]
+    precursor_mz: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.spectrum_ids)
+
+    def rows_within_range(self, min_mz: float, max_mz: float) -> Tuple[int, int]:
+        """Returns the `[start, stop)` row range of the spectra whose precursor m/z
+        is within `min_mz` and `max_mz`, both inclusive like Redis' ZRANGEBYSCORE.
+        """
+        start = np.searchsorted(self.precursor_mz, min_mz, side="left")
+        stop = np.searchsorted(self.precursor_mz, max_mz, side="right")
+        return int(start), int(stop)
+
+    def rows_within_ranges(
+        self, min_mz: Sequence[float], max_mz: Sequence[float]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectorized version of `rows_within_range`. Returns the arrays of `start`
+        and `stop` rows for each pair of `min_mz` and `max_mz`.
+        """
+        starts = np.searchsorted(self.precursor_mz, min_mz, side="left")
+        stops = np.searchsorted(self.precursor_mz, max_mz, side="right")
+        return starts, stops
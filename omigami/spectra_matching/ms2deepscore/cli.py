@@ -33,6 +33,21 @@ def ms2deepscore_cli():
     help="Decimals used on tanimoto scores",
     show_default=True,
 )
+@click.option(
+    "--scores-dtype",
+    type=click.Choice(["float16", "uint8"]),
+    default="float16",
+    help="Data type the tanimoto scores are stored with. uint8 quantizes them to "
+    "1/255 steps and halves the size of the matrix",
+    show_default=True,
+)
+@click.option(
+    "--tanimoto-processes",
+    type=int,
+    default=1,
+    help="Number of processes used to calculate the tanimoto scores",
+    show_default=True,
+)
 @click.option(
     "--spectrum-binner-n-bins",
     type=int,
@@ -40,6 +55,13 @@ def ms2deepscore_cli():
     help="Number of bins for the spectrum binner",
     show_default=True,
 )
+@click.option(
+    "--binning-processes",
+    type=int,
+    default=1,
+    help="Number of processes that bin the cleaned chunks",
+    show_default=True,
+)
 @click.option(
     "--spectrum-ids-chunk-size",
     type=int,
@@ -88,6 +110,12 @@ def training_flow_cli(*args, **kwargs):
     required=True,
     help="Model run ID that will be used to deploy",
 )
+@click.option(
+    "--build-embedding-index",
+    is_flag=True,
+    default=False,
+    help="Build an approximate nearest neighbour index over the embeddings",
+)
 @add_click_options(common_flow_options)
 @add_click_options([dataset_id, ion_mode])
 def deploy_model_cli(*args, **kwargs):
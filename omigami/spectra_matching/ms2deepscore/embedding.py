@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import List
 
 import numpy as np
 from ms2deepscore import BinnedSpectrum
@@ -6,27 +7,47 @@ from ms2deepscore.models import SiameseModel
 
 from omigami.spectra_matching.entities.embedding import Embedding
 
-
-class MS2DeepScoreEmbedding:
-    def __init__(self, vector: np.ndarray, spectrum_id: str, inchikey: str):
-        self.vector = vector
-        self.spectrum_id = spectrum_id
-        self.inchikey = inchikey
+# imported here as well, where the embeddings pickled to Redis were defined
+from omigami.spectra_matching.ms2deepscore.entities.embedding import (
+    MS2DeepScoreEmbedding,
+)
+from omigami.spectra_matching.ms2deepscore.helper_classes.spectrum_binner import (
+    create_input_matrix,
+)
 
 
 class EmbeddingMaker:
+    def __init__(self, batch_size: int = 1024):
+        self.batch_size = batch_size
+
     def make_embedding(
         self, model: SiameseModel, binned_spectrum: BinnedSpectrum
     ) -> MS2DeepScoreEmbedding:
-        vector = model.base.predict(
-            self._create_input_vector(binned_spectrum, model.input_dim)
-        )
-
-        return MS2DeepScoreEmbedding(
-            vector=vector,
-            spectrum_id=binned_spectrum.metadata.get("spectrum_id"),
-            inchikey=binned_spectrum.get("inchikey"),
-        )
+        return self.make_embeddings(model, [binned_spectrum])[0]
+
+    def make_embeddings(
+        self, model: SiameseModel, binned_spectra: List[BinnedSpectrum]
+    ) -> List[MS2DeepScoreEmbedding]:
+        """Makes the embeddings of the binned spectra in blocks of `batch_size`. The
+        input matrix of a block is only built when it is its turn, and the model is
+        called once per block instead of once per spectrum.
+        """
+        embeddings = []
+        for start in range(0, len(binned_spectra), self.batch_size):
+            batch = binned_spectra[start : start + self.batch_size]
+            vectors = model.base.predict(
+                create_input_matrix(batch, model.input_dim),
+                batch_size=len(batch),
+            )
+            embeddings.extend(
+                MS2DeepScoreEmbedding(
+                    vector=vectors[i : i + 1],
+                    spectrum_id=binned_spectrum.metadata.get("spectrum_id"),
+                    inchikey=binned_spectrum.get("inchikey"),
+                )
+                for i, binned_spectrum in enumerate(batch)
+            )
+        return embeddings
 
     @staticmethod
     def _create_input_vector(
@@ -37,9 +58,4 @@ class EmbeddingMaker:
         If you refactor this method please also refactor tge same function in
         `omigami/test/ms2deepscore/test_scripts_to_update_assets.py`
         """
-        X = np.zeros((1, input_vector_dim))
-
-        idx = np.array([int(x) for x in binned_spectrum.binned_peaks.keys()])
-        values = np.array(list(binned_spectrum.binned_peaks.values()))
-        X[0, idx] = values
-        return X
+        return create_input_matrix([binned_spectrum], input_vector_dim)
@@ -0,0 +1,18 @@
+import numpy as np
+
+
+class MS2DeepScoreEmbedding:
+    # embeddings pickled before they were normalized have no attribute of their own
+    normalized = False
+
+    def __init__(
+        self,
+        vector: np.ndarray,
+        spectrum_id: str,
+        inchikey: str,
+        normalized: bool = False,
+    ):
+        self.vector = vector
+        self.spectrum_id = spectrum_id
+        self.inchikey = inchikey
+        self.normalized = normalized
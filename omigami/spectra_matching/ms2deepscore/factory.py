@@ -15,6 +15,7 @@ from omigami.config import (
     GNPS_URIS,
 )
 from omigami.flow_config import make_flow_config, PrefectExecutorMethods
+from omigami.spectra_matching.derivation_cache import DERIVATION_CACHE_FILE
 from omigami.spectra_matching.ms2deepscore.config import (
     DIRECTORIES,
     PROJECT_NAME,
@@ -28,12 +29,19 @@ from omigami.spectra_matching.ms2deepscore.flows.training_flow import (
     TrainingFlowParameters,
     build_training_flow,
 )
+from omigami.spectra_matching.ms2deepscore.helper_classes.fingerprint_store import (
+    FINGERPRINTS_FILE,
+)
+from omigami.spectra_matching.ms2deepscore.helper_classes.tanimoto_matrix import (
+    ScoreDtypes,
+)
 from omigami.spectra_matching.ms2deepscore.storage.fs_data_gateway import (
     MS2DeepScoreFSDataGateway,
 )
 from omigami.spectra_matching.ms2deepscore.storage.redis_spectrum_gateway import (
     MS2DeepScoreRedisSpectrumDataGateway,
 )
+from omigami.spectra_matching.tasks import ChunkFormats
 
 
 class MS2DeepScoreFlowFactory:
@@ -78,6 +86,15 @@ class MS2DeepScoreFlowFactory:
         test_ratio: float = 0.05,
         epochs: int = 50,
         chunk_size: int = CHUNK_SIZE,
+        incremental: bool = False,
+        chunk_format: ChunkFormats = "json",
+        chunk_all_ion_modes: bool = False,
+        cleaning_processes: int = 1,
+        binning_processes: int = 1,
+        response_cache_size: int = 0,
+        response_cache_ttl: Optional[int] = None,
+        tanimoto_processes: int = 1,
+        scores_dtype: ScoreDtypes = "float16",
     ) -> Flow:
         """Creates all configuration/gateways objects used by the training flow, and builds
         the training flow with them.
@@ -113,6 +130,9 @@ class MS2DeepScoreFlowFactory:
 
         source_uri = GNPS_URIS[dataset_id]
         dataset_id = self._dataset_ids[dataset_id].format(date=datetime.today())
+        manifest_directory = (
+            str(self._dataset_directory / "manifests") if incremental else None
+        )
         flow_parameters = TrainingFlowParameters(
             fs_dgw=fs_dgw,
             source_uri=source_uri,
@@ -135,6 +155,17 @@ class MS2DeepScoreFlowFactory:
             test_ratio=test_ratio,
             spectrum_ids_chunk_size=spectrum_ids_chunk_size,
             schedule_task_days=schedule,
+            derivation_cache_path=str(self._dataset_directory / DERIVATION_CACHE_FILE),
+            fingerprints_path=str(self._ms2deepscore_root / FINGERPRINTS_FILE),
+            manifest_directory=manifest_directory,
+            chunk_format=chunk_format,
+            chunk_all_ion_modes=chunk_all_ion_modes,
+            cleaning_processes=cleaning_processes,
+            binning_processes=binning_processes,
+            tanimoto_processes=tanimoto_processes,
+            scores_dtype=scores_dtype,
+            response_cache_size=response_cache_size,
+            response_cache_ttl=response_cache_ttl,
         )
 
         ms2deepscore_flow = build_training_flow(
@@ -152,6 +183,7 @@ class MS2DeepScoreFlowFactory:
         dataset_id: str,
         ion_mode: IonModes = "positive",
         project_name: str = PROJECT_NAME,
+        build_embedding_index: bool = False,
     ) -> Flow:
         """Creates all configuration/gateways objects used by the model deployment flow,
         and builds the training flow with them.
@@ -185,6 +217,7 @@ class MS2DeepScoreFlowFactory:
             redis_db=REDIS_DATABASES[dataset_id],
             model_registry_uri=self._model_registry_uri,
             dataset_directory=dataset_directory,
+            build_embedding_index=build_embedding_index,
         )
 
         deploy_model_flow = build_deploy_model_flow(
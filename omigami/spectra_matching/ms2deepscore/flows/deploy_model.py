@@ -18,6 +18,8 @@ from omigami.spectra_matching.tasks import (
     DeployModelParameters,
     DeployModel,
     DeleteEmbeddings,
+    BuildEmbeddingIndex,
+    BuildEmbeddingIndexParameters,
 )
 
 
@@ -31,6 +33,7 @@ class DeployModelFlowParameters:
         redis_db: str = "0",
         model_registry_uri: str = MLFLOW_SERVER,
         spectrum_ids_chunk_size: int = 10000,
+        build_embedding_index: bool = False,
     ):
         self.fs_dgw = fs_dgw
         self.spectrum_dgw = spectrum_dgw
@@ -45,6 +48,11 @@ class DeployModelFlowParameters:
             redis_db, model_name=f"ms2deepscore-{ion_mode}"
         )
         self.cleaned_spectra_directory = f"{dataset_directory}/cleaned/{ion_mode}"
+        self.embedding_index = (
+            BuildEmbeddingIndexParameters(ion_mode, model_registry_uri)
+            if build_embedding_index
+            else None
+        )
 
 
 def build_deploy_model_flow(
@@ -106,7 +114,17 @@ def build_deploy_model_flow(
         )
         make_embeddings.set_dependencies(deploy_model_flow, [delete_embeddings])
 
+        deploy_dependencies = [make_embeddings]
+        if flow_parameters.embedding_index:
+            build_embedding_index = BuildEmbeddingIndex(
+                flow_parameters.spectrum_dgw,
+                flow_parameters.fs_dgw,
+                flow_parameters.embedding_index,
+            )(model_run_id)
+            build_embedding_index.set_dependencies(deploy_model_flow, [make_embeddings])
+            deploy_dependencies.append(build_embedding_index)
+
         deploy_model = DeployModel(flow_parameters.deploying)(model_run_id)
-        deploy_model.set_dependencies(deploy_model_flow, [make_embeddings])
+        deploy_model.set_dependencies(deploy_model_flow, deploy_dependencies)
 
     return deploy_model_flow
@@ -10,6 +10,9 @@ from omigami.flow_config import FlowConfig
 from omigami.spectra_matching.ms2deepscore.helper_classes.siamese_model_trainer import (
     SplitRatio,
 )
+from omigami.spectra_matching.ms2deepscore.helper_classes.tanimoto_matrix import (
+    ScoreDtypes,
+)
 
 from omigami.spectra_matching.ms2deepscore.storage.fs_data_gateway import (
     MS2DeepScoreFSDataGateway,
@@ -28,9 +31,13 @@ from omigami.spectra_matching.tasks import (
     DownloadParameters,
     DownloadData,
     ChunkingParameters,
+    ChunkFormats,
     CreateChunks,
     CleanRawSpectraParameters,
+    ReuseCleanedSpectra,
+    ReuseCleanedSpectraParameters,
     CleanRawSpectra,
+    MergeDerivationCache,
 )
 
 
@@ -59,6 +66,17 @@ class TrainingFlowParameters:
         spectrum_ids_chunk_size: int = 10000,
         schedule_task_days: Optional[int] = 30,
         dataset_name: str = "gnps.json",
+        chunk_format: ChunkFormats = "json",
+        chunk_all_ion_modes: bool = False,
+        cleaning_processes: int = 1,
+        derivation_cache_path: Optional[str] = None,
+        manifest_directory: Optional[str] = None,
+        tanimoto_processes: int = 1,
+        scores_dtype: ScoreDtypes = "float16",
+        fingerprints_path: Optional[str] = None,
+        binning_processes: int = 1,
+        response_cache_size: int = 0,
+        response_cache_ttl: Optional[int] = None,
     ):
         self.fs_dgw = fs_dgw
         self.spectrum_chunk_size = spectrum_ids_chunk_size
@@ -90,15 +108,30 @@ class TrainingFlowParameters:
             output_directory=f"{dataset_directory}/raw/{ion_mode}",
             chunk_size=chunk_size,
             ion_mode=ion_mode,
+            chunk_format=chunk_format,
+            chunk_all_ion_modes=chunk_all_ion_modes,
+            manifest_directory=manifest_directory,
         )
         self.clean_raw_spectra = CleanRawSpectraParameters(
-            output_directory=f"{dataset_directory}/cleaned/{ion_mode}"
+            output_directory=f"{dataset_directory}/cleaned/{ion_mode}",
+            n_processes=cleaning_processes,
+            derivation_cache_path=derivation_cache_path,
+            derivation_namespace=f"{project_name}/{ion_mode}",
         )
+        self.reuse_cleaned_spectra = None
+        if manifest_directory is not None:
+            self.reuse_cleaned_spectra = ReuseCleanedSpectraParameters(
+                raw_directory=self.chunking.output_directory,
+                output_directory=self.clean_raw_spectra.output_directory,
+                manifest_directory=manifest_directory,
+                ion_mode=ion_mode,
+            )
 
         self.process_spectrum = ProcessSpectrumParameters(
             spectrum_binner_output_path,
             binned_spectra_output_path,
             n_bins=spectrum_binner_n_bins,
+            n_processes=binning_processes,
         )
 
         self.calculate_tanimoto_score = CalculateTanimotoScoreParameters(
@@ -106,6 +139,9 @@ class TrainingFlowParameters:
             binned_spectra_output_path,
             fingerprint_n_bits,
             scores_decimals,
+            n_processes=tanimoto_processes,
+            scores_dtype=scores_dtype,
+            fingerprints_path=fingerprints_path,
         )
 
         self.training = TrainModelParameters(
@@ -117,7 +153,12 @@ class TrainingFlowParameters:
         )
 
         self.registering = RegisterModelParameters(
-            project_name, model_registry_uri, mlflow_output_directory, ion_mode
+            project_name,
+            model_registry_uri,
+            mlflow_output_directory,
+            ion_mode,
+            response_cache_size=response_cache_size,
+            response_cache_ttl=response_cache_ttl,
         )
 
 
@@ -161,6 +202,16 @@ def build_training_flow(
             flow_parameters.fs_dgw, flow_parameters.clean_raw_spectra
         ).map(gnps_chunk_paths)
 
+        if flow_parameters.clean_raw_spectra.derivation_cache_path is not None:
+            cleaned_spectra_paths = MergeDerivationCache(
+                flow_parameters.fs_dgw, flow_parameters.clean_raw_spectra
+            )(cleaned_spectra_paths)
+
+        if flow_parameters.reuse_cleaned_spectra is not None:
+            cleaned_spectra_paths = ReuseCleanedSpectra(
+                flow_parameters.fs_dgw, flow_parameters.reuse_cleaned_spectra
+            )(cleaned_spectra_paths)
+
         processed_ids = ProcessSpectrum(
             flow_parameters.fs_dgw,
             flow_parameters.process_spectrum,
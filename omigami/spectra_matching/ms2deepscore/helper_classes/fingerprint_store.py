@@ -0,0 +1,119 @@
+import hashlib
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from omigami.spectra_matching.storage import FSDataGateway
+
+FINGERPRINTS_FILE = "fingerprints.pickle"
+
+# inchikey14, hash of the inchi and number of bits of a fingerprint
+FingerprintKey = Tuple[str, str, int]
+
+
+def fingerprint_key(inchikey: str, inchi: str, n_bits: int) -> FingerprintKey:
+    return inchikey[:14], hashlib.sha1(inchi.encode()).hexdigest(), n_bits
+
+
+def key_to_str(key: FingerprintKey) -> str:
+    return "/".join(str(part) for part in key)
+
+
+class FingerprintStore:
+    """Persistent store of the packed molecular fingerprints of the compounds of
+    previous training runs, so that only the fingerprints of new compounds are
+    derived with RDKit. A fingerprint is keyed by the InChIKey14 and the hash of the
+    InChI it was derived from, and by its number of bits, so that a compound whose
+    most common InChI changed gets a new fingerprint.
+
+    Parameters
+    ----------
+    fingerprints:
+        Packed fingerprint of each key, as a uint64 array
+    """
+
+    def __init__(self, fingerprints: Dict[FingerprintKey, np.ndarray] = None):
+        self.fingerprints = fingerprints or {}
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def get_fingerprints(
+        self,
+        inchis: pd.Series,
+        n_bits: int,
+        derive: Callable[[List[str]], np.ndarray],
+    ) -> Tuple[List[FingerprintKey], np.ndarray, int]:
+        """Packed fingerprints of the InChIs indexed by InChIKey, one row each.
+
+        Parameters
+        ----------
+        inchis:
+            InChI of each compound, indexed by its InChIKey14
+        n_bits:
+            Number of bits of the fingerprints
+        derive:
+            Function that derives the packed fingerprints of a list of InChIs, called
+            with the ones not in the store, which are added to it
+
+        Returns
+        -------
+        The key of each fingerprint, the fingerprints and the number of derived ones
+
+        """
+        keys = [
+            fingerprint_key(inchikey, inchi, n_bits)
+            for inchikey, inchi in inchis.items()
+        ]
+        missing = [
+            (key, inchi)
+            for key, inchi in zip(keys, inchis)
+            if key not in self.fingerprints
+        ]
+        if missing:
+            missing_keys, missing_inchis = zip(*missing)
+            derived = derive(list(missing_inchis))
+            self.fingerprints.update(zip(missing_keys, derived))
+
+        n_words = -(-n_bits // 64)
+        fingerprints = np.zeros((len(keys), n_words), dtype=np.uint64)
+        for row, key in enumerate(keys):
+            fingerprints[row] = self.fingerprints[key]
+        return keys, fingerprints, len(missing)
+
+    @classmethod
+    def load(cls, fs_dgw: FSDataGateway, path: str) -> "FingerprintStore":
+        """Loads the store saved at `path`, or starts an empty one if there is
+        none."""
+        if not fs_dgw.exists(path):
+            return cls()
+
+        stored = fs_dgw.read_from_file(path)
+        return cls(
+            {
+                key: stored["fingerprints"][offset : offset + stored["n_words"][row]]
+                for row, (key, offset) in enumerate(
+                    zip(stored["keys"], stored["offsets"])
+                )
+            }
+        )
+
+    def save(self, fs_dgw: FSDataGateway, path: str):
+        """Saves the fingerprints concatenated in a single array, with the offset
+        and number of words of each."""
+        keys = list(self.fingerprints)
+        n_words = np.array(
+            [len(self.fingerprints[key]) for key in keys], dtype=np.int64
+        )
+        fs_dgw.serialize_to_file(
+            path,
+            {
+                "keys": keys,
+                "offsets": np.cumsum(n_words) - n_words,
+                "n_words": n_words,
+                "fingerprints": np.concatenate([self.fingerprints[key] for key in keys])
+                if keys
+                else np.zeros(0, dtype=np.uint64),
+            },
+        )
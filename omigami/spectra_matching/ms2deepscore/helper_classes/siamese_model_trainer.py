@@ -1,13 +1,24 @@
+from collections import defaultdict
 from dataclasses import dataclass
 from logging import Logger
-from typing import List, Dict
+from typing import Dict, List, Sequence
 
 import numpy as np
-import pandas as pd
 from ms2deepscore import SpectrumBinner, BinnedSpectrum
-from ms2deepscore.data_generators import DataGeneratorAllSpectrums
 from ms2deepscore.models import SiameseModel
 from tensorflow import keras
+from omigami.spectra_matching.ms2deepscore.helper_classes.tanimoto_data_generator import (
+    TanimotoMatrixDataGenerator,
+)
+from omigami.spectra_matching.ms2deepscore.helper_classes.tanimoto_matrix import (
+    TanimotoMatrix,
+    read_tanimoto_matrix,
+)
+from omigami.spectra_matching.ms2deepscore.storage.binned_spectra_store import (
+    BinnedSpectraSequence,
+    binned_spectra_metadata,
+    read_binned_spectra,
+)
 from omigami.spectra_matching.ms2deepscore.storage.fs_data_gateway import (
     MS2DeepScoreFSDataGateway,
 )
@@ -53,9 +64,9 @@ class SiameseModelTrainer:
         spectrum_binner: SpectrumBinner,
         logger: Logger = None,
     ) -> SiameseModel:
-        binned_spectra = self._fs_dgw.read_from_file(self._binned_spectra_path)
+        binned_spectra = read_binned_spectra(self._fs_dgw, self._binned_spectra_path)
 
-        tanimoto_scores = pd.read_pickle(scores_output_path, compression="gzip")
+        tanimoto_scores = read_tanimoto_matrix(self._fs_dgw, scores_output_path)
 
         data_generators = self._train_validation_test_split(
             binned_spectra,
@@ -97,11 +108,11 @@ class SiameseModelTrainer:
 
     def _train_validation_test_split(
         self,
-        binned_spectra: List[BinnedSpectrum],
-        tanimoto_scores: pd.DataFrame,
+        binned_spectra: Sequence[BinnedSpectrum],
+        tanimoto_scores: TanimotoMatrix,
         input_vector_dimension: int,
         **kwargs,
-    ) -> Dict[str, DataGeneratorAllSpectrums]:
+    ) -> Dict[str, TanimotoMatrixDataGenerator]:
 
         np.random.seed(100)
 
@@ -122,17 +133,18 @@ class SiameseModelTrainer:
             "validation": validation_idx,
             "testing": test_idx,
         }
+        spectrum_indexes = self._get_spectrum_indexes_by_inchikey(binned_spectra)
         spectra = {
             key: self._get_binned_spectra_from_inchikey_idx(
-                tanimoto_scores, idx, binned_spectra
+                tanimoto_scores, idx, binned_spectra, spectrum_indexes
             )
             for key, idx in idxs.items()
         }
 
         data_generators = {
-            key: DataGeneratorAllSpectrums(
+            key: TanimotoMatrixDataGenerator(
                 binned_spectrums=spectra_group,
-                reference_scores_df=tanimoto_scores,
+                tanimoto_matrix=tanimoto_scores,
                 dim=input_vector_dimension,
                 **kwargs,
             )
@@ -141,11 +153,27 @@ class SiameseModelTrainer:
 
         return data_generators
 
+    @staticmethod
+    def _get_spectrum_indexes_by_inchikey(
+        binned_spectra: Sequence[BinnedSpectrum],
+    ) -> Dict[str, List[int]]:
+        spectrum_indexes = defaultdict(list)
+        for i, metadata in enumerate(binned_spectra_metadata(binned_spectra)):
+            spectrum_indexes[metadata.get("inchikey")[:14]].append(i)
+        return spectrum_indexes
+
     @staticmethod
     def _get_binned_spectra_from_inchikey_idx(
-        tanimoto_scores: pd.DataFrame,
+        tanimoto_scores: TanimotoMatrix,
         idx: np.array,
-        binned_spectra: List[BinnedSpectrum],
-    ) -> List[BinnedSpectrum]:
-        inchikeys14 = tanimoto_scores.index.to_numpy()[idx]
-        return [s for s in binned_spectra if s.get("inchikey")[:14] in inchikeys14]
+        binned_spectra: Sequence[BinnedSpectrum],
+        spectrum_indexes: Dict[str, List[int]],
+    ) -> Sequence[BinnedSpectrum]:
+        indexes = sorted(
+            i
+            for inchikey_idx in idx
+            for i in spectrum_indexes.get(tanimoto_scores.inchikeys[inchikey_idx], [])
+        )
+        if isinstance(binned_spectra, BinnedSpectraSequence):
+            return binned_spectra.take(indexes)
+        return [binned_spectra[i] for i in indexes]
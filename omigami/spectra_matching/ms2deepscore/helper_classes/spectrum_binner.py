@@ -1,17 +1,137 @@
-from typing import List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
 
+import numpy as np
 from matchms import Spectrum
 from ms2deepscore import BinnedSpectrum, SpectrumBinner
 
+# fitted binner of the process, set by the pool initializer
+_worker_binner: Optional["MS2DeepScoreSpectrumBinner"] = None
+
 
 class MS2DeepScoreSpectrumBinner:
     def __init__(self, n_bins: int = 10000):
         self.spectrum_binner = SpectrumBinner(number_of_bins=n_bins)
 
     def bin_spectra(self, spectra: List[Spectrum]) -> List[BinnedSpectrum]:
-        binned_spectra = self.spectrum_binner.fit_transform(spectra)
+        self.fit(spectra)
+        return self.transform(spectra)
+
+    def fit(self, spectra: Iterable[Spectrum]):
+        """Learns the bins that have peaks in the spectra, which are the ones the
+        binned spectra are made of. The m/z values of all peaks are binned at once,
+        and the occupied bins are found from their histogram. This is the same as
+        `SpectrumBinner.fit_transform` does, without binning each spectrum."""
+        self.fit_chunks([spectra])
+
+    def fit_chunks(self, chunks: Iterable[Iterable[Spectrum]]) -> int:
+        """Like `fit`, but reads the spectra one chunk at a time, so that only the
+        occupied bins of the chunks read so far are kept. Returns the number of
+        spectra."""
+        binner = self.spectrum_binner
+        known_bins = np.zeros(0, dtype=np.int64)
+        n_spectra = 0
+        for chunk in chunks:
+            mz = []
+            for spectrum in chunk:
+                mz.append(spectrum.peaks.mz)
+                n_spectra += 1
+            mz = np.concatenate(mz or [np.zeros(0)])
+            mz = mz[(mz >= binner.mz_min) & (mz <= binner.mz_max)]
+            bins = (mz / binner.d_bins - int(binner.mz_min / binner.d_bins)).astype(int)
+            known_bins = np.union1d(known_bins, bins)
+
+        binner.known_bins = known_bins.tolist()
+        binner.peak_to_position = {
+            bin_number: position
+            for position, bin_number in enumerate(binner.known_bins)
+        }
+        return n_spectra
+
+    def transform(self, spectra: List[Spectrum]) -> List[BinnedSpectrum]:
+        """Bins the spectra with the fitted bins."""
+        binned_spectra = self.spectrum_binner.transform(spectra, progress_bar=False)
 
         for binned_spectrum, spectrum in zip(binned_spectra, spectra):
             binned_spectrum.set("spectrum_id", spectrum.get("spectrum_id"))
             binned_spectrum.set("inchi", spectrum.get("inchi"))
+            set_peak_arrays(binned_spectrum)
         return binned_spectra
+
+    def transform_chunks(
+        self, chunks: Iterable[List[Spectrum]], n_processes: int = 1
+    ) -> Iterator[List[BinnedSpectrum]]:
+        """Yields the binned spectra of each chunk of spectra, in order. With more
+        than one process, the chunks are binned in a process pool, each process
+        with a copy of the fitted binner. The chunks are read as the pool gets to
+        them, so at most one more chunk than there are processes is held at once."""
+        if n_processes <= 1:
+            for chunk in chunks:
+                yield self.transform(chunk)
+            return
+
+        with ProcessPoolExecutor(
+            n_processes, initializer=_init_worker, initargs=(self,)
+        ) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(_transform_chunk, chunk))
+                if len(pending) > n_processes:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+
+def _init_worker(spectrum_binner: MS2DeepScoreSpectrumBinner):
+    global _worker_binner
+    _worker_binner = spectrum_binner
+
+
+def _transform_chunk(spectra: List[Spectrum]) -> List[BinnedSpectrum]:
+    return _worker_binner.transform(spectra)
+
+
+def set_peak_arrays(binned_spectrum: BinnedSpectrum) -> BinnedSpectrum:
+    """Stores the bin indices and weights of the binned peaks of the spectrum as
+    arrays, so they do not have to be read from its dict of binned peaks each time
+    it is turned into an input vector."""
+    binned_spectrum.peak_arrays = _make_peak_arrays(binned_spectrum.binned_peaks)
+    return binned_spectrum
+
+
+def get_peak_arrays(binned_spectrum: BinnedSpectrum) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the bin indices and weights of the binned peaks of the spectrum. They
+    are made from its binned peaks if they were not stored when it was binned."""
+    peak_arrays = getattr(binned_spectrum, "peak_arrays", None)
+    if peak_arrays is None:
+        peak_arrays = _make_peak_arrays(binned_spectrum.binned_peaks)
+    return peak_arrays
+
+
+def _make_peak_arrays(binned_peaks: dict) -> Tuple[np.ndarray, np.ndarray]:
+    n_peaks = len(binned_peaks)
+    bin_indices = np.fromiter(binned_peaks.keys(), np.int64, n_peaks)
+    weights = np.fromiter(binned_peaks.values(), np.float32, n_peaks)
+    return bin_indices, weights
+
+
+def create_input_matrix(
+    binned_spectra: List[BinnedSpectrum], input_vector_dim: int
+) -> np.ndarray:
+    """Creates the float32 input matrix of a siamese model, one row per binned
+    spectrum, filling it with the binned peaks of all spectra at once."""
+    X = np.zeros((len(binned_spectra), input_vector_dim), dtype=np.float32)
+    if not binned_spectra:
+        return X
+
+    peak_arrays = [
+        get_peak_arrays(binned_spectrum) for binned_spectrum in binned_spectra
+    ]
+    rows = np.repeat(
+        np.arange(len(binned_spectra)),
+        [len(bin_indices) for bin_indices, _ in peak_arrays],
+    )
+    columns = np.concatenate([bin_indices for bin_indices, _ in peak_arrays])
+    X[rows, columns] = np.concatenate([weights for _, weights in peak_arrays])
+    return X
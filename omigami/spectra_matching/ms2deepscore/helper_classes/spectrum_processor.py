@@ -2,10 +2,8 @@ from typing import List, Dict, Optional, Union
 
 import numpy as np
 from matchms import Spectrum
-from matchms.filtering import (
-    select_by_mz,
-    normalize_intensities,
-)
+from matchms.filtering import select_by_mz
+from matchms.Spikes import Spikes
 from matchms.importing.load_from_json import as_spectrum
 from matchmsextras.pubchem_lookup import pubchem_metadata_lookup
 
@@ -24,6 +22,11 @@ INCORRECT_LAST_WORDS = [
 ]
 
 
+MZ_FROM = 10.0
+MZ_TO = 1000.0
+MIN_PEAKS = 5
+
+
 class SpectrumProcessor:
     def process_spectra(
         self,
@@ -31,30 +34,113 @@ class SpectrumProcessor:
         process_reference_spectra: bool = True,
         progress_logger: TaskProgressLogger = None,
     ) -> List[Spectrum]:
+        return [
+            spectrum
+            for spectrum in self.process_batch(
+                spectra, process_reference_spectra, progress_logger
+            )
+            if spectrum is not None
+        ]
+
+    def process_batch(
+        self,
+        spectra: Union[List[Dict], List[Spectrum]],
+        process_reference_spectra: bool = True,
+        progress_logger: TaskProgressLogger = None,
+    ) -> List[Optional[Spectrum]]:
+        """Processes a batch of spectra like `process_spectra`, but returns the
+        processed spectrum of each input, or None for the ones that were filtered
+        out.
+
+        The intensities are normalized, the peaks out of the m/z range dropped and
+        the spectra with too few peaks filtered out on the peaks of all spectra
+        concatenated, so that only the spectra that are kept are built.
+        """
+        spectra = [
+            as_spectrum(spectrum) if type(spectrum) == dict else spectrum
+            for spectrum in spectra
+        ]
+        filtered_spectra = iter(
+            self._apply_ms2deepscore_filters_to_batch(
+                [spectrum for spectrum in spectra if spectrum is not None]
+            )
+        )
+
         processed_spectra = []
         for i, spectrum in enumerate(spectra):
-            if type(spectrum) == dict:
-                spectrum = as_spectrum(spectrum)
             if spectrum is not None:
-                spectrum = normalize_intensities(spectrum)
-                spectrum = self._apply_ms2deepscore_filters(spectrum)
+                spectrum = next(filtered_spectra)
                 if process_reference_spectra:
                     spectrum = self._check_inchikey(spectrum)
 
-                if spectrum is not None:
-                    processed_spectra.append(spectrum)
-
                 if progress_logger:
                     progress_logger.log(i)
+            processed_spectra.append(spectrum)
 
         return processed_spectra
 
+    @staticmethod
+    def _apply_ms2deepscore_filters_to_batch(
+        spectra: List[Spectrum],
+    ) -> List[Optional[Spectrum]]:
+        """Normalizes the intensities of the spectra, keeps their peaks with m/z
+        values between 10.0 and 1000.0 Da and removes the spectra with less than 5
+        peaks left, with array operations on the peaks of all spectra at once. The
+        spectra that are kept get a copy of the metadata of the input ones, so that
+        processing them doesn't modify the input spectra."""
+        if not spectra:
+            return []
+
+        n_peaks = np.array([len(spectrum.peaks) for spectrum in spectra])
+        mz = np.concatenate([spectrum.peaks.mz for spectrum in spectra])
+        intensities = np.concatenate(
+            [spectrum.peaks.intensities for spectrum in spectra]
+        )
+        peak_spectra = np.repeat(np.arange(len(spectra)), n_peaks)
+
+        max_intensities = np.zeros(len(spectra), dtype=intensities.dtype)
+        has_peaks = n_peaks > 0
+        if has_peaks.any():
+            max_intensities[has_peaks] = np.maximum.reduceat(
+                intensities, (np.cumsum(n_peaks) - n_peaks)[has_peaks]
+            )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            intensities = intensities / max_intensities[peak_spectra]
+
+        in_range = (mz >= MZ_FROM) & (mz <= MZ_TO)
+        n_kept = np.bincount(peak_spectra[in_range], minlength=len(spectra))
+        n_positive = np.bincount(
+            peak_spectra[in_range & (intensities > 0)], minlength=len(spectra)
+        )
+        split_at = np.cumsum(n_kept)[:-1]
+        spectra_mz = np.split(mz[in_range], split_at)
+        spectra_intensities = np.split(intensities[in_range], split_at)
+
+        filtered_spectra = []
+        for i, spectrum in enumerate(spectra):
+            if n_positive[i] < MIN_PEAKS:
+                filtered_spectra.append(None)
+                continue
+
+            filtered_spectrum = Spectrum(
+                mz=spectra_mz[i],
+                intensities=spectra_intensities[i],
+                metadata=dict(spectrum.metadata),
+            )
+            if spectrum.losses is not None and len(spectrum.losses) > 0:
+                filtered_spectrum.losses = Spikes(
+                    mz=spectrum.losses.mz,
+                    intensities=spectrum.losses.intensities / max_intensities[i],
+                )
+            filtered_spectra.append(filtered_spectrum)
+        return filtered_spectra
+
     def _apply_ms2deepscore_filters(self, spectrum: Spectrum) -> Spectrum:
         """Remove spectra with less than 5 peaks with m/z values
         in the range between 10.0 and 1000.0 Da
         """
-        spectrum = select_by_mz(spectrum, mz_from=10.0, mz_to=1000.0)
-        spectrum = self._require_minimum_number_of_peaks(spectrum, n_required=5)
+        spectrum = select_by_mz(spectrum, mz_from=MZ_FROM, mz_to=MZ_TO)
+        spectrum = self._require_minimum_number_of_peaks(spectrum, n_required=MIN_PEAKS)
         return spectrum
 
     #  not currently used (see issue MLOPS-361)
@@ -0,0 +1,128 @@
+from collections import defaultdict
+from typing import Iterator, Sequence
+
+import numpy as np
+from ms2deepscore import BinnedSpectrum
+from ms2deepscore.data_generators import DataGeneratorAllSpectrums, SpectrumPair
+
+from omigami.spectra_matching.ms2deepscore.helper_classes.tanimoto_matrix import (
+    TanimotoMatrix,
+)
+from omigami.spectra_matching.ms2deepscore.storage.binned_spectra_store import (
+    binned_spectra_metadata,
+)
+
+
+class TanimotoMatrixDataGenerator(DataGeneratorAllSpectrums):
+    """Generates the same training data as `DataGeneratorAllSpectrums`, but reads
+    the reference scores from a `TanimotoMatrix` instead of a DataFrame of all of
+    them. Only the row of the scores of each picked compound is read, against the
+    compounds of the selected spectra, so a memory-mapped matrix is never loaded
+    whole. The binned spectra can be a `BinnedSpectraSequence`, whose peaks are only
+    read for the spectra that are picked.
+
+    Parameters
+    ----------
+    binned_spectrums:
+        Binned spectra to generate pairs of
+    tanimoto_matrix:
+        Tanimoto scores of the compounds of the spectra, the labels of the pairs
+    dim:
+        Input vector dimension
+    settings:
+        Settings of `DataGeneratorAllSpectrums`
+    """
+
+    def __init__(
+        self,
+        binned_spectrums: Sequence[BinnedSpectrum],
+        tanimoto_matrix: TanimotoMatrix,
+        dim: int,
+        **settings,
+    ):
+        self._set_generator_parameters(**settings)
+        self.binned_spectrums = binned_spectrums
+        self.tanimoto_matrix = tanimoto_matrix
+        self.dim = dim
+        self.fixed_set = dict()
+
+        self.spectrum_inchikeys = np.array(
+            [
+                metadata.get("inchikey")[:14]
+                for metadata in binned_spectra_metadata(binned_spectrums)
+            ]
+        )
+        self._spectrum_indexes = defaultdict(list)
+        for index, inchikey in enumerate(self.spectrum_inchikeys):
+            self._spectrum_indexes[inchikey].append(index)
+
+        missing = set(self._spectrum_indexes) - set(tanimoto_matrix.index)
+        if missing:
+            raise ValueError(
+                f"{len(missing)} InChIKeys of the spectra are not in the reference "
+                f"scores."
+            )
+
+        # the compounds of the spectra, in the order of the matrix
+        self._rows = np.array(
+            sorted(
+                tanimoto_matrix.index[inchikey] for inchikey in self._spectrum_indexes
+            ),
+            dtype=np.int64,
+        )
+        self._inchikeys = np.array(tanimoto_matrix.inchikeys)[self._rows]
+        self.on_epoch_end()
+
+    def _scores(self, inchikey: str) -> np.ndarray:
+        """Scores of `inchikey` against the compounds of the spectra."""
+        row = self.tanimoto_matrix.scores[self.tanimoto_matrix.index[inchikey]]
+        return self.tanimoto_matrix.decode(row[self._rows])
+
+    def _find_match_in_range(self, inchikey1, target_score_range):
+        scores = self._scores(inchikey1)
+        candidates = np.ones(len(scores), dtype=bool)
+        if self.settings["ignore_equal_pairs"]:
+            candidates = self._inchikeys != inchikey1
+
+        extend_range = 0
+        low, high = target_score_range
+        while True:
+            matching = (
+                candidates
+                & (scores > low - extend_range)
+                & (scores <= high + extend_range)
+            )
+            if matching.any():
+                return np.random.choice(self._inchikeys[matching])
+            extend_range += 0.1
+
+    def _get_spectrum_with_inchikey(self, inchikey: str) -> BinnedSpectrum:
+        return self.binned_spectrums[np.random.choice(self._spectrum_indexes[inchikey])]
+
+    def __getitem__(self, batch_index: int):
+        if self.settings["use_fixed_set"] and batch_index in self.fixed_set:
+            return self.fixed_set[batch_index]
+        if self.settings["use_fixed_set"] and batch_index == 0:
+            np.random.seed(42)
+        spectrum_pairs = self._spectrum_pair_generator(batch_index)
+        X, y = self._data_generation(spectrum_pairs)
+        if self.settings["use_fixed_set"]:
+            self.fixed_set[batch_index] = (X, y)
+        return X, y
+
+    def _data_generation(self, spectrum_pairs: Iterator[SpectrumPair]):
+        X = [np.zeros((self.settings["batch_size"], self.dim)) for _ in range(2)]
+        y = np.zeros((self.settings["batch_size"],))
+
+        for i_pair, pair in enumerate(spectrum_pairs):
+            for i_spectrum, spectrum in enumerate(pair):
+                idx, values = self._data_augmentation(spectrum.binned_peaks)
+                X[i_spectrum][i_pair, idx] = values
+            y[i_pair] = self.tanimoto_matrix.decode(
+                self.tanimoto_matrix.scores[
+                    self.tanimoto_matrix.index[pair[0].get("inchikey")[:14]],
+                    self.tanimoto_matrix.index[pair[1].get("inchikey")[:14]],
+                ]
+            )
+
+        return X, y
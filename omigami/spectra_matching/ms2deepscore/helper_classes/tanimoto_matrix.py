@@ -0,0 +1,361 @@
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from drfs import DRPath
+from drfs.filesystems.local import LocalFileSystem
+from typing_extensions import Literal
+
+from omigami.spectra_matching.storage import FSDataGateway
+
+ScoreDtypes = Literal["float16", "uint8"]
+
+TANIMOTO_MATRIX_EXTENSION = ".npy"
+
+_BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# packed fingerprints of the process and their bit counts, set by the pool initializer
+_worker_fingerprints: Optional[np.ndarray] = None
+_worker_counts: Optional[np.ndarray] = None
+
+
+def is_tanimoto_matrix_path(path: str) -> bool:
+    return str(path).endswith(TANIMOTO_MATRIX_EXTENSION)
+
+
+def _keys_path(path: str) -> str:
+    return f"{path}.inchikeys.json"
+
+
+def pack_fingerprints(fingerprints: Iterable, n_bits: int) -> np.ndarray:
+    """Packs RDKit bit vectors of `n_bits` bits into a matrix of uint64 words, one
+    row per fingerprint. The rows are padded with zero bits to whole words."""
+    n_words = -(-n_bits // 64)
+    rows = [
+        np.frombuffer(fingerprint.ToBitString().encode(), dtype=np.uint8) - ord("0")
+        for fingerprint in fingerprints
+    ]
+    bits = np.zeros((len(rows), n_words * 64), dtype=np.uint8)
+    if rows:
+        bits[:, :n_bits] = np.stack(rows)
+    return np.ascontiguousarray(np.packbits(bits, axis=1)).view(np.uint64)
+
+
+def _popcount(words: np.ndarray) -> np.ndarray:
+    """Number of set bits of the uint64 words of the last axis."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+
+    counts = _BYTE_POPCOUNT[words.view(np.uint8)]
+    return counts.sum(axis=-1, dtype=np.int64)
+
+
+def tanimoto_tile(
+    rows: np.ndarray,
+    columns: np.ndarray,
+    row_counts: np.ndarray,
+    column_counts: np.ndarray,
+) -> np.ndarray:
+    """Tanimoto scores of every pair of packed fingerprints of `rows` and `columns`.
+    Two fingerprints without any bit set score 1, like RDKit does."""
+    intersection = _popcount(rows[:, None, :] & columns[None, :, :])
+    union = row_counts[:, None] + column_counts[None, :] - intersection
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = np.where(union > 0, intersection / union, 1.0)
+    return scores.astype(np.float32)
+
+
+def _init_worker(fingerprints: np.ndarray):
+    global _worker_fingerprints, _worker_counts
+    _worker_fingerprints = fingerprints
+    _worker_counts = _popcount(fingerprints)
+
+
+def _score_row_block(
+    start: int, stop: int, tile_size: int
+) -> Tuple[int, int, np.ndarray]:
+    """Scores of the fingerprints from `start` to `stop` against every fingerprint
+    from `start` on. The scores of the previous ones are the transposed block of
+    another row block."""
+    fingerprints, counts = _worker_fingerprints, _worker_counts
+    block = np.empty((stop - start, len(fingerprints) - start), dtype=np.float32)
+    for column in range(start, len(fingerprints), tile_size):
+        column_stop = min(column + tile_size, len(fingerprints))
+        block[:, column - start : column_stop - start] = tanimoto_tile(
+            fingerprints[start:stop],
+            fingerprints[column:column_stop],
+            counts[start:stop],
+            counts[column:column_stop],
+        )
+    return start, stop, block
+
+
+def calculate_tanimoto_scores(
+    fingerprints: np.ndarray,
+    out: np.ndarray,
+    tile_size: int = 256,
+    n_processes: int = 1,
+    encode=None,
+):
+    """Fills `out` with the Tanimoto scores of every pair of packed fingerprints.
+
+    The scores are computed in row blocks of `tile_size` fingerprints, and only
+    against the fingerprints from the block on since the matrix is symmetric. With
+    more than one process, the row blocks are scored in a process pool while the
+    finished ones are written to `out`, which can be a memory-mapped array.
+
+    Parameters
+    ----------
+    fingerprints:
+        Packed fingerprints, as returned by `pack_fingerprints`
+    out:
+        Square matrix of the size of `fingerprints` to write the scores to
+    tile_size:
+        Number of fingerprints of each side of the tiles that are scored at once
+    n_processes:
+        Number of processes scoring the row blocks
+    encode:
+        Function applied to each block of float32 scores before writing it to `out`
+
+    """
+    encode = encode or (lambda scores: scores)
+    row_blocks = [
+        (start, min(start + tile_size, len(fingerprints)), tile_size)
+        for start in range(0, len(fingerprints), tile_size)
+    ]
+
+    def write(start: int, stop: int, block: np.ndarray):
+        encoded = encode(block)
+        out[start:stop, start:] = encoded
+        out[start:, start:stop] = encoded.T
+
+    if n_processes <= 1:
+        _init_worker(fingerprints)
+        for row_block in row_blocks:
+            write(*_score_row_block(*row_block))
+        return
+
+    with ProcessPoolExecutor(
+        n_processes, initializer=_init_worker, initargs=(fingerprints,)
+    ) as executor:
+        for result in executor.map(_score_row_block, *zip(*row_blocks)):
+            write(*result)
+
+
+def _score_rows(rows: np.ndarray, tile_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Scores of the fingerprints of `rows` against every fingerprint."""
+    fingerprints, counts = _worker_fingerprints, _worker_counts
+    block = np.empty((len(rows), len(fingerprints)), dtype=np.float32)
+    for column in range(0, len(fingerprints), tile_size):
+        column_stop = min(column + tile_size, len(fingerprints))
+        block[:, column:column_stop] = tanimoto_tile(
+            fingerprints[rows],
+            fingerprints[column:column_stop],
+            counts[rows],
+            counts[column:column_stop],
+        )
+    return rows, block
+
+
+def calculate_tanimoto_rows(
+    fingerprints: np.ndarray,
+    rows: np.ndarray,
+    out: np.ndarray,
+    tile_size: int = 256,
+    n_processes: int = 1,
+    encode=None,
+):
+    """Like `calculate_tanimoto_scores`, but only fills the rows and columns of
+    `out` of the fingerprints of `rows`, for instance the ones of the compounds
+    added to a matrix whose other scores are known."""
+    encode = encode or (lambda scores: scores)
+    row_blocks = [
+        rows[start : start + tile_size] for start in range(0, len(rows), tile_size)
+    ]
+
+    def write(block_rows: np.ndarray, block: np.ndarray):
+        encoded = encode(block)
+        out[block_rows, :] = encoded
+        out[:, block_rows] = encoded.T
+
+    if n_processes <= 1:
+        _init_worker(fingerprints)
+        for block_rows in row_blocks:
+            write(*_score_rows(block_rows, tile_size))
+        return
+
+    with ProcessPoolExecutor(
+        n_processes, initializer=_init_worker, initargs=(fingerprints,)
+    ) as executor:
+        for result in executor.map(
+            _score_rows, row_blocks, [tile_size] * len(row_blocks)
+        ):
+            write(*result)
+
+
+class TanimotoMatrix:
+    """Tanimoto scores of every pair of compounds, saved as an uncompressed .npy
+    matrix next to the list of its InChIKeys. The matrix is memory-mapped when it is
+    on the local filesystem, and read to memory otherwise.
+
+    The scores are stored either as float16, or quantized to uint8 with a step of
+    1/255, a fourth and an eighth of the size of the float64 DataFrame.
+
+    Parameters
+    ----------
+    inchikeys:
+        InChIKey of each row and column of `scores`
+    scores:
+        Square matrix of the scores, as stored
+    fingerprint_keys:
+        Key of the fingerprint each row was scored with, which tells whether the
+        scores of a compound are still valid when the matrix is updated
+    """
+
+    def __init__(
+        self,
+        inchikeys: List[str],
+        scores: np.ndarray,
+        fingerprint_keys: Optional[List[str]] = None,
+    ):
+        self.inchikeys = inchikeys
+        self.scores = scores
+        self.fingerprint_keys = fingerprint_keys
+        self._index = None
+        # gateway, temporary file and path of a matrix to be uploaded by `flush`
+        self._upload: Optional[Tuple[FSDataGateway, str, str]] = None
+
+    def __len__(self) -> int:
+        return len(self.inchikeys)
+
+    @property
+    def index(self) -> Dict[str, int]:
+        if self._index is None:
+            self._index = {inchikey: row for row, inchikey in enumerate(self.inchikeys)}
+        return self._index
+
+    def encode(self, scores: np.ndarray) -> np.ndarray:
+        if self.scores.dtype == np.uint8:
+            return np.rint(scores * 255).astype(np.uint8)
+        return scores.astype(self.scores.dtype)
+
+    def decode(self, scores: np.ndarray) -> np.ndarray:
+        if self.scores.dtype == np.uint8:
+            return scores.astype(np.float32) / 255
+        return scores.astype(np.float32)
+
+    def rows(self, inchikeys: List[str]) -> np.ndarray:
+        """Decoded scores of the given InChIKeys against all of them. Only these
+        rows are read from the file."""
+        return self.decode(self.scores[[self.index[key] for key in inchikeys]])
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """The scores as a DataFrame indexed by InChIKey on both axes. Float16
+        scores are not copied, so the DataFrame stays backed by the file."""
+        scores = self.scores
+        if scores.dtype == np.uint8:
+            scores = self.decode(scores)
+        return pd.DataFrame(
+            scores, index=self.inchikeys, columns=self.inchikeys, copy=False
+        )
+
+    @classmethod
+    def from_dataframe(cls, scores: pd.DataFrame) -> "TanimotoMatrix":
+        """Matrix of a DataFrame of scores with InChIKeys as index and columns, in
+        memory."""
+        return cls(
+            [inchikey[:14] for inchikey in scores.index],
+            scores.loc[:, scores.index].to_numpy(),
+        )
+
+    def copy_scores(
+        self,
+        source: "TanimotoMatrix",
+        rows: np.ndarray,
+        source_rows: np.ndarray,
+        block_size: int = 1024,
+    ):
+        """Copies the scores between `source_rows` of `source` to the ones between
+        `rows` of this matrix, a block of rows at a time."""
+        for start in range(0, len(rows), block_size):
+            block = source.scores[source_rows[start : start + block_size]]
+            self.scores[rows[start : start + block_size, None], rows] = self.encode(
+                source.decode(block[:, source_rows])
+            )
+
+    @classmethod
+    def create(
+        cls,
+        fs_dgw: FSDataGateway,
+        path: str,
+        inchikeys: List[str],
+        dtype: ScoreDtypes = "float16",
+        fingerprint_keys: Optional[List[str]] = None,
+    ) -> "TanimotoMatrix":
+        """Creates the file of a matrix of the given InChIKeys, to be filled. If
+        `path` is not on the local filesystem, the matrix is filled in a local
+        temporary file, which `flush` uploads to `path`."""
+        fs_dgw.init_fs(path)
+        local_path = path
+        if not isinstance(fs_dgw.fs, LocalFileSystem):
+            file, local_path = tempfile.mkstemp(suffix=TANIMOTO_MATRIX_EXTENSION)
+            os.close(file)
+
+        scores = np.lib.format.open_memmap(
+            local_path, mode="w+", dtype=dtype, shape=(len(inchikeys), len(inchikeys))
+        )
+        _write_keys(
+            fs_dgw,
+            path,
+            {"inchikeys": list(inchikeys), "fingerprint_keys": fingerprint_keys},
+        )
+        matrix = cls(list(inchikeys), scores, fingerprint_keys)
+        if local_path != path:
+            matrix._upload = (fs_dgw, local_path, path)
+        return matrix
+
+    @classmethod
+    def load(cls, fs_dgw: FSDataGateway, path: str) -> "TanimotoMatrix":
+        keys = _read_keys(fs_dgw, path)
+        return cls(keys["inchikeys"], fs_dgw.load_array(path), keys["fingerprint_keys"])
+
+    def flush(self):
+        """Writes the scores to the file, and uploads the temporary file of a
+        matrix created on a remote filesystem."""
+        if isinstance(self.scores, np.memmap):
+            self.scores.flush()
+        if self._upload is not None:
+            fs_dgw, local_path, path = self._upload
+            fs_dgw.put(local_path, path)
+            os.remove(local_path)
+            self._upload = None
+
+    @staticmethod
+    def move(fs_dgw: FSDataGateway, path: str, new_path: str):
+        """Moves the matrix saved at `path`, replacing the one at `new_path`."""
+        fs_dgw.move(path, new_path)
+        fs_dgw.move(_keys_path(path), _keys_path(new_path))
+
+
+def _write_keys(fs_dgw: FSDataGateway, path: str, keys: Dict):
+    fs_dgw.init_fs(path)
+    with fs_dgw.fs.open(DRPath(_keys_path(path)), "w") as keys_file:
+        json.dump(keys, keys_file)
+
+
+def _read_keys(fs_dgw: FSDataGateway, path: str) -> Dict:
+    fs_dgw.init_fs(path)
+    with fs_dgw.fs.open(DRPath(_keys_path(path)), "r") as keys_file:
+        return json.load(keys_file)
+
+
+def read_tanimoto_matrix(fs_dgw: FSDataGateway, path: str) -> TanimotoMatrix:
+    """Reads the scores saved by `TanimotoScoreCalculator`, either a .npy matrix or
+    a gzip compressed DataFrame pickle, depending on the extension."""
+    if is_tanimoto_matrix_path(path):
+        return TanimotoMatrix.load(fs_dgw, path)
+    return TanimotoMatrix.from_dataframe(pd.read_pickle(path, compression="gzip"))
@@ -1,11 +1,27 @@
 from logging import Logger
-from typing import List
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
 from ms2deepscore import BinnedSpectrum
 from rdkit import Chem
-from rdkit.DataStructs import BulkTanimotoSimilarity
 
+from omigami.spectra_matching.ms2deepscore.helper_classes.fingerprint_store import (
+    FingerprintStore,
+    key_to_str,
+)
+from omigami.spectra_matching.ms2deepscore.helper_classes.tanimoto_matrix import (
+    ScoreDtypes,
+    TanimotoMatrix,
+    TANIMOTO_MATRIX_EXTENSION,
+    calculate_tanimoto_rows,
+    calculate_tanimoto_scores,
+    is_tanimoto_matrix_path,
+    pack_fingerprints,
+)
+from omigami.spectra_matching.ms2deepscore.storage.binned_spectra_store import (
+    read_binned_spectra_metadata,
+)
 from omigami.spectra_matching.ms2deepscore.storage.fs_data_gateway import (
     MS2DeepScoreFSDataGateway,
 )
@@ -18,27 +34,63 @@ class TanimotoScoreCalculator:
         binned_spectra_path: str,
         n_bits: int = 2048,
         decimals: int = 5,
+        n_processes: int = 1,
+        tile_size: int = 256,
+        scores_dtype: ScoreDtypes = "float16",
+        fingerprints_path: Optional[str] = None,
     ):
         self._fs_dgw = fs_dgw
         self._binned_spectra_path = binned_spectra_path
         self._n_bits = n_bits
         self._decimals = decimals
+        self._n_processes = n_processes
+        self._tile_size = tile_size
+        self._scores_dtype = scores_dtype
+        self._fingerprints_path = fingerprints_path
+        self._fingerprint_store = FingerprintStore()
 
     def calculate(self, scores_output_path: str, logger: Logger = None) -> str:
-        binned_spectra = self._fs_dgw.read_from_file(self._binned_spectra_path)
-        unique_inchi_keys = self._get_unique_inchis(binned_spectra)
+        """Calculates the Tanimoto scores of every pair of unique InChIKeys and saves
+        them to `scores_output_path`. If it ends with .npy, the scores are saved as
+        a `TanimotoMatrix` of `scores_dtype`, otherwise as a gzip compressed
+        DataFrame pickle, rounded to `decimals`.
+
+        If there is a `fingerprints_path`, only the fingerprints of the compounds
+        that are not in the fingerprint store saved there are derived, and added to
+        it. If there is a matrix at `scores_output_path` already, only the scores of
+        the compounds whose fingerprint changed since are calculated.
+        """
+        binned_spectra_metadata = read_binned_spectra_metadata(
+            self._fs_dgw, self._binned_spectra_path
+        )
+        unique_inchi_keys = self._get_unique_inchis(binned_spectra_metadata)
 
         if logger:
             logger.info(
                 f"Calculating Tanimoto scores for {len(unique_inchi_keys)} unique InChIkeys"
             )
 
-        tanimoto_scores = self._calculate_tanimoto_scores(unique_inchi_keys)
-        tanimoto_scores.to_pickle(scores_output_path, compression="gzip")
+        if self._fingerprints_path:
+            self._fingerprint_store = FingerprintStore.load(
+                self._fs_dgw, self._fingerprints_path
+            )
+
+        if is_tanimoto_matrix_path(scores_output_path):
+            self._calculate_tanimoto_matrix(
+                unique_inchi_keys, scores_output_path, logger
+            )
+        else:
+            tanimoto_scores = self._calculate_tanimoto_scores(unique_inchi_keys)
+            tanimoto_scores.to_pickle(scores_output_path, compression="gzip")
+
+        if self._fingerprints_path:
+            self._fingerprint_store.save(self._fs_dgw, self._fingerprints_path)
         return scores_output_path
 
     @staticmethod
-    def _get_unique_inchis(binned_spectra: List[BinnedSpectrum]) -> pd.Series:
+    def _get_unique_inchis(
+        binned_spectra: Iterable[Union[BinnedSpectrum, Dict]]
+    ) -> pd.Series:
         inchi_keys, inchi = zip(
             *[
                 (spectrum.get("inchikey")[:14], spectrum.get("inchi"))
@@ -55,22 +107,122 @@ class TanimotoScoreCalculator:
 
         return most_common_inchi["inchi"]
 
+    def _derive_fingerprints(self, inchis: List[str]) -> np.ndarray:
+        return pack_fingerprints(
+            (
+                Chem.RDKFingerprint(Chem.MolFromInchi(inchi), fpSize=self._n_bits)
+                for inchi in inchis
+            ),
+            self._n_bits,
+        )
+
+    def _get_fingerprints(
+        self, inchis: pd.Series, logger: Logger = None
+    ) -> Tuple[List[str], np.ndarray]:
+        keys, fingerprints, n_derived = self._fingerprint_store.get_fingerprints(
+            inchis, self._n_bits, self._derive_fingerprints
+        )
+        if logger:
+            logger.info(
+                f"Derived {n_derived} fingerprints, {len(keys) - n_derived} were "
+                f"in the fingerprint store."
+            )
+        return [key_to_str(key) for key in keys], fingerprints
+
     def _calculate_tanimoto_scores(
         self,
         inchis: pd.Series,
     ) -> pd.DataFrame:
-        def _derive_daylight_fingerprint(df, nbits: int):
-            mol = Chem.MolFromInchi(df)
-            return Chem.RDKFingerprint(mol, fpSize=nbits)
+        scores = np.empty((len(inchis), len(inchis)), dtype=np.float64)
+        calculate_tanimoto_scores(
+            self._get_fingerprints(inchis)[1],
+            scores,
+            self._tile_size,
+            self._n_processes,
+        )
+        return pd.DataFrame(scores, index=inchis.index, columns=inchis.index).round(
+            self._decimals
+        )
+
+    def _calculate_tanimoto_matrix(
+        self, inchis: pd.Series, path: str, logger: Logger = None
+    ):
+        fingerprint_keys, fingerprints = self._get_fingerprints(inchis, logger)
+        previous_matrix = self._load_previous_matrix(path)
+        if previous_matrix is None:
+            matrix = TanimotoMatrix.create(
+                self._fs_dgw,
+                path,
+                list(inchis.index),
+                self._scores_dtype,
+                fingerprint_keys,
+            )
+            calculate_tanimoto_scores(
+                fingerprints,
+                matrix.scores,
+                self._tile_size,
+                self._n_processes,
+                encode=matrix.encode,
+            )
+            matrix.flush()
+            return
 
-        fingerprints = inchis.apply(
-            _derive_daylight_fingerprint,
-            args=(self._n_bits,),
+        previous_rows = {
+            key: row for row, key in enumerate(previous_matrix.fingerprint_keys)
+        }
+        is_reused = np.array(
+            [key in previous_rows for key in fingerprint_keys], dtype=bool
         )
+        reused_rows = np.flatnonzero(is_reused)
+        new_rows = np.flatnonzero(~is_reused)
+        if logger:
+            logger.info(
+                f"Reusing the scores of {len(reused_rows)} compounds of the previous "
+                f"matrix, calculating the ones of {len(new_rows)} new compounds."
+            )
 
-        scores = fingerprints.apply(lambda x: BulkTanimotoSimilarity(x, fingerprints))
-        scores = pd.DataFrame.from_dict(
-            dict(zip(scores.index, scores.values)),
+        # the previous matrix is read while the updated one is written, so that is
+        # written next to it and moved in place once it is complete
+        updated_path = (
+            f"{path[:-len(TANIMOTO_MATRIX_EXTENSION)]}.updated"
+            f"{TANIMOTO_MATRIX_EXTENSION}"
+        )
+        matrix = TanimotoMatrix.create(
+            self._fs_dgw,
+            updated_path,
+            list(inchis.index),
+            self._scores_dtype,
+            fingerprint_keys,
+        )
+        matrix.copy_scores(
+            previous_matrix,
+            reused_rows,
+            np.array(
+                [previous_rows[fingerprint_keys[row]] for row in reused_rows],
+                dtype=np.int64,
+            ),
         )
-        scores.index = fingerprints.index
-        return scores.round(self._decimals)
+        calculate_tanimoto_rows(
+            fingerprints,
+            new_rows,
+            matrix.scores,
+            self._tile_size,
+            self._n_processes,
+            encode=matrix.encode,
+        )
+        matrix.flush()
+        TanimotoMatrix.move(self._fs_dgw, updated_path, path)
+
+    def _load_previous_matrix(self, path: str) -> Optional[TanimotoMatrix]:
+        """The matrix saved at `path` by a previous run, if its scores can be reused
+        for the new one."""
+        if not self._fs_dgw.exists(path):
+            return None
+
+        previous_matrix = TanimotoMatrix.load(self._fs_dgw, path)
+        if (
+            previous_matrix.fingerprint_keys is None
+            or previous_matrix.scores.dtype != np.dtype(self._scores_dtype)
+        ):
+            return None
+        return previous_matrix
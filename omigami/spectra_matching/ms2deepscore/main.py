@@ -7,6 +7,10 @@ from omigami.config import IonModes
 from omigami.deployer import FlowDeployer
 from omigami.spectra_matching.ms2deepscore import MS2DEEPSCORE_PROJECT_NAME
 from omigami.spectra_matching.ms2deepscore.factory import MS2DeepScoreFlowFactory
+from omigami.spectra_matching.ms2deepscore.helper_classes.tanimoto_matrix import (
+    ScoreDtypes,
+)
+from omigami.spectra_matching.tasks import ChunkFormats
 from omigami.spectra_matching.util import run_local_training_flow
 
 
@@ -26,6 +30,15 @@ def run_ms2deepscore_training_flow(
     schedule: Optional[pd.Timedelta] = None,
     dataset_directory: str = None,
     local: bool = False,
+    incremental: bool = False,
+    chunk_format: ChunkFormats = "json",
+    chunk_all_ion_modes: bool = False,
+    cleaning_processes: int = 1,
+    binning_processes: int = 1,
+    response_cache_size: int = 0,
+    response_cache_ttl: Optional[int] = None,
+    tanimoto_processes: int = 1,
+    scores_dtype: ScoreDtypes = "float16",
 ) -> Tuple[str, str]:
     """
     Builds, deploys, and runs a MS2DeepScore model training flow.
@@ -57,6 +70,15 @@ def run_ms2deepscore_training_flow(
         test_ratio=test_ratio,
         epochs=epochs,
         schedule=schedule,
+        incremental=incremental,
+        chunk_format=chunk_format,
+        chunk_all_ion_modes=chunk_all_ion_modes,
+        cleaning_processes=cleaning_processes,
+        binning_processes=binning_processes,
+        response_cache_size=response_cache_size,
+        response_cache_ttl=response_cache_ttl,
+        tanimoto_processes=tanimoto_processes,
+        scores_dtype=scores_dtype,
     )
     if local is True:
         flow_run = run_local_training_flow(flow, MS2DEEPSCORE_PROJECT_NAME)
@@ -76,6 +98,7 @@ def run_deploy_ms2ds_model_flow(
     flow_name: str,
     dataset_id: str,
     ion_mode: IonModes,
+    build_embedding_index: bool = False,
 ) -> Tuple[str, str]:
     """
     Builds, deploys, and runs a model deployment flow.
@@ -98,6 +121,7 @@ def run_deploy_ms2ds_model_flow(
         flow_name=flow_name,
         dataset_id=dataset_id,
         ion_mode=ion_mode,
+        build_embedding_index=build_embedding_index,
     )
 
     flow_parameters = {"ModelRunID": model_run_id}
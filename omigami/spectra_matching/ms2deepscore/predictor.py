@@ -1,12 +1,12 @@
 from logging import getLogger
-from typing import Union, List, Dict, Tuple
+from pathlib import Path
+from typing import Union, List, Dict, Tuple, Optional
 
 import numpy as np
-from matchms import calculate_scores
-from ms2deepscore import MS2DeepScore
 from ms2deepscore.models import load_model as ms2deepscore_load_model, SiameseModel
-from tqdm import tqdm
 
+from omigami.spectra_matching.embedding_cache import EmbeddingCache
+from omigami.spectra_matching.response_cache import ResponseCache
 from omigami.spectra_matching.ms2deepscore.embedding import (
     MS2DeepScoreEmbedding,
     EmbeddingMaker,
@@ -19,20 +19,27 @@ from omigami.spectra_matching.ms2deepscore.storage import (
 )
 from omigami.spectra_matching.predictor import (
     Predictor,
-    SpectrumMatches,
     SpectraMatchingError,
-)
-from omigami.spectra_matching.util import (
-    cosine_similarity,
-    cosine_similarity_matrix,
+    EXACT_SEARCH,
 )
 
 log = getLogger(__name__)
 
 
 class MS2DeepScorePredictor(Predictor):
-    def __init__(self, ion_mode: str = None, run_id: str = None):
-        super().__init__(MS2DeepScoreRedisSpectrumDataGateway())
+    def __init__(
+        self,
+        ion_mode: str = None,
+        run_id: str = None,
+        embedding_cache_size: int = 10000,
+        embedding_cache_bytes: int = 2 ** 26,
+        response_cache: Optional[ResponseCache] = None,
+    ):
+        super().__init__(
+            MS2DeepScoreRedisSpectrumDataGateway(),
+            EmbeddingCache(embedding_cache_size, embedding_cache_bytes),
+            response_cache,
+        )
         self.ion_mode = ion_mode
         self._run_id = run_id
         self.spectrum_processor = SpectrumProcessor()
@@ -46,6 +53,7 @@ class MS2DeepScorePredictor(Predictor):
             self.model = ms2deepscore_load_model(model_path)
         except FileNotFoundError:
             log.error(f"Could not find MS2DeepScore model in {model_path}")
+        self._load_embedding_index(str(Path(model_path).parent))
 
     def predict(
         self,
@@ -68,7 +76,11 @@ class MS2DeepScorePredictor(Predictor):
                     "Precursor_MZ": float,
                 },
             ],
-            "parameters": {"n_best_spectra": int, "include_metadata": List[str]}
+            "parameters": {
+                "n_best_spectra": int,
+                "include_metadata": List[str],
+                "search": "exact" | "approximate" | "benchmark",
+            }
         }
 
         Returns
@@ -80,40 +92,63 @@ class MS2DeepScorePredictor(Predictor):
             log.info("Creating a prediction.")
             data_input, parameters = self._parse_input(data_input)
 
-            log.info("Loading reference spectra.")
-            reference_spectra_ids = self._get_ref_ids_from_data_input(
-                data_input, mz_range
-            )
-            reference_embeddings = self._load_embeddings(reference_spectra_ids)
-            log.info(f"Loaded {len(reference_embeddings)} spectra from the database.")
-
-            log.info("Pre-processing data.")
-            query_spectra = self.spectrum_processor.process_spectra(
-                data_input, process_reference_spectra=False
+            return self._predict_with_cache(
+                data_input,
+                parameters,
+                mz_range,
+                lambda: self._match_spectra(data_input, parameters, mz_range),
             )
-            query_binned_spectra = self.model.spectrum_binner.transform(query_spectra)
-            query_embeddings = [
-                self.embedding_maker.make_embedding(self.model, binned_spectrum)
-                for binned_spectrum in query_binned_spectra
-            ]
-
-            log.info("Calculating best matches.")
-
-            best_matches_data = {
-                "all_references": reference_embeddings,
-                "queries": query_embeddings,
-            }
+        except Exception as e:
+            raise SpectraMatchingError(str(e), 1, 500)
 
-            if parameters.get("n_best_spectra"):
-                best_matches_data["n_best_spectra"] = parameters.get("n_best_spectra")
+    def _match_spectra(
+        self,
+        data_input: List[Dict[str, str]],
+        parameters: Dict,
+        mz_range: int,
+    ) -> Dict:
+        log.info("Pre-processing data.")
+        query_embeddings = self._get_query_embeddings(
+            data_input, self._pre_process_data
+        )
+        queries = [
+            i for i, embedding in enumerate(query_embeddings) if embedding is not None
+        ]
+
+        log.info("Calculating best matches.")
+        best_matches = self._find_best_matches(
+            [query_embeddings[i] for i in queries],
+            [data_input[i] for i in queries],
+            mz_range,
+            parameters.get("n_best_spectra") or 10,
+            query_keys=[f"spectrum-{i}" for i in queries],
+            search=parameters.get("search") or EXACT_SEARCH,
+        )
+        best_matches = self._add_metadata(
+            best_matches, parameters.get("include_metadata")
+        )
 
-            best_matches = self._calculate_best_matches(**best_matches_data)
-            best_matches = self._add_metadata(best_matches)
+        log.info("Finishing prediction.")
+        return best_matches
 
-            log.info("Finishing prediction.")
-            return best_matches
-        except Exception as e:
-            raise SpectraMatchingError(str(e), 1, 500)
+    def _pre_process_data(
+        self, data_input: List[Dict[str, str]]
+    ) -> List[Optional[MS2DeepScoreEmbedding]]:
+        """Creates the embeddings of the input spectra. The embedding of an input that
+        is filtered out by the spectrum processor is None, so the embeddings stay
+        aligned with the inputs."""
+        query_spectra = self.spectrum_processor.process_batch(
+            data_input, process_reference_spectra=False
+        )
+        query_binned_spectra = self.model.spectrum_binner.transform(
+            [spectrum for spectrum in query_spectra if spectrum is not None]
+        )
+        embeddings = iter(
+            self.embedding_maker.make_embeddings(self.model, query_binned_spectra)
+        )
+        return [
+            None if spectrum is None else next(embeddings) for spectrum in query_spectra
+        ]
 
     @staticmethod
     def _parse_input(
@@ -125,93 +160,3 @@ class MS2DeepScorePredictor(Predictor):
         parameters = data_input_and_parameters.get("parameters")
 
         return data_input, parameters
-
-    def _calculate_best_matches(
-        self,
-        all_references: List[MS2DeepScoreEmbedding],
-        queries: List[MS2DeepScoreEmbedding],
-        n_best_spectra: int = 10,
-    ) -> SpectrumMatches:
-        similarity_score_calculator = MS2DeepScoreSimilarityScoreCalculator(self.model)
-
-        scores = calculate_scores(
-            all_references,
-            queries,
-            similarity_score_calculator,
-        )
-        best_matches = {}
-        for i, query in enumerate(queries):
-            all_scores = scores.scores_by_query(query, sort=True)
-
-            all_scores = [
-                (spectrum, score)
-                for spectrum, score in all_scores
-                if not np.isnan(score)
-            ]
-            spectrum_best_scores = all_scores[:n_best_spectra]
-            spectrum_best_matches = {}
-            for spectrum_match in spectrum_best_scores:
-                spectrum_best_matches[spectrum_match[0].spectrum_id] = {
-                    "score": spectrum_match[1]
-                }
-            best_matches[f"spectrum-{i}"] = spectrum_best_matches
-        return best_matches
-
-    def _load_embeddings(
-        self, spectrum_ids: List[List[str]]
-    ) -> List[MS2DeepScoreEmbedding]:
-        unique_ids = set(item for elem in spectrum_ids for item in elem)
-        embeddings = self.dgw.read_embeddings(self.ion_mode, list(unique_ids))
-        return embeddings
-
-
-class MS2DeepScoreSimilarityScoreCalculator(MS2DeepScore):
-    """Calculate MS2DeepScore similarity scores between a reference and a query. The
-    only difference between MS2DeepScoreSimilarityScoreCalculator and MS2DeepScore is that
-    MS2DeepScoreSimilarityScoreCalculator methods take as input argument Embedding instead
-    of Spectrum.
-    """
-
-    def __init__(self, model: SiameseModel, **kwargs):
-        super().__init__(model, **kwargs)
-
-    def pair(
-        self, reference: MS2DeepScoreEmbedding, query: MS2DeepScoreEmbedding
-    ) -> float:
-        return cosine_similarity(reference.vector[0, :], query.vector[0, :])
-
-    def matrix(
-        self,
-        references: List[MS2DeepScoreEmbedding],
-        queries: List[MS2DeepScoreEmbedding],
-        is_symmetric: bool = False,
-    ) -> np.ndarray:
-
-        reference_vectors = self.calculate_vectors(references)
-        if is_symmetric:
-            assert np.all(
-                references == queries
-            ), "Expected references to be equal to queries for is_symmetric=True"
-            query_vectors = reference_vectors
-        else:
-            query_vectors = self.calculate_vectors(queries)
-
-        ms2ds_similarity = cosine_similarity_matrix(reference_vectors, query_vectors)
-        return ms2ds_similarity
-
-    def calculate_vectors(
-        self, spectrum_list: List[MS2DeepScoreEmbedding]
-    ) -> np.ndarray:
-        n_rows = len(spectrum_list)
-        reference_vectors = np.empty((n_rows, self.output_vector_dim), dtype="float")
-        for index_reference, reference in enumerate(
-            tqdm(
-                spectrum_list,
-                desc="Calculating vectors of reference spectrums",
-                disable=(not self.progress_bar),
-            )
-        ):
-            reference_vectors[
-                index_reference, 0 : self.output_vector_dim
-            ] = reference.vector
-        return reference_vectors
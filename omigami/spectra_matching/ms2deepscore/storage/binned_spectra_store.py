@@ -0,0 +1,243 @@
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from ms2deepscore import BinnedSpectrum
+
+from omigami.spectra_matching.ms2deepscore.storage.fs_data_gateway import (
+    MS2DeepScoreFSDataGateway,
+)
+
+SHARDS_FILE = "shards.pickle"
+
+
+def is_sharded(path: str) -> bool:
+    """Binned spectra are saved in shards to a directory, or pickled all together
+    to a .pkl file."""
+    return not str(path).endswith(".pkl")
+
+
+class BinnedSpectraStore:
+    """Binned spectra saved in shards, for instance one per chunk of cleaned
+    spectra, so that they can be written and read one shard at a time.
+
+    The binned peaks of each shard are saved as compressed sparse rows: the bin
+    indices and weights of the peaks of all its spectra concatenated, and the offset
+    of the peaks of each spectrum. The arrays are memory-mapped when they are read
+    from the local filesystem. The metadata of the spectra are pickled apart, so
+    they can be read without the peaks.
+
+    Parameters
+    ----------
+    fs_dgw:
+        Gateway of the filesystem of `directory`
+    directory:
+        Directory of the shards
+    """
+
+    def __init__(self, fs_dgw: MS2DeepScoreFSDataGateway, directory: str):
+        self._fs_dgw = fs_dgw
+        self._directory = str(directory)
+
+    def _path(self, shard: str, suffix: str) -> str:
+        return f"{self._directory}/{shard}.{suffix}"
+
+    @property
+    def shards(self) -> List[str]:
+        return self._fs_dgw.read_from_file(f"{self._directory}/{SHARDS_FILE}")
+
+    def save_shards(self, shards: List[str]):
+        """Saves the names of the shards that make up the binned spectra."""
+        self._fs_dgw.serialize_to_file(f"{self._directory}/{SHARDS_FILE}", shards)
+
+    def write_shard(self, shard: str, binned_spectra: List[BinnedSpectrum]):
+        n_peaks = np.array(
+            [len(spectrum.binned_peaks) for spectrum in binned_spectra],
+            dtype=np.int64,
+        )
+        bin_indices = np.fromiter(
+            (
+                bin_index
+                for spectrum in binned_spectra
+                for bin_index in spectrum.binned_peaks.keys()
+            ),
+            np.int32,
+            n_peaks.sum(),
+        )
+        weights = np.fromiter(
+            (
+                weight
+                for spectrum in binned_spectra
+                for weight in spectrum.binned_peaks.values()
+            ),
+            np.float32,
+            n_peaks.sum(),
+        )
+
+        self._fs_dgw.save_array(self._path(shard, "bins.npy"), bin_indices)
+        self._fs_dgw.save_array(self._path(shard, "weights.npy"), weights)
+        self._fs_dgw.save_array(
+            self._path(shard, "offsets.npy"), np.concatenate([[0], np.cumsum(n_peaks)])
+        )
+        self._fs_dgw.serialize_to_file(
+            self._path(shard, "metadata.pickle"),
+            [spectrum.metadata for spectrum in binned_spectra],
+        )
+
+    def read_shard_arrays(self, shard: str) -> Tuple[np.ndarray, ...]:
+        """Bin indices, weights and offsets of the peaks of the shard."""
+        return tuple(
+            self._fs_dgw.load_array(self._path(shard, suffix))
+            for suffix in ["bins.npy", "weights.npy", "offsets.npy"]
+        )
+
+    def read_shard_metadata(self, shard: str) -> List[Dict]:
+        return self._fs_dgw.read_from_file(self._path(shard, "metadata.pickle"))
+
+    def read_shard(self, shard: str) -> List[BinnedSpectrum]:
+        arrays = self.read_shard_arrays(shard)
+        return [
+            _make_binned_spectrum(metadata, arrays, i)
+            for i, metadata in enumerate(self.read_shard_metadata(shard))
+        ]
+
+    def iterate(self) -> Iterator[BinnedSpectrum]:
+        """Yields the binned spectra, reading one shard at a time."""
+        for shard in self.shards:
+            yield from self.read_shard(shard)
+
+    def iterate_metadata(self) -> Iterator[Dict]:
+        """Yields the metadata of the binned spectra, without reading their
+        peaks."""
+        for shard in self.shards:
+            yield from self.read_shard_metadata(shard)
+
+
+def _make_binned_spectrum(
+    metadata: Dict, arrays: Tuple[np.ndarray, ...], row: int
+) -> BinnedSpectrum:
+    """Binned spectrum of the `row`th spectrum of the arrays of a shard."""
+    bin_indices, weights, offsets = arrays
+    spectrum_bins = np.array(bin_indices[offsets[row] : offsets[row + 1]], np.int64)
+    spectrum_weights = np.array(weights[offsets[row] : offsets[row + 1]])
+    binned_spectrum = BinnedSpectrum(
+        dict(zip(spectrum_bins.tolist(), spectrum_weights.tolist())), metadata
+    )
+    binned_spectrum.peak_arrays = (spectrum_bins, spectrum_weights)
+    return binned_spectrum
+
+
+class BinnedSpectraSequence(Sequence):
+    """Binned spectra of a `BinnedSpectraStore` that are read lazily, so that the
+    binned spectra of the whole dataset are never built at once. The metadata of all
+    spectra are kept in memory, while the peaks of a spectrum are read from the
+    arrays of its shard when it is indexed. The arrays of a shard are read once,
+    and are memory-mapped on the local filesystem.
+
+    Parameters
+    ----------
+    store:
+        Store of the binned spectra
+    shards:
+        Shards of the store
+    metadata:
+        Metadata of each spectrum
+    shard_indexes:
+        Index in the shards of the store of the shard of each spectrum
+    rows:
+        Row of each spectrum in its shard
+    shard_arrays:
+        Arrays of the shards that were read, by index
+    """
+
+    def __init__(
+        self,
+        store: BinnedSpectraStore,
+        shards: List[str],
+        metadata: List[Dict],
+        shard_indexes: np.ndarray,
+        rows: np.ndarray,
+        shard_arrays: Optional[Dict[int, Tuple[np.ndarray, ...]]] = None,
+    ):
+        self._store = store
+        self._shards = shards
+        self.metadata = metadata
+        self._shard_indexes = shard_indexes
+        self._rows = rows
+        self._shard_arrays = shard_arrays if shard_arrays is not None else {}
+
+    @classmethod
+    def from_store(cls, store: BinnedSpectraStore) -> "BinnedSpectraSequence":
+        """Reads the metadata of the spectra of every shard, but none of their
+        peaks."""
+        shards = store.shards
+        metadata = []
+        shard_indexes = [np.zeros(0, dtype=np.int64)]
+        rows = [np.zeros(0, dtype=np.int64)]
+        for i, shard in enumerate(shards):
+            shard_metadata = store.read_shard_metadata(shard)
+            metadata += shard_metadata
+            shard_indexes.append(np.full(len(shard_metadata), i, dtype=np.int64))
+            rows.append(np.arange(len(shard_metadata), dtype=np.int64))
+        return cls(
+            store,
+            shards,
+            metadata,
+            np.concatenate(shard_indexes),
+            np.concatenate(rows),
+        )
+
+    def __len__(self) -> int:
+        return len(self.metadata)
+
+    def __getitem__(
+        self, index: Union[int, slice]
+    ) -> Union[BinnedSpectrum, "BinnedSpectraSequence"]:
+        if isinstance(index, slice):
+            return self.take(np.arange(len(self))[index])
+
+        shard_index = self._shard_indexes[index]
+        if shard_index not in self._shard_arrays:
+            self._shard_arrays[shard_index] = self._store.read_shard_arrays(
+                self._shards[shard_index]
+            )
+        return _make_binned_spectrum(
+            self.metadata[index], self._shard_arrays[shard_index], self._rows[index]
+        )
+
+    def take(self, indexes: Sequence[int]) -> "BinnedSpectraSequence":
+        """The binned spectra at `indexes`, which are read lazily too."""
+        indexes = np.asarray(indexes, dtype=np.int64)
+        return BinnedSpectraSequence(
+            self._store,
+            self._shards,
+            [self.metadata[i] for i in indexes],
+            self._shard_indexes[indexes],
+            self._rows[indexes],
+            self._shard_arrays,
+        )
+
+
+def binned_spectra_metadata(binned_spectra: Sequence[BinnedSpectrum]) -> List[Dict]:
+    """Metadata of the binned spectra, without reading the peaks of the ones of a
+    `BinnedSpectraSequence`."""
+    if isinstance(binned_spectra, BinnedSpectraSequence):
+        return binned_spectra.metadata
+    return [spectrum.metadata for spectrum in binned_spectra]
+
+
+def read_binned_spectra(
+    fs_dgw: MS2DeepScoreFSDataGateway, path: str
+) -> Sequence[BinnedSpectrum]:
+    """Reads the binned spectra saved to `path`. The ones saved in shards are read
+    lazily, as a `BinnedSpectraSequence`."""
+    if is_sharded(path):
+        return BinnedSpectraSequence.from_store(BinnedSpectraStore(fs_dgw, path))
+    return fs_dgw.read_from_file(path)
+
+
+def read_binned_spectra_metadata(
+    fs_dgw: MS2DeepScoreFSDataGateway, path: str
+) -> Iterator[Dict]:
+    if is_sharded(path):
+        return BinnedSpectraStore(fs_dgw, path).iterate_metadata()
+    return (spectrum.metadata for spectrum in fs_dgw.read_from_file(path))
@@ -1,8 +1,11 @@
 from dataclasses import dataclass
-from typing import Set
+from typing import Optional, Set
 
 from prefect import Task
 
+from omigami.spectra_matching.ms2deepscore.helper_classes.tanimoto_matrix import (
+    ScoreDtypes,
+)
 from omigami.spectra_matching.ms2deepscore.helper_classes.tanimoto_score_calculator import (
     TanimotoScoreCalculator,
 )
@@ -15,10 +18,33 @@ from omigami.utils import merge_prefect_task_configs
 
 @dataclass
 class CalculateTanimotoScoreParameters:
+    """
+    scores_output_path:
+        Where the scores are saved. A .npy path saves them as a matrix of
+        `scores_dtype`, memory-mapped when it is read from the local filesystem,
+        any other one as a gzip compressed DataFrame
+    binned_spectra_path:
+        Path of the binned spectra whose InChIKeys are scored
+    n_bits:
+        Number of bits of the molecular fingerprints
+    decimals:
+        Decimals the scores of the DataFrame are rounded to
+    n_processes:
+        Number of processes the scores are computed in
+    scores_dtype:
+        Either "float16" or "uint8", the scores quantized to steps of 1/255
+    fingerprints_path:
+        Path of the fingerprint store shared by all runs. If given, only the
+        fingerprints of the compounds that are not in it yet are derived
+    """
+
     scores_output_path: str
     binned_spectra_path: str
     n_bits: int = 2048
     decimals: int = 5
+    n_processes: int = 1
+    scores_dtype: ScoreDtypes = "float16"
+    fingerprints_path: Optional[str] = None
 
 
 class CalculateTanimotoScore(Task):
@@ -33,6 +59,9 @@ class CalculateTanimotoScore(Task):
         self._binned_spectra_path = parameters.binned_spectra_path
         self._n_bits = parameters.n_bits
         self._decimals = parameters.decimals
+        self._n_processes = parameters.n_processes
+        self._scores_dtype = parameters.scores_dtype
+        self._fingerprints_path = parameters.fingerprints_path
         config = merge_prefect_task_configs(kwargs)
         super().__init__(**config)
 
@@ -57,6 +86,10 @@ class CalculateTanimotoScore(Task):
             fs_dgw=self._fs_dgw,
             n_bits=self._n_bits,
             binned_spectra_path=self._binned_spectra_path,
+            decimals=self._decimals,
+            n_processes=self._n_processes,
+            scores_dtype=self._scores_dtype,
+            fingerprints_path=self._fingerprints_path,
         )
         path = calculator.calculate(
             self._scores_output_path,
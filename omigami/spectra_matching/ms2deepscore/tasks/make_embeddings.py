@@ -3,6 +3,7 @@ from typing import Dict, Set, List
 from prefect import Task
 
 from omigami.config import IonModes
+from omigami.spectra_matching.entities.embedding import normalize_embeddings
 from omigami.spectra_matching.ms2deepscore.embedding import EmbeddingMaker
 from omigami.spectra_matching.ms2deepscore.storage import (
     MS2DeepScoreRedisSpectrumDataGateway,
@@ -20,11 +21,12 @@ class MakeEmbeddings(Task):
         spectrum_dgw: MS2DeepScoreRedisSpectrumDataGateway,
         fs_gtw: MS2DeepScoreFSDataGateway,
         ion_mode: IonModes,
+        batch_size: int = 1024,
         **kwargs,
     ):
         self._spectrum_dgw = spectrum_dgw
         self._fs_gtw = fs_gtw
-        self._embedding_maker = EmbeddingMaker()
+        self._embedding_maker = EmbeddingMaker(batch_size)
         self._ion_mode = ion_mode
 
         config = merge_prefect_task_configs(kwargs)
@@ -40,8 +42,9 @@ class MakeEmbeddings(Task):
         Prefect task to create embeddings from SiameseModel. The process is as follows:
         1. Previous spectra are deleted from the cache,
         2. Binned spectra are read from DB for given spectrum_ids.
-        3. For each binned spectra, embeddings are created using SiameseModel and are
-            cached. Resulting object is an `Embedding` object holding an embedding vector.
+        3. Embeddings are created using SiameseModel in batches of binned spectra and
+            are cached. Resulting object is an `Embedding` object holding an embedding
+            vector normalized to unit length.
 
         Parameters
         ----------
@@ -67,18 +70,18 @@ class MakeEmbeddings(Task):
             f"Loaded {len(binned_spectra)} binned spectra from the database."
         )
 
-        embeddings = []
         siamese_model = self._fs_gtw.load_model(model_path)
-
-        for i, binned_spectrum in enumerate(binned_spectra):
-            embeddings.append(
-                self._embedding_maker.make_embedding(siamese_model, binned_spectrum)
-            )
-
+        embeddings = self._embedding_maker.make_embeddings(
+            siamese_model, binned_spectra
+        )
+        embeddings = normalize_embeddings(embeddings)
         self.logger.info(
             f"Finished creating embeddings. Saving {len(embeddings)} embeddings to "
             f"database."
         )
         self.logger.debug(f"Using Redis DB {REDIS_DB} and model id {run_id}.")
-        self._spectrum_dgw.write_embeddings(embeddings, self._ion_mode, self.logger)
+        self._spectrum_dgw.write_embeddings(
+            embeddings, self._ion_mode, self.logger, run_id=run_id
+        )
+        self._spectrum_dgw.bump_embedding_generation(self._ion_mode)
         return spectrum_ids
@@ -1,8 +1,11 @@
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Set, List
+from itertools import chain
+from typing import Iterable, Iterator, List, Set
 
 import prefect
+from matchms import Spectrum
+from ms2deepscore import BinnedSpectrum
 from prefect import Task
 
 from omigami.common.progress_logger import TaskProgressLogger
@@ -12,15 +15,35 @@ from omigami.spectra_matching.ms2deepscore.helper_classes.spectrum_binner import
 from omigami.spectra_matching.ms2deepscore.helper_classes.spectrum_processor import (
     SpectrumProcessor,
 )
+from omigami.spectra_matching.ms2deepscore.storage.binned_spectra_store import (
+    BinnedSpectraStore,
+    is_sharded,
+)
 from omigami.spectra_matching.storage import DataGateway
 from omigami.utils import merge_prefect_task_configs
 
 
 @dataclass
 class ProcessSpectrumParameters:
+    """
+    spectrum_binner_output_path:
+        Path where the fitted spectrum binner is saved
+    binned_spectra_output_path:
+        Where the binned spectra are saved. A .pkl path pickles them all together,
+        any other one is a directory where they are saved in shards, one per chunk
+        of cleaned spectra
+    n_bins:
+        Number of bins of the spectrum binner
+    n_processes:
+        Number of processes that bin the chunks of spectra in parallel, with the
+        binner fitted on all of them. With 1, they are binned in the task's own
+        process
+    """
+
     spectrum_binner_output_path: str
     binned_spectra_output_path: str
     n_bins: int = 10000
+    n_processes: int = 1
 
 
 class ProcessSpectrum(Task):
@@ -35,6 +58,7 @@ class ProcessSpectrum(Task):
             process_parameters.spectrum_binner_output_path
         )
         self._binned_spectra_output_path = process_parameters.binned_spectra_output_path
+        self._n_processes = process_parameters.n_processes
         self._processor = SpectrumProcessor()
         self._spectrum_binner = MS2DeepScoreSpectrumBinner(process_parameters.n_bins)
         config = merge_prefect_task_configs(kwargs)
@@ -58,23 +82,9 @@ class ProcessSpectrum(Task):
         self.logger.info(
             f"Loading cleaned spectra from directory {Path(cleaned_spectrum_paths[0]).parent}."
         )
-        cleaned_spectra = []
-        for path in cleaned_spectrum_paths:
-            cleaned_spectra += self._fs_gtw.read_from_file(path)
-
-        cleaned_spectra_size = len(cleaned_spectra)
-        self.logger.info(f"Cleaning and binning {cleaned_spectra_size} spectra")
-
-        progress_logger = TaskProgressLogger(
-            self.logger, cleaned_spectra_size, 20, "Process Spectra task progress"
-        )
-        cleaned_spectra = self._processor.process_spectra(
-            cleaned_spectra,
-            process_reference_spectra=True,
-            progress_logger=progress_logger,
+        n_spectra = self._spectrum_binner.fit_chunks(
+            self._process_chunks(cleaned_spectrum_paths)
         )
-        binned_spectra = self._spectrum_binner.bin_spectra(cleaned_spectra)
-
         self.logger.info(
             f"Saving spectrum binner on {self._spectrum_binner_output_path}."
         )
@@ -82,15 +92,65 @@ class ProcessSpectrum(Task):
             self._spectrum_binner_output_path, self._spectrum_binner.spectrum_binner
         )
 
-        if not binned_spectra or len(binned_spectra) == 0:
+        if not n_spectra:
             self.logger.info("No new spectra have been processed.")
-            return {spectrum.get("spectrum_id") for spectrum in cleaned_spectra}
+            return set()
 
         self.logger.info(
-            f"Saving binned spectra on {self._binned_spectra_output_path}."
+            f"Cleaning, binning and saving {n_spectra} binned spectra on "
+            f"{self._binned_spectra_output_path}."
         )
-        self._fs_gtw.serialize_to_file(self._binned_spectra_output_path, binned_spectra)
-
-        self.logger.info(f"Finished processing {len(binned_spectra)} binned spectra.")
-
-        return {spectrum.get("spectrum_id") for spectrum in binned_spectra}
+        progress_logger = TaskProgressLogger(
+            self.logger,
+            len(cleaned_spectrum_paths),
+            20,
+            "Process Spectra task progress",
+        )
+        binned_chunks = self._spectrum_binner.transform_chunks(
+            self._process_chunks(cleaned_spectrum_paths, progress_logger),
+            self._n_processes,
+        )
+        if is_sharded(self._binned_spectra_output_path):
+            spectrum_ids = self._save_shards(binned_chunks)
+        else:
+            binned_spectra = list(chain.from_iterable(binned_chunks))
+            self._fs_gtw.serialize_to_file(
+                self._binned_spectra_output_path, binned_spectra
+            )
+            spectrum_ids = {spectrum.get("spectrum_id") for spectrum in binned_spectra}
+
+        self.logger.info(f"Finished processing {len(spectrum_ids)} binned spectra.")
+        return spectrum_ids
+
+    def _process_chunks(
+        self,
+        cleaned_spectrum_paths: List[str],
+        progress_logger: TaskProgressLogger = None,
+    ) -> Iterator[List[Spectrum]]:
+        """Yields the processed spectra of each chunk of cleaned spectra, reading
+        one chunk at a time. The spectra are processed in each pass over the chunks
+        instead of being kept, since all of them may not fit in memory."""
+        for i, path in enumerate(cleaned_spectrum_paths):
+            yield self._processor.process_spectra(
+                self._fs_gtw.read_from_file(path), process_reference_spectra=True
+            )
+            if progress_logger:
+                progress_logger.log(i)
+
+    def _save_shards(self, binned_chunks: Iterable[List[BinnedSpectrum]]) -> Set[str]:
+        """Saves the binned spectra of each chunk of cleaned spectra to a shard as
+        soon as it is binned. Returns the ids of the saved spectra."""
+        store = BinnedSpectraStore(self._fs_gtw, self._binned_spectra_output_path)
+        shards = []
+        spectrum_ids = set()
+        for i, binned_spectra in enumerate(binned_chunks):
+            if not binned_spectra:
+                continue
+            shard = f"shard_{i}"
+            store.write_shard(shard, binned_spectra)
+            shards.append(shard)
+            spectrum_ids.update(
+                spectrum.get("spectrum_id") for spectrum in binned_spectra
+            )
+        store.save_shards(shards)
+        return spectrum_ids
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Dict
+from typing import Dict, Optional
 
 from pandas import Timestamp
 from prefect import Task
@@ -11,6 +11,7 @@ from omigami.spectra_matching.ms2deepscore.helper_classes.siamese_model_trainer
 )
 from omigami.spectra_matching.ms2deepscore.predictor import MS2DeepScorePredictor
 from omigami.spectra_matching.ms2deepscore.tasks.train_model import TrainModelParameters
+from omigami.spectra_matching.response_cache import make_response_cache
 from omigami.spectra_matching.storage.model_registry import (
     MLFlowDataGateway,
 )
@@ -23,6 +24,8 @@ class RegisterModelParameters:
     model_registry_uri: str
     mlflow_output_path: str
     ion_mode: IonModes
+    response_cache_size: int = 0
+    response_cache_ttl: Optional[int] = None
 
 
 class RegisterModel(Task):
@@ -36,6 +39,8 @@ class RegisterModel(Task):
         self._model_registry_uri = parameters.model_registry_uri
         self._mlflow_output_path = parameters.mlflow_output_path
         self._ion_mode = parameters.ion_mode
+        self._response_cache_size = parameters.response_cache_size
+        self._response_cache_ttl = parameters.response_cache_ttl
         self.training_parameters = training_parameters
         config = merge_prefect_task_configs(kwargs)
         super().__init__(**config)
@@ -75,7 +80,12 @@ class RegisterModel(Task):
         mlflow_dgw = MLFlowDataGateway(self._model_registry_uri)
 
         run_id = mlflow_dgw.register_model(
-            model=MS2DeepScorePredictor(self._ion_mode),
+            model=MS2DeepScorePredictor(
+                self._ion_mode,
+                response_cache=make_response_cache(
+                    self._response_cache_size, self._response_cache_ttl
+                ),
+            ),
             conda_env_path=PREDICTOR_ENV_PATH,
             experiment_name=self._experiment_name,
             experiment_path=self._mlflow_output_path,
@@ -1,15 +1,30 @@
+import time
 from logging import getLogger
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Optional, Sequence, Callable
 
 import flask
+import numpy as np
 from flask import jsonify
 from mlflow.pyfunc import PythonModel
 
-from omigami.spectra_matching.storage import RedisSpectrumDataGateway
+from omigami.spectra_matching.embedding_cache import EmbeddingCache, query_key
+from omigami.spectra_matching.embedding_index import (
+    EmbeddingIndex,
+    EMBEDDING_INDEX_FILE,
+    recall,
+)
+from omigami.spectra_matching.entities.embedding import Embedding, EmbeddingMatrix
+from omigami.spectra_matching.response_cache import ResponseCache, response_key
+from omigami.spectra_matching.storage import RedisSpectrumDataGateway, FSDataGateway
+from omigami.spectra_matching.top_k_scorer import TopKScorer, TopKResult
 
 log = getLogger(__name__)
 SpectrumMatches = Dict[str, Dict[str, Any]]
 
+EXACT_SEARCH = "exact"
+APPROXIMATE_SEARCH = "approximate"
+BENCHMARK_SEARCH = "benchmark"
+
 
 class SpectraMatchingError(Exception):
     status_code = 404
@@ -45,9 +60,22 @@ class SpectraMatchingError(Exception):
 class Predictor(PythonModel):
     _run_id: str
     model: Any
+    ion_mode: str
 
-    def __init__(self, dgw: RedisSpectrumDataGateway = None):
+    def __init__(
+        self,
+        dgw: RedisSpectrumDataGateway = None,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        response_cache: Optional[ResponseCache] = None,
+    ):
         self.dgw = dgw
+        self.embedding_cache = embedding_cache or EmbeddingCache()
+        self.response_cache = response_cache
+        self.reference_embeddings: Optional[EmbeddingMatrix] = None
+        self._reference_generation: Optional[int] = None
+        self.top_k_scorer = TopKScorer()
+        self.embedding_index: Optional[EmbeddingIndex] = None
+        self.n_probe = 8
 
     def predict(self, context, model_input):
         """Match spectra from a json payload input with spectra having the highest
@@ -56,38 +84,276 @@ class Predictor(PythonModel):
         """
         raise NotImplementedError
 
-    def _get_ref_ids_from_data_input(
+    def _predict_with_cache(
+        self,
+        data_input: List[Dict[str, str]],
+        parameters: Optional[Dict],
+        mz_range: int,
+        predict: Callable[[], Dict[str, SpectrumMatches]],
+    ) -> Dict[str, SpectrumMatches]:
+        """Returns the cached response to the same input spectra, parameters and m/z
+        range, if there is a response cache and the reference embeddings were not
+        rewritten since it was cached. Otherwise the response is computed by `predict`
+        and cached.
+
+        Preloaded reference embeddings are loaded again once they are rewritten, so
+        that the responses of the new generation are not computed with stale ones."""
+        if self.response_cache is None and self.reference_embeddings is None:
+            return predict()
+
+        generation = self.dgw.read_embedding_generation(self.ion_mode)
+        if (
+            self.reference_embeddings is not None
+            and generation != self._reference_generation
+        ):
+            self._load_reference_embeddings(generation)
+        if self.response_cache is None:
+            return predict()
+
+        key = response_key(data_input, parameters, mz_range, self._run_id, generation)
+        best_matches = self.response_cache.get(key, self.dgw)
+        if best_matches is not None:
+            log.info("Took the response from the cache.")
+            return best_matches
+
+        best_matches = predict()
+        self.response_cache.put(key, best_matches, self.dgw)
+        return best_matches
+
+    def _load_reference_embeddings(self, generation: int):
+        """Loads the reference embeddings of the ion mode into memory. `generation`
+        is the one read before them."""
+        log.info(f"Loading {self.ion_mode} reference embeddings into memory.")
+        self.reference_embeddings = self.dgw.read_embedding_matrix(self.ion_mode)
+        self._reference_generation = generation
+        log.info(f"Loaded {len(self.reference_embeddings)} reference embeddings.")
+
+    def _get_query_embeddings(
+        self,
+        data_input: List[Dict[str, str]],
+        make_embeddings: Callable[[List[Dict[str, str]]], List[Optional[Embedding]]],
+    ) -> List[Optional[Embedding]]:
+        """Returns the embeddings of the input spectra, taking the ones of spectra
+        submitted before from the embedding cache. `make_embeddings` makes the ones of
+        the other inputs, with None for inputs that can't be embedded."""
+        keys = [query_key(data, self._run_id) for data in data_input]
+        embeddings = [self.embedding_cache.get(key) for key in keys]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            new_embeddings = make_embeddings([data_input[i] for i in missing])
+            for i, embedding in zip(missing, new_embeddings):
+                embeddings[i] = embedding
+                if embedding is not None:
+                    self.embedding_cache.put(keys[i], embedding)
+
+        log.info(
+            f"Took {len(data_input) - len(missing)} of {len(data_input)} query "
+            f"embeddings from the cache."
+        )
+        return embeddings
+
+    @staticmethod
+    def _get_precursor_mz(data_input: List[Dict[str, str]]) -> np.ndarray:
+        return np.array(
+            [float(spectrum["Precursor_MZ"]) for spectrum in data_input],
+            dtype=np.float64,
+        )
+
+    @staticmethod
+    def _check_reference_rows(
+        data_input: List[Dict[str, str]],
+        starts: np.ndarray,
+        stops: np.ndarray,
+        mz_range: int,
+    ):
+        empty_windows = np.flatnonzero(starts == stops)
+        if len(empty_windows) > 0:
+            precursor_mz = data_input[empty_windows[0]]["Precursor_MZ"]
+            raise RuntimeError(
+                f"No data found from filtering with precursor MZ for precursor MZ {precursor_mz}. "
+                f"and mz_range {mz_range}. Try increasing the mz_range filtering."
+            )
+
+    def _get_reference_embeddings(
         self, data_input: List[Dict[str, str]], mz_range: int = 1
-    ) -> List[List[str]]:
-        ref_spectrum_ids = []
-        for i, spectrum in enumerate(data_input):
-            precursor_mz = spectrum["Precursor_MZ"]
-            min_mz, max_mz = (
-                float(precursor_mz) - mz_range,
-                float(precursor_mz) + mz_range,
+    ) -> Tuple[EmbeddingMatrix, np.ndarray, np.ndarray]:
+        """Returns the reference embeddings within the precursor m/z windows of the
+        input spectra, and the `start` and `stop` rows of each window on them. The
+        in-memory embeddings are used if they were preloaded, otherwise only the
+        embeddings within the windows are read from the database.
+        """
+        precursor_mz = self._get_precursor_mz(data_input)
+        min_mz, max_mz = precursor_mz - mz_range, precursor_mz + mz_range
+
+        if self.reference_embeddings is not None:
+            reference_embeddings = self.reference_embeddings
+        else:
+            reference_index, starts, stops = self.dgw.get_spectrum_ids_within_ranges(
+                min_mz, max_mz
+            )
+            self._check_reference_rows(data_input, starts, stops, mz_range)
+            reference_embeddings = self.dgw.read_embedding_matrix(
+                self.ion_mode, reference_index
             )
-            ref_ids = self.dgw.get_spectrum_ids_within_range(min_mz, max_mz)
-            if len(ref_ids) == 0:
-                raise RuntimeError(
-                    f"No data found from filtering with precursor MZ for precursor MZ {precursor_mz}. "
-                    f"and mz_range {mz_range}. Try increasing the mz_range filtering."
+
+        starts, stops = reference_embeddings.rows_within_ranges(min_mz, max_mz)
+        if reference_embeddings is self.reference_embeddings:
+            self._check_reference_rows(data_input, starts, stops, mz_range)
+        return reference_embeddings, starts, stops
+
+    def _calculate_best_matches(
+        self,
+        references: EmbeddingMatrix,
+        queries: List[Embedding],
+        starts: np.ndarray,
+        stops: np.ndarray,
+        n_best_spectra: int = 10,
+        query_keys: List[str] = None,
+    ) -> Dict[str, SpectrumMatches]:
+        """Scores each query against the references within its `[start, stop)` row
+        window and keeps the `n_best_spectra` highest scores. Returns the matches of
+        each query under its key in `query_keys`, which defaults to its spectrum id.
+        """
+        if not queries:
+            return {}
+
+        top_k = self.top_k_scorer.top_k(
+            references.vectors,
+            self._stack_vectors(queries),
+            n_best_spectra,
+            starts,
+            stops,
+            references_normalized=references.normalized,
+        )
+
+        query_keys = query_keys or [query.spectrum_id for query in queries]
+        return self._format_matches(references.spectrum_ids, top_k, query_keys)
+
+    def _load_embedding_index(self, artifacts_directory: str):
+        """Loads the embedding index that the deploy flow saves next to the model
+        artifacts, if there is one."""
+        fs_dgw = FSDataGateway()
+        index_path = f"{artifacts_directory}/{EMBEDDING_INDEX_FILE}"
+        if fs_dgw.exists(index_path):
+            log.info(f"Loading embedding index from {index_path}")
+            self.embedding_index = fs_dgw.read_from_file(index_path)
+            log.info(f"Loaded embedding index of {len(self.embedding_index)} spectra.")
+
+    def _find_best_matches(
+        self,
+        queries: List[Embedding],
+        data_input: List[Dict[str, str]],
+        mz_range: int,
+        n_best_spectra: int,
+        query_keys: List[str],
+        search: str = EXACT_SEARCH,
+    ) -> Dict[str, SpectrumMatches]:
+        """Finds the best matches of each query among the references within its
+        precursor m/z window. `data_input` holds the input spectrum of each query.
+
+        With `approximate` search the embedding index is queried instead of scoring
+        every reference of the windows. The `benchmark` search runs both, logs their
+        durations and the recall of the approximate search, and returns the
+        approximate matches. The exact search is used instead while there is no
+        embedding index or it was built from another generation of the embeddings.
+        """
+        if search != EXACT_SEARCH and self.embedding_index is None:
+            log.warning(f"No embedding index for {search} search, using exact search.")
+            search = EXACT_SEARCH
+        elif search != EXACT_SEARCH:
+            generation = self.dgw.read_embedding_generation(self.ion_mode)
+            if self.embedding_index.generation != generation:
+                log.warning(
+                    f"Embedding index of generation {self.embedding_index.generation} "
+                    f"is stale, the embeddings are of generation {generation}. Using "
+                    f"exact search."
                 )
+                search = EXACT_SEARCH
+
+        if search != APPROXIMATE_SEARCH:
+            start_time = time.perf_counter()
+            references, starts, stops = self._get_reference_embeddings(
+                data_input, mz_range
+            )
+            log.info(f"Loaded {len(references)} reference embeddings.")
+            exact_matches = self._calculate_best_matches(
+                references, queries, starts, stops, n_best_spectra, query_keys
+            )
+            exact_duration = time.perf_counter() - start_time
+            if search == EXACT_SEARCH:
+                return exact_matches
+
+        start_time = time.perf_counter()
+        approximate_matches = self._search_embedding_index(
+            queries, data_input, mz_range, n_best_spectra, query_keys
+        )
+        if search == BENCHMARK_SEARCH:
+            approximate_duration = time.perf_counter() - start_time
+            approximate_recall = recall(
+                [list(approximate_matches[key]) for key in query_keys],
+                [list(exact_matches[key]) for key in query_keys],
+            )
+            log.info(
+                f"Exact search took {exact_duration:.4f}s and approximate search took "
+                f"{approximate_duration:.4f}s with a recall of {approximate_recall}."
+            )
+        return approximate_matches
+
+    def _search_embedding_index(
+        self,
+        queries: List[Embedding],
+        data_input: List[Dict[str, str]],
+        mz_range: int,
+        n_best_spectra: int,
+        query_keys: List[str],
+    ) -> Dict[str, SpectrumMatches]:
+        """Queries the embedding index and keeps only the matches within each
+        query's precursor m/z window."""
+        if not queries:
+            return {}
+
+        precursor_mz = self._get_precursor_mz(data_input)
+        top_k = self.embedding_index.search(
+            self._stack_vectors(queries),
+            n_best_spectra,
+            self.n_probe,
+            precursor_mz - mz_range,
+            precursor_mz + mz_range,
+        )
+        return self._format_matches(
+            self.embedding_index.spectrum_ids, top_k, query_keys
+        )
 
-            ref_spectrum_ids.append(ref_ids)
+    @staticmethod
+    def _stack_vectors(embeddings: List[Embedding]) -> np.ndarray:
+        return np.vstack([np.ravel(embedding.vector) for embedding in embeddings])
 
-        return ref_spectrum_ids
+    @staticmethod
+    def _format_matches(
+        spectrum_ids: Sequence[str], top_k: List[TopKResult], query_keys: List[str]
+    ) -> Dict[str, SpectrumMatches]:
+        best_matches = {}
+        for key, (rows, scores) in zip(query_keys, top_k):
+            best_matches[key] = {
+                spectrum_ids[row]: {"score": float(score)}
+                for row, score in zip(rows, scores)
+            }
+        return best_matches
 
     def _add_metadata(
-        self, best_matches: Dict[str, SpectrumMatches]
+        self,
+        best_matches: Dict[str, SpectrumMatches],
+        include_metadata: Optional[List[str]] = None,
     ) -> Dict[str, SpectrumMatches]:
-        spectrum_ids = [key for match in best_matches.values() for key in match.keys()]
+        """Adds the metadata of the matched spectra to their matches, only the fields
+        in `include_metadata` if it is given."""
+        spectrum_ids = {key for match in best_matches.values() for key in match.keys()}
 
-        spectra = self.dgw.read_spectra(set(spectrum_ids))
-        spectra = {spectrum.metadata["spectrum_id"]: spectrum for spectrum in spectra}
+        metadata = self.dgw.read_spectra_metadata(spectrum_ids, include_metadata)
 
         for matches in best_matches.values():
             for spectrum_id in matches.keys():
-                matches[spectrum_id]["metadata"] = spectra[spectrum_id].metadata
+                matches[spectrum_id]["metadata"] = metadata[spectrum_id]
 
         return best_matches
 
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from omigami.spectra_matching.storage import RedisSpectrumDataGateway
+
+
+def response_key(
+    data_input: List[Dict],
+    parameters: Optional[Dict],
+    mz_range: int,
+    run_id: Optional[str],
+    embedding_generation: int,
+) -> str:
+    """Key of the response to a prediction: a hash of its input spectra, parameters
+    and m/z range, the run id of the model and the generation of the reference
+    embeddings, so that the responses computed before the embeddings were rewritten
+    are not used anymore."""
+    payload = json.dumps(
+        [data_input, parameters, mz_range, run_id, embedding_generation],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class ResponseCache:
+    """Cache of the responses of predictions, so that identical requests don't
+    score the queries against the reference embeddings again.
+
+    The responses are kept pickled in a least recently used cache in the process,
+    and with `redis_ttl` also in Redis, where they are shared by the replicas of the
+    model and expire after `redis_ttl` seconds.
+
+    Parameters
+    ----------
+    max_size:
+        Number of responses kept in the process. The least recently used ones are
+        dropped first.
+    redis_ttl:
+        Seconds the responses are kept in Redis. If None, they are not written to
+        Redis.
+    """
+
+    def __init__(self, max_size: int = 1000, redis_ttl: Optional[int] = None):
+        self.max_size = max_size
+        self.redis_ttl = redis_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getstate__(self):
+        # the predictors are pickled with their cache, which starts empty when loaded
+        state = self.__dict__.copy()
+        state.update(hits=0, misses=0, _entries=OrderedDict())
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+    def get(self, key: str, dgw: RedisSpectrumDataGateway) -> Optional[Any]:
+        """Returns a copy of the cached response, looking it up in Redis if it is not
+        in the process."""
+        with self._lock:
+            response = self._entries.get(key)
+            if response is not None:
+                self._entries.move_to_end(key)
+
+        if response is None and self.redis_ttl is not None:
+            response = dgw.read_cached_response(key)
+            if response is not None:
+                self._add(key, response)
+
+        with self._lock:
+            if response is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return pickle.loads(response)
+
+    def put(self, key: str, response: Any, dgw: RedisSpectrumDataGateway):
+        response = pickle.dumps(response)
+        self._add(key, response)
+        if self.redis_ttl is not None:
+            dgw.write_cached_response(key, response, self.redis_ttl)
+
+    def _add(self, key: str, response: bytes):
+        with self._lock:
+            self._entries[key] = response
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+def make_response_cache(
+    max_size: int, redis_ttl: Optional[int] = None
+) -> Optional[ResponseCache]:
+    """The response cache of a registered model, or None if it keeps no responses
+    in the process nor in Redis."""
+    if max_size <= 0 and redis_ttl is None:
+        return None
+    return ResponseCache(max_size, redis_ttl)
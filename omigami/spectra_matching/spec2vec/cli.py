@@ -54,6 +54,36 @@ def spec2vec_cli():
     show_default=True,
     help="Missing percentage of ions allowed",
 )
+@click.option(
+    "--document-format",
+    type=click.Choice(["pickle", "tokens"]),
+    default="pickle",
+    show_default=True,
+    help="Format of the spectrum documents, pickled SpectrumDocuments or arrays of "
+    "token ids",
+)
+@click.option(
+    "--corpus-file",
+    is_flag=True,
+    default=False,
+    help="Train the Word2Vec model on a local text file of the documents, whose "
+    "workers are not limited by the GIL",
+)
+@click.option(
+    "--documents-cache-directory",
+    type=str,
+    default=None,
+    required=False,
+    help="Local directory where the document files are cached across runs. If not "
+    "given, they are cached in a temporary directory during training",
+)
+@click.option(
+    "--preload-embeddings",
+    is_flag=True,
+    default=False,
+    help="Load the reference embeddings into the memory of the registered model, "
+    "and again whenever they are rewritten",
+)
 @add_click_options(common_flow_options)
 @add_click_options(common_training_options)
 def training_flow_cli(*args, **kwargs):
@@ -88,6 +118,12 @@ def training_flow_cli(*args, **kwargs):
     show_default=True,
     help="Missing percentage of ions allowed",
 )
+@click.option(
+    "--build-embedding-index",
+    is_flag=True,
+    default=False,
+    help="Build an approximate nearest neighbour index over the embeddings",
+)
 @add_click_options(common_flow_options)
 @add_click_options([dataset_id, ion_mode])
 def deploy_model_cli(*args, **kwargs):
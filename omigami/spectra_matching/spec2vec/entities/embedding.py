@@ -5,4 +5,4 @@ from omigami.spectra_matching.entities.embedding import Embedding
 
 @dataclass
 class Spec2VecEmbedding(Embedding):
-    n_decimals: int
+    n_decimals: int = 2
@@ -0,0 +1,132 @@
+from typing import Iterator, List, Optional
+
+import numpy as np
+from matchms import Spectrum
+
+PEAK = "peak"
+LOSS = "loss"
+
+
+def encode_words(words: List[str]) -> np.ndarray:
+    """Encodes spec2vec words into int32 token ids. The id of a word is made of its
+    m/z digits and its kind, peak or loss, so that it is the same in every chunk of
+    documents without a shared vocabulary: `peak@123.45` is 2 * 12345 and
+    `loss@123.45` is 2 * 12345 + 1."""
+    tokens = np.fromiter(
+        (
+            2 * int(value.replace(".", "")) + (kind == LOSS)
+            for kind, value in (word.split("@") for word in words)
+        ),
+        np.int64,
+        len(words),
+    )
+    return _as_int32(tokens)
+
+
+def encode_mz(mz: np.ndarray, n_decimals: int, kind: str = PEAK) -> np.ndarray:
+    """Encodes m/z values straight into the token ids of their words, without
+    formatting them: the m/z rounded to `n_decimals` as an integer, see
+    `encode_words`. Values that are within float error of halfway between two
+    roundings are formatted, so that they are rounded like in their words."""
+    mz = np.asarray(mz, dtype=np.float64)
+    scaled = mz * 10 ** n_decimals
+    digits = np.rint(scaled)
+    ties = np.flatnonzero(np.abs(np.abs(scaled - digits) - 0.5) < 1e-6)
+    digits[ties] = [
+        float(f"{value:.{n_decimals}f}".replace(".", "")) for value in mz[ties]
+    ]
+    return _as_int32(2 * digits.astype(np.int64) + (kind == LOSS))
+
+
+def _as_int32(tokens: np.ndarray) -> np.ndarray:
+    if len(tokens) and np.abs(tokens).max() > np.iinfo(np.int32).max:
+        raise ValueError("The m/z values have too many digits for int32 token ids.")
+    return tokens.astype(np.int32)
+
+
+def decode_tokens(tokens: np.ndarray, n_decimals: int) -> List[str]:
+    """Decodes token ids made by `encode_words` back into their words."""
+    words = []
+    for token in np.asarray(tokens).tolist():
+        value = token >> 1
+        digits = str(abs(value)).rjust(n_decimals + 1, "0")
+        if n_decimals > 0:
+            digits = f"{digits[:-n_decimals]}.{digits[-n_decimals:]}"
+        sign = "-" if value < 0 else ""
+        words.append(f"{LOSS if token & 1 else PEAK}@{sign}{digits}")
+    return words
+
+
+def make_words(spectrum: Spectrum, n_decimals: int) -> List[str]:
+    """Words of the peaks and losses of the spectrum, like the ones of a
+    `SpectrumDocument`."""
+    words = [f"{PEAK}@{mz:.{n_decimals}f}" for mz in spectrum.peaks.mz]
+    if spectrum.losses is not None:
+        words += [f"{LOSS}@{mz:.{n_decimals}f}" for mz in spectrum.losses.mz]
+    return words
+
+
+class TokenDocument:
+    """A spectrum document as token ids and weights, in place of a
+    `SpectrumDocument`. It has the `words`, `weights` and `n_decimals` that Word2Vec
+    and `calc_vector` use, and only the spectrum id of the metadata.
+
+    Parameters
+    ----------
+    tokens:
+        Token id of each word of the document, see `encode_words`
+    weights:
+        Weight of each word of the document
+    n_decimals:
+        Number of decimals of the m/z values of the words
+    spectrum_id:
+        Id of the spectrum of the document
+    words:
+        The words of the tokens, if they were already decoded
+    """
+
+    def __init__(
+        self,
+        tokens: np.ndarray,
+        weights: np.ndarray,
+        n_decimals: int,
+        spectrum_id: Optional[str] = None,
+        words: Optional[List[str]] = None,
+    ):
+        self.tokens = tokens
+        self.weights = weights
+        self.n_decimals = n_decimals
+        self.spectrum_id = spectrum_id
+        self._words = words
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.words)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    @property
+    def words(self) -> List[str]:
+        if self._words is None:
+            self._words = decode_tokens(self.tokens, self.n_decimals)
+        return self._words
+
+    def get(self, key: str, default=None):
+        if key == "spectrum_id":
+            return self.spectrum_id
+        return default
+
+    @classmethod
+    def from_spectrum(cls, spectrum: Spectrum, n_decimals: int) -> "TokenDocument":
+        """Document of a spectrum whose intensities are normalized."""
+        weights = spectrum.peaks.intensities
+        if spectrum.losses is not None:
+            weights = np.concatenate([weights, spectrum.losses.intensities])
+        words = make_words(spectrum, n_decimals)
+        return cls(
+            encode_words(words),
+            weights,
+            n_decimals,
+            spectrum.get("spectrum_id"),
+            words,
+        )
@@ -28,7 +28,12 @@ from omigami.spectra_matching.spec2vec.flows.training_flow import (
     TrainingFlowParameters,
     build_training_flow,
 )
+from omigami.spectra_matching.spec2vec.storage.token_documents import (
+    DocumentFormats,
+)
+from omigami.spectra_matching.derivation_cache import DERIVATION_CACHE_FILE
 from omigami.spectra_matching.storage import RedisSpectrumDataGateway, FSDataGateway
+from omigami.spectra_matching.tasks import ChunkFormats
 
 
 class Spec2VecFlowFactory:
@@ -69,6 +74,16 @@ class Spec2VecFlowFactory:
         schedule: pd.Timedelta = None,
         ion_mode: IonModes = "positive",
         chunk_size: int = CHUNK_SIZE,
+        incremental: bool = False,
+        chunk_format: ChunkFormats = "json",
+        chunk_all_ion_modes: bool = False,
+        cleaning_processes: int = 1,
+        corpus_file: bool = False,
+        documents_cache_directory: Optional[str] = None,
+        document_format: DocumentFormats = "pickle",
+        preload_embeddings: bool = False,
+        response_cache_size: int = 0,
+        response_cache_ttl: Optional[int] = None,
     ) -> Flow:
         """Creates all configuration/gateways objects used by the training flow, and builds
         the training flow with them.
@@ -95,6 +110,9 @@ class Spec2VecFlowFactory:
 
         source_uri = GNPS_URIS[dataset_id]
         dataset_id = DATASET_IDS[dataset_id].format(date=datetime.today())
+        manifest_directory = (
+            f"{self._dataset_directory}/manifests" if incremental else None
+        )
         flow_parameters = TrainingFlowParameters(
             fs_dgw=fs_dgw,
             dataset_directory=f"{self._dataset_directory}/{dataset_id}",
@@ -115,6 +133,17 @@ class Spec2VecFlowFactory:
             model_registry_uri=self._model_registry_uri,
             mlflow_output_directory=self._mlflow_output_directory,
             experiment_name=project_name,
+            derivation_cache_path=f"{self._dataset_directory}/{DERIVATION_CACHE_FILE}",
+            manifest_directory=manifest_directory,
+            chunk_format=chunk_format,
+            chunk_all_ion_modes=chunk_all_ion_modes,
+            cleaning_processes=cleaning_processes,
+            corpus_file=corpus_file,
+            documents_cache_directory=documents_cache_directory,
+            document_format=document_format,
+            preload_embeddings=preload_embeddings,
+            response_cache_size=response_cache_size,
+            response_cache_ttl=response_cache_ttl,
         )
 
         training_flow = build_training_flow(
@@ -135,6 +164,7 @@ class Spec2VecFlowFactory:
         dataset_id: str,
         n_decimals: int = 2,
         ion_mode: IonModes = "positive",
+        build_embedding_index: bool = False,
     ) -> Flow:
         """Creates all configuration/gateways objects used by the model deployment flow,
         and builds the training flow with them.
@@ -178,6 +208,7 @@ class Spec2VecFlowFactory:
             redis_db=redis_db,
             model_registry_uri=self._model_registry_uri,
             dataset_directory=dataset_directory,
+            build_embedding_index=build_embedding_index,
         )
 
         deploy_model_flow = build_deploy_model_flow(
@@ -4,6 +4,10 @@ from prefect import Flow
 
 from omigami.config import IonModes, ION_MODES, MLFLOW_SERVER
 from omigami.flow_config import FlowConfig
+from omigami.spectra_matching.spec2vec import SPEC2VEC_PROJECT_NAME
+from omigami.spectra_matching.spec2vec.storage.token_documents import (
+    DocumentFormats,
+)
 from omigami.spectra_matching.spec2vec.tasks import (
     CreateDocuments,
     TrainModel,
@@ -19,9 +23,13 @@ from omigami.spectra_matching.tasks import (
     DownloadData,
     DownloadParameters,
     ChunkingParameters,
+    ChunkFormats,
     CreateChunks,
     CleanRawSpectra,
+    MergeDerivationCache,
     CleanRawSpectraParameters,
+    ReuseCleanedSpectra,
+    ReuseCleanedSpectraParameters,
 )
 
 
@@ -44,6 +52,17 @@ class TrainingFlowParameters:
         dataset_name: str = "gnps.json",
         model_name: Optional[str] = "spec2vec-model",
         experiment_name: str = "default",
+        preload_embeddings: bool = False,
+        chunk_format: ChunkFormats = "json",
+        chunk_all_ion_modes: bool = False,
+        cleaning_processes: int = 1,
+        derivation_cache_path: Optional[str] = None,
+        manifest_directory: Optional[str] = None,
+        corpus_file: bool = False,
+        documents_cache_directory: Optional[str] = None,
+        document_format: DocumentFormats = "pickle",
+        response_cache_size: int = 0,
+        response_cache_ttl: Optional[int] = None,
     ):
         self.fs_dgw = fs_dgw
         self.ion_mode = ion_mode
@@ -60,17 +79,36 @@ class TrainingFlowParameters:
             output_directory=f"{dataset_directory}/raw/{ion_mode}",
             chunk_size=chunk_size,
             ion_mode=ion_mode,
+            chunk_format=chunk_format,
+            chunk_all_ion_modes=chunk_all_ion_modes,
+            manifest_directory=manifest_directory,
         )
         self.clean_raw_spectra = CleanRawSpectraParameters(
-            output_directory=f"{dataset_directory}/cleaned/{ion_mode}"
+            output_directory=f"{dataset_directory}/cleaned/{ion_mode}",
+            n_processes=cleaning_processes,
+            derivation_cache_path=derivation_cache_path,
+            derivation_namespace=f"{SPEC2VEC_PROJECT_NAME}/{ion_mode}",
         )
+        self.reuse_cleaned_spectra = None
+        if manifest_directory is not None:
+            self.reuse_cleaned_spectra = ReuseCleanedSpectraParameters(
+                raw_directory=self.chunking.output_directory,
+                output_directory=self.clean_raw_spectra.output_directory,
+                manifest_directory=manifest_directory,
+                ion_mode=ion_mode,
+            )
         self.create_documents = CreateDocumentsParameters(
             output_directory=documents_save_directory,
             ion_mode=ion_mode,
             n_decimals=n_decimals,
+            document_format=document_format,
         )
         self.training = TrainModelParameters(
-            mlflow_output_directory, iterations, window
+            mlflow_output_directory,
+            iterations,
+            window,
+            documents_cache_directory=documents_cache_directory,
+            corpus_file=corpus_file,
         )
         self.registering = RegisterModelParameters(
             experiment_name=experiment_name,
@@ -81,6 +119,9 @@ class TrainingFlowParameters:
             intensity_weighting_power=intensity_weighting_power,
             allowed_missing_percentage=allowed_missing_percentage,
             model_name=model_name,
+            preload_embeddings=preload_embeddings,
+            response_cache_size=response_cache_size,
+            response_cache_ttl=response_cache_ttl,
         )
 
 
@@ -124,6 +165,16 @@ def build_training_flow(
             flow_parameters.fs_dgw, flow_parameters.clean_raw_spectra
         ).map(raw_spectra_paths)
 
+        if flow_parameters.clean_raw_spectra.derivation_cache_path is not None:
+            cleaned_spectra_paths = MergeDerivationCache(
+                flow_parameters.fs_dgw, flow_parameters.clean_raw_spectra
+            )(cleaned_spectra_paths)
+
+        if flow_parameters.reuse_cleaned_spectra is not None:
+            cleaned_spectra_paths = ReuseCleanedSpectra(
+                flow_parameters.fs_dgw, flow_parameters.reuse_cleaned_spectra
+            )(cleaned_spectra_paths)
+
         document_paths = CreateDocuments(
             flow_parameters.fs_dgw,
             flow_parameters.create_documents,
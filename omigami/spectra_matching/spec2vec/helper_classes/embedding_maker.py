@@ -1,24 +1,69 @@
-from typing import Union
+from typing import List, Optional, Sequence, Union
 
+import numpy as np
 from gensim.models import Word2Vec
+from scipy.sparse import csr_matrix
 from spec2vec import SpectrumDocument
 from spec2vec.vector_operations import calc_vector
 
 from omigami.spectra_matching.spec2vec.entities.embedding import Spec2VecEmbedding
+from omigami.spectra_matching.spec2vec.entities.token_document import (
+    TokenDocument,
+    decode_tokens,
+    encode_words,
+)
+from omigami.spectra_matching.spec2vec.storage.token_documents import TokenDocuments
 
 
 class EmbeddingMakerError(Exception):
     pass
 
 
+class VocabularyTable:
+    """Lookup table from the token ids of the words of a model's vocabulary to the
+    rows of their vectors, so that token documents are mapped to the vectors with
+    array indexing alone, without making or looking up their words.
+
+    Parameters
+    ----------
+    model:
+        Model trained on spectrum documents
+    """
+
+    def __init__(self, model: Word2Vec):
+        self.model = model
+        words = list(model.wv.vocab)
+        tokens = encode_words(words).astype(np.int64)
+        self._offset = min(tokens.min(initial=0), 0)
+        self._rows = np.full(tokens.max(initial=-1) - self._offset + 1, -1, np.int32)
+        self._rows[tokens - self._offset] = [
+            model.wv.vocab[word].index for word in words
+        ]
+
+    def rows(self, tokens: np.ndarray) -> np.ndarray:
+        """Rows of the vectors of the tokens, or -1 for tokens not in the model."""
+        indices = np.asarray(tokens, dtype=np.int64) - self._offset
+        in_table = (indices >= 0) & (indices < len(self._rows))
+        rows = np.full(len(indices), -1, dtype=np.int64)
+        rows[in_table] = self._rows[indices[in_table]]
+        return rows
+
+
 class EmbeddingMaker:
     def __init__(self, n_decimals: int = 2):
         self.n_decimals = n_decimals
+        self.vocabulary_table: Optional[VocabularyTable] = None
+
+    def load_vocabulary_table(self, model: Word2Vec):
+        """Builds the lookup table of the model's vocabulary, which `make_embeddings`
+        then uses for token documents. If they are made with another model, the
+        table is rebuilt for it."""
+        self.vocabulary_table = VocabularyTable(model)
 
     def make_embedding(
         self,
         model: Word2Vec,
-        document: Union[SpectrumDocument],
+        document: Union[SpectrumDocument, TokenDocument],
         intensity_weighting_power: Union[float, int] = None,
         allowed_missing_percentage: Union[float, int] = None,
     ) -> Spec2VecEmbedding:
@@ -35,11 +80,164 @@ class EmbeddingMaker:
             n_decimals=self.n_decimals,
         )
 
+    def make_embeddings(
+        self,
+        model: Word2Vec,
+        documents: Union[
+            Sequence[Union[SpectrumDocument, TokenDocument]], TokenDocuments
+        ],
+        intensity_weighting_power: Union[float, int] = 0,
+        allowed_missing_percentage: Union[float, int] = 0,
+    ) -> List[Spec2VecEmbedding]:
+        """Makes the embeddings of a batch of documents, the same as `make_embedding`
+        does for each of them.
+
+        The words of all documents are mapped to the rows of the model's vectors at
+        once, each distinct token of `TokenDocuments` being looked up once, and the
+        weighted sums of the vectors of all documents are computed with a single
+        sparse matrix product.
+        """
+        if isinstance(documents, TokenDocuments):
+            self._check_n_decimals(documents)
+            if self.vocabulary_table is not None:
+                if self.vocabulary_table.model is not model:
+                    self.load_vocabulary_table(model)
+                rows = self.vocabulary_table.rows(documents.tokens)
+            else:
+                rows = _token_rows(model, documents.tokens, documents.n_decimals)
+            weights, offsets = documents.weights, documents.offsets
+            spectrum_ids = documents.spectrum_ids
+        else:
+            for document in documents:
+                self._check_n_decimals(document)
+            rows = np.array(
+                [
+                    _word_row(model, word)
+                    for document in documents
+                    for word in document.words
+                ],
+                dtype=np.int64,
+            )
+            n_words = [len(document.words) for document in documents]
+            weights = np.concatenate(
+                [
+                    np.asarray(document.weights, dtype=np.float64)
+                    for document in documents
+                ]
+                or [np.zeros(0)]
+            )
+            offsets = np.concatenate([[0], np.cumsum(n_words, dtype=np.int64)])
+            spectrum_ids = [document.get("spectrum_id") for document in documents]
+
+        vectors = calc_vectors(
+            model.wv.vectors,
+            rows,
+            weights,
+            offsets,
+            intensity_weighting_power,
+            allowed_missing_percentage,
+        )
+        return [
+            Spec2VecEmbedding(
+                vector=vector, spectrum_id=spectrum_id, n_decimals=self.n_decimals
+            )
+            for vector, spectrum_id in zip(vectors, spectrum_ids)
+        ]
+
     def _check_n_decimals(
         self,
-        document: SpectrumDocument,
+        document: Union[SpectrumDocument, TokenDocument, TokenDocuments],
     ):
         if self.n_decimals != document.n_decimals:
             raise EmbeddingMakerError(
                 "Decimal rounding of input data does not agree with model vocabulary."
             )
+
+
+def calc_vectors(
+    word_vectors: np.ndarray,
+    rows: np.ndarray,
+    weights: np.ndarray,
+    offsets: np.ndarray,
+    intensity_weighting_power: Union[float, int] = 0,
+    allowed_missing_percentage: Union[float, int] = 0,
+) -> np.ndarray:
+    """Computes the vectors of a batch of documents like `calc_vector` does for each
+    of them: the sums of the vectors of their words in the model, weighted by the
+    weights of the words raised to `intensity_weighting_power`. If the raised
+    weights of the words of a document that are not in the model are more than
+    `allowed_missing_percentage` of its total, an AssertionError is raised.
+
+    Parameters
+    ----------
+    word_vectors:
+        Vectors of the words of the model
+    rows:
+        Row of `word_vectors` of each word of the documents, or -1 if the word is
+        not in the model
+    weights:
+        Weight of each word of the documents
+    offsets:
+        Offset of the words of each document, and their total number
+
+    Returns
+    -------
+    Matrix of the vectors of the documents, one row each
+
+    """
+    assert (
+        len(weights) == 0 or weights.max() <= 1.0
+    ), "Weights are not normalized to unity as expected."
+    assert (
+        0 <= allowed_missing_percentage <= 100.0
+    ), "allowed_missing_percentage must be within [0,100]"
+
+    n_documents = len(offsets) - 1
+    n_words = np.diff(offsets)
+    word_documents = np.repeat(np.arange(n_documents), n_words)
+    raised_weights = np.power(
+        np.asarray(weights, dtype=np.float64), intensity_weighting_power
+    )
+    in_model = rows >= 0
+
+    weights_in_model = np.bincount(
+        word_documents[in_model], raised_weights[in_model], minlength=n_documents
+    )
+    weights_missing = np.bincount(
+        word_documents[~in_model], raised_weights[~in_model], minlength=n_documents
+    )
+    has_missing = np.bincount(word_documents[~in_model], minlength=n_documents) > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        missing_percentage = (
+            100 * weights_missing / (weights_in_model + weights_missing)
+        )
+    assert not np.any(
+        has_missing & ~(missing_percentage <= allowed_missing_percentage)
+    ), (
+        "Missing percentage is larger than set maximum.",
+        "Consider retraining the used model or increasing the allowed percentage.",
+    )
+
+    # the weighted sums of the vectors of each document, as the product of the
+    # sparse matrix of the raised weights of its words with the model's vectors
+    document_weights = csr_matrix(
+        (raised_weights[in_model], (word_documents[in_model], rows[in_model])),
+        shape=(n_documents, len(word_vectors)),
+    )
+    return np.asarray(document_weights @ word_vectors, dtype=np.float64)
+
+
+def _word_row(model: Word2Vec, word: str) -> int:
+    vocab = model.wv.vocab.get(word)
+    return -1 if vocab is None else vocab.index
+
+
+def _token_rows(model: Word2Vec, tokens: np.ndarray, n_decimals: int) -> np.ndarray:
+    """Rows of the vectors of the tokens in the model, looking each distinct token
+    up once."""
+    vocabulary, inverse = np.unique(tokens, return_inverse=True)
+    vocabulary_rows = np.array(
+        [_word_row(model, word) for word in decode_tokens(vocabulary, n_decimals)],
+        dtype=np.int64,
+    )
+    return vocabulary_rows[inverse]
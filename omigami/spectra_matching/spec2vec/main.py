@@ -7,6 +7,10 @@ from omigami.config import IonModes
 from omigami.deployer import FlowDeployer
 from omigami.spectra_matching.spec2vec import SPEC2VEC_PROJECT_NAME
 from omigami.spectra_matching.spec2vec.factory import Spec2VecFlowFactory
+from omigami.spectra_matching.spec2vec.storage.token_documents import (
+    DocumentFormats,
+)
+from omigami.spectra_matching.tasks import ChunkFormats
 from omigami.spectra_matching.util import run_local_training_flow
 
 
@@ -23,6 +27,16 @@ def run_spec2vec_training_flow(
     schedule: Optional[pd.Timedelta] = None,
     dataset_directory: str = None,
     local: bool = False,
+    incremental: bool = False,
+    chunk_format: ChunkFormats = "json",
+    chunk_all_ion_modes: bool = False,
+    cleaning_processes: int = 1,
+    corpus_file: bool = False,
+    documents_cache_directory: Optional[str] = None,
+    document_format: DocumentFormats = "pickle",
+    preload_embeddings: bool = False,
+    response_cache_size: int = 0,
+    response_cache_ttl: Optional[int] = None,
 ) -> Tuple[str, str]:
     """
     Builds, deploys, and runs a Spec2Vec model training flow.
@@ -50,6 +64,16 @@ def run_spec2vec_training_flow(
         intensity_weighting_power=intensity_weighting_power,
         allowed_missing_percentage=allowed_missing_percentage,
         schedule=schedule,
+        incremental=incremental,
+        chunk_format=chunk_format,
+        chunk_all_ion_modes=chunk_all_ion_modes,
+        cleaning_processes=cleaning_processes,
+        corpus_file=corpus_file,
+        documents_cache_directory=documents_cache_directory,
+        document_format=document_format,
+        preload_embeddings=preload_embeddings,
+        response_cache_size=response_cache_size,
+        response_cache_ttl=response_cache_ttl,
     )
     if local is True:
         flow_run = run_local_training_flow(flow, SPEC2VEC_PROJECT_NAME)
@@ -72,6 +96,7 @@ def run_deploy_spec2vec_model_flow(
     n_decimals: int,
     intensity_weighting_power: float,
     allowed_missing_percentage: float,
+    build_embedding_index: bool = False,
 ) -> Tuple[str, str]:
     """
     Builds, deploys, and runs a model deployment flow.
@@ -97,6 +122,7 @@ def run_deploy_spec2vec_model_flow(
         n_decimals=n_decimals,
         intensity_weighting_power=intensity_weighting_power,
         allowed_missing_percentage=allowed_missing_percentage,
+        build_embedding_index=build_embedding_index,
     )
 
     flow_parameters = {"ModelRunID": model_run_id}
@@ -1,28 +1,26 @@
 from logging import getLogger
+from pathlib import Path
 from typing import Union, List, Dict, Tuple, Optional
 
 import numpy as np
 from gensim.models import Word2Vec
-from matchms import calculate_scores
 from matchms.filtering import normalize_intensities
 from matchms.importing.load_from_json import as_spectrum
 
+from omigami.spectra_matching.embedding_cache import EmbeddingCache
+from omigami.spectra_matching.response_cache import ResponseCache
 from omigami.spectra_matching.predictor import (
     Predictor,
     SpectrumMatches,
     SpectraMatchingError,
+    EXACT_SEARCH,
 )
 from omigami.spectra_matching.spec2vec import SPEC2VEC_PROJECT_NAME
 from omigami.spectra_matching.spec2vec.entities.embedding import Spec2VecEmbedding
-from omigami.spectra_matching.spec2vec.entities.spectrum_document import (
-    SpectrumDocumentData,
-)
 from omigami.spectra_matching.spec2vec.helper_classes.embedding_maker import (
     EmbeddingMaker,
 )
-from omigami.spectra_matching.spec2vec.helper_classes.similarity_score_calculator import (
-    Spec2VecSimilarityScoreCalculator,
-)
+from omigami.spectra_matching.spec2vec.storage.token_documents import TokenDocuments
 from omigami.spectra_matching.storage import RedisSpectrumDataGateway, FSDataGateway
 
 log = getLogger(__name__)
@@ -37,6 +35,10 @@ class Spec2VecPredictor(Predictor):
         allowed_missing_percentage: Union[float, int],
         run_id: str = None,
         model: Optional[Word2Vec] = None,
+        preload_embeddings: bool = False,
+        embedding_cache_size: int = 10000,
+        embedding_cache_bytes: int = 2 ** 26,
+        response_cache: Optional[ResponseCache] = None,
     ):
         self.model = model
         self.ion_mode = ion_mode
@@ -45,15 +47,26 @@ class Spec2VecPredictor(Predictor):
         self.allowed_missing_percentage = allowed_missing_percentage
         self.embedding_maker = EmbeddingMaker(self.n_decimals)
         self._run_id = run_id
-        super().__init__(RedisSpectrumDataGateway(SPEC2VEC_PROJECT_NAME))
+        self.preload_embeddings = preload_embeddings
+        super().__init__(
+            RedisSpectrumDataGateway(SPEC2VEC_PROJECT_NAME),
+            EmbeddingCache(embedding_cache_size, embedding_cache_bytes),
+            response_cache,
+        )
 
     def load_context(self, context):
-        if self.model is not None:
-            return
-        model_path = context.artifacts["word2vec_model"]
-        log.info(f"Loading model from {model_path}")
-        fs_dgw = FSDataGateway()
-        self.model = fs_dgw.read_from_file(model_path)
+        if self.model is None:
+            model_path = context.artifacts["word2vec_model"]
+            log.info(f"Loading model from {model_path}")
+            fs_dgw = FSDataGateway()
+            self.model = fs_dgw.read_from_file(model_path)
+            self._load_embedding_index(str(Path(model_path).parent))
+        self.embedding_maker.load_vocabulary_table(self.model)
+
+        if self.preload_embeddings:
+            self._load_reference_embeddings(
+                self.dgw.read_embedding_generation(self.ion_mode)
+            )
 
     def predict(
         self,
@@ -68,54 +81,49 @@ class Spec2VecPredictor(Predictor):
         try:
             log.info("Creating a prediction.")
             data_input, parameters = self._parse_input(data_input_and_parameters)
-            log.info("Pre-processing data.")
-            input_spectra_embeddings = self._pre_process_data(data_input)
-
-            log.info("Loading reference embeddings.")
-            reference_spectra_ids = self._get_ref_ids_from_data_input(
-                data_input, mz_range
+            return self._predict_with_cache(
+                data_input,
+                parameters,
+                mz_range,
+                lambda: self._match_spectra(data_input, parameters, mz_range),
             )
-            log.info(f"Loaded {len(reference_spectra_ids)} IDs from the database.")
-            reference_embeddings = self._load_unique_ref_embeddings(
-                reference_spectra_ids
-            )
-            log.info(
-                f"Loaded {len(reference_embeddings)} embeddings from the database."
-            )
-
-            log.info("Calculating best matches.")
-            best_matches = {}
-
-            for i, input_spectrum in enumerate(input_spectra_embeddings):
-
-                input_spectrum_ref_emb = self._get_input_ref_embeddings(
-                    reference_spectra_ids[i], reference_embeddings
-                )
-
-                best_matches_data = {
-                    "references": input_spectrum_ref_emb,
-                    "query": input_spectrum,
-                }
-
-                if parameters.get("n_best_spectra"):
-                    best_matches_data["n_best_spectra"] = parameters.get(
-                        "n_best_spectra"
-                    )
-
-                spectrum_best_matches = self._calculate_best_matches(
-                    **best_matches_data
-                )
+        except Exception as e:
+            raise SpectraMatchingError(str(e), 1, 500)
 
-                best_matches[
-                    input_spectrum.spectrum_id or f"spectrum-{i}"
-                ] = spectrum_best_matches
+    def _match_spectra(
+        self,
+        data_input: List[Dict[str, str]],
+        parameters: Dict,
+        mz_range: int,
+    ) -> Dict[str, SpectrumMatches]:
+        log.info("Pre-processing data.")
+        input_spectra_embeddings = self._get_query_embeddings(
+            data_input, self._pre_process_data
+        )
 
-            best_matches = self._add_metadata(best_matches)
+        log.info("Calculating best matches.")
+        queries = [
+            i
+            for i, embedding in enumerate(input_spectra_embeddings)
+            if embedding is not None
+        ]
+        best_matches = self._find_best_matches(
+            [input_spectra_embeddings[i] for i in queries],
+            [data_input[i] for i in queries],
+            mz_range,
+            parameters.get("n_best_spectra") or 10,
+            query_keys=[
+                input_spectra_embeddings[i].spectrum_id or f"spectrum-{i}"
+                for i in queries
+            ],
+            search=parameters.get("search") or EXACT_SEARCH,
+        )
+        best_matches = self._add_metadata(
+            best_matches, parameters.get("include_metadata")
+        )
 
-            log.info("Finishing prediction.")
-            return best_matches
-        except Exception as e:
-            raise SpectraMatchingError(str(e), 1, 500)
+        log.info("Finishing prediction.")
+        return best_matches
 
     @staticmethod
     def _parse_input(
@@ -129,67 +137,29 @@ class Spec2VecPredictor(Predictor):
 
     def _pre_process_data(
         self, data_input: List[Dict[str, str]]
-    ) -> List[Spec2VecEmbedding]:
-        embeddings = []
+    ) -> List[Optional[Spec2VecEmbedding]]:
+        """Creates the embeddings of the input spectra. The embedding of an input that
+        can't be parsed into a spectrum is None, so the embeddings stay aligned with
+        the inputs."""
+        spectra = []
         for data in data_input:
             raw_spectrum = as_spectrum(data)
-            if raw_spectrum:
-                norm_spectrum = normalize_intensities(raw_spectrum)
-                spectrum_data = SpectrumDocumentData(norm_spectrum, self.n_decimals)
-                embeddings.append(
-                    self.embedding_maker.make_embedding(
-                        self.model,
-                        spectrum_data.document,
-                        self.intensity_weighting_power,
-                        self.allowed_missing_percentage,
-                    )
-                )
-        return embeddings
-
-    def _load_unique_ref_embeddings(
-        self, spectrum_ids: List[List[str]]
-    ) -> Dict[str, Spec2VecEmbedding]:
-        unique_ref_ids = set(item for elem in spectrum_ids for item in elem)
-        unique_ref_embeddings = self.dgw.read_embeddings(
-            self.ion_mode, list(unique_ref_ids)
-        )
-        return {emb.spectrum_id: emb for emb in unique_ref_embeddings}
+            spectra.append(
+                normalize_intensities(raw_spectrum) if raw_spectrum else None
+            )
 
-    def _calculate_best_matches(
-        self,
-        references: List[Spec2VecEmbedding],
-        query: Spec2VecEmbedding,
-        n_best_spectra: int = 10,
-    ) -> SpectrumMatches:
-        spec2vec_similarity_score_calculator = Spec2VecSimilarityScoreCalculator(
-            model=self.model,
-            intensity_weighting_power=self.intensity_weighting_power,
-            allowed_missing_percentage=self.allowed_missing_percentage,
-        )
-        scores = calculate_scores(
-            references,
-            [query],
-            spec2vec_similarity_score_calculator,
+        embeddings = iter(
+            self.embedding_maker.make_embeddings(
+                self.model,
+                TokenDocuments.from_spectra(
+                    [spectrum for spectrum in spectra if spectrum is not None],
+                    self.n_decimals,
+                ),
+                self.intensity_weighting_power,
+                self.allowed_missing_percentage,
+            )
         )
-
-        all_scores = scores.scores_by_query(query, sort=True)
-        all_scores = [(em, sc) for em, sc in all_scores if not np.isnan(sc)]
-        spectrum_best_scores = all_scores[:n_best_spectra]
-        spectrum_best_matches = {}
-        for spectrum_match in spectrum_best_scores:
-            spectrum_best_matches[spectrum_match[0].spectrum_id] = {
-                "score": spectrum_match[1]
-            }
-        return spectrum_best_matches
-
-    @staticmethod
-    def _get_input_ref_embeddings(
-        ref_spectrum_ids: List[str],
-        ref_embeddings: Dict[str, Spec2VecEmbedding],
-    ) -> List[Spec2VecEmbedding]:
-        ref_emb_for_input = [
-            ref_embeddings[sp_id]
-            for sp_id in ref_spectrum_ids
-            if sp_id in ref_embeddings
+        embeddings = [
+            None if spectrum is None else next(embeddings) for spectrum in spectra
         ]
-        return ref_emb_for_input
+        return embeddings
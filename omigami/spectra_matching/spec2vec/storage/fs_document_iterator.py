@@ -1,35 +1,187 @@
 from __future__ import annotations
 
-from typing import List
+import hashlib
+import os
+import pickle
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
 
+from drfs import DRPath
+
+from omigami.spectra_matching.spec2vec.storage.token_documents import (
+    TOKEN_DOCUMENTS_FILES,
+    is_token_documents,
+    read_documents,
+)
 from omigami.spectra_matching.storage import FSDataGateway
 
+MANIFEST_FILE = "manifest.pickle"
+# details of a file that change when it is rewritten
+VERSION_KEYS = ("size", "ETag", "LastModified", "mtime")
+
 
 class FileSystemDocumentIterator:
     """An iterator that yields document objects from files one by one to the Word2Vec model for training.
     Reading chunks is not supported by Gensim's Word2Vec model at the moment.
+
+    While the documents of a file are yielded, the next files are read on a
+    background thread. With a cache directory, the files are copied to it the first
+    time they are read, so that the next epochs read them from the local disk, and
+    the number of documents of each file is saved to a manifest there, so that the
+    length of the corpus is known without reading it again. The cached files and
+    counts are keyed by the path and the size, modification time or ETag of the
+    source files, so that a rewritten file is read again. These are looked up once
+    per iterator.
+
+    Parameters
+    ----------
+    fs_dgw:
+        Gateway of the filesystem of the document files
+    document_paths:
+        Paths of the documents of each chunk of spectra, in either format saved by
+        `CreateDocuments`
+    cache_directory:
+        Local directory where the document files are cached. If None, they are
+        read from `fs_dgw` on every pass
+    n_prefetch:
+        Number of files read ahead on the background thread. With 0, the files are
+        read when their documents are needed
     """
 
-    def __init__(self, fs_dgw: FSDataGateway, document_paths: List[str]):
+    def __init__(
+        self,
+        fs_dgw: FSDataGateway,
+        document_paths: List[str],
+        cache_directory: Optional[str] = None,
+        n_prefetch: int = 1,
+    ):
         self._fs_dgw = fs_dgw
         self._document_paths = document_paths
-        self._len = None
+        self._cache_directory = cache_directory
+        self._n_prefetch = n_prefetch
+        self._counts: Dict[str, int] = self._load_manifest()
+        self._keys: Dict[str, str] = {}
 
     def __iter__(self):
-        self._len = 0
-        for doc_path in self._document_paths:
-            documents = self._fs_dgw.read_from_file(doc_path)
-            for document in documents:
-                self._len += 1
-                yield document
+        if self._n_prefetch < 1:
+            for doc_path in self._document_paths:
+                yield from self._read(doc_path)
+            return
 
-        self._has_length = True
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            paths = iter(self._document_paths)
+            reads = deque(
+                executor.submit(self._read, doc_path)
+                for _, doc_path in zip(range(self._n_prefetch), paths)
+            )
+            while reads:
+                documents = reads.popleft().result()
+                next_path = next(paths, None)
+                if next_path is not None:
+                    reads.append(executor.submit(self._read, next_path))
+                yield from documents
 
     def __len__(self):
+        missing = [
+            path for path in self._document_paths if self._key(path) not in self._counts
+        ]
+        for doc_path in missing:
+            self._read(doc_path)
 
-        if not self._len:
-            for doc_path in self._document_paths:
-                documents = self._fs_dgw.read_from_file(doc_path)
-                self._len += len(documents)
+        return sum(self._counts[self._key(path)] for path in self._document_paths)
+
+    def write_corpus_file(self, path: str) -> int:
+        """Writes the words of the documents to a local text file, one document per
+        line, which is the format of the `corpus_file` argument of gensim's
+        Word2Vec. Returns the number of documents written."""
+        n_documents = 0
+        with open(path, "w") as corpus_file:
+            for document in self:
+                corpus_file.write(" ".join(document.words) + "\n")
+                n_documents += 1
+        return n_documents
+
+    def _read(self, doc_path: str) -> Sequence:
+        if self._cache_directory is None:
+            documents = read_documents(self._fs_dgw, doc_path)
+        else:
+            documents = read_documents(FSDataGateway(), self._cache(doc_path))
+
+        key = self._key(doc_path)
+        if key not in self._counts:
+            self._counts[key] = len(documents)
+            self._save_manifest()
+        return documents
+
+    def _key(self, doc_path: str) -> str:
+        """Key of the documents in the cache: the path of their files with the
+        details that change when the files are rewritten. Without a cache directory,
+        the path itself."""
+        if self._cache_directory is None:
+            return doc_path
+
+        if doc_path not in self._keys:
+            if is_token_documents(doc_path):
+                versions = [
+                    self._version(f"{doc_path}/{file_name}")
+                    for file_name in TOKEN_DOCUMENTS_FILES
+                ]
+            else:
+                versions = [self._version(doc_path)]
+            self._keys[doc_path] = hashlib.sha1(
+                repr((str(doc_path), versions)).encode()
+            ).hexdigest()
+        return self._keys[doc_path]
+
+    def _version(self, path: str) -> Tuple:
+        info = self._fs_dgw.info(path)
+        return tuple((key, str(info[key])) for key in VERSION_KEYS if key in info)
+
+    def _cache(self, doc_path: str) -> str:
+        """Copies the documents to the cache directory, if they are not there yet.
+        Returns their path in the cache directory."""
+        name = self._key(doc_path)
+        if not is_token_documents(doc_path):
+            cache_path = os.path.join(self._cache_directory, f"{name}.pickle")
+            self._copy_to_cache(doc_path, cache_path)
+            return cache_path
+
+        cache_path = os.path.join(self._cache_directory, name)
+        os.makedirs(cache_path, exist_ok=True)
+        for file_name in TOKEN_DOCUMENTS_FILES:
+            self._copy_to_cache(
+                f"{doc_path}/{file_name}", os.path.join(cache_path, file_name)
+            )
+        return cache_path
+
+    def _copy_to_cache(self, path: str, cache_path: str):
+        if os.path.exists(cache_path):
+            return
+
+        self._fs_dgw.init_fs(path)
+        with self._fs_dgw.fs.open(DRPath(path), "rb") as f:
+            content = f.read()
+        with open(f"{cache_path}.tmp", "wb") as f:
+            f.write(content)
+        os.replace(f"{cache_path}.tmp", cache_path)
+
+    def _load_manifest(self) -> Dict[str, int]:
+        if self._cache_directory is None:
+            return {}
+
+        os.makedirs(self._cache_directory, exist_ok=True)
+        manifest_path = os.path.join(self._cache_directory, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return {}
+        with open(manifest_path, "rb") as f:
+            return pickle.load(f)
+
+    def _save_manifest(self):
+        if self._cache_directory is None:
+            return
 
-        return self._len
+        manifest_path = os.path.join(self._cache_directory, MANIFEST_FILE)
+        with open(f"{manifest_path}.tmp", "wb") as f:
+            pickle.dump(self._counts, f)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
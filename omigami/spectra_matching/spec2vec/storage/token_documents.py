@@ -0,0 +1,162 @@
+from typing import Iterable, Iterator, List, Union
+
+import numpy as np
+from matchms import Spectrum
+from spec2vec import SpectrumDocument
+from typing_extensions import Literal
+
+from omigami.spectra_matching.spec2vec.entities.token_document import (
+    LOSS,
+    TokenDocument,
+    decode_tokens,
+    encode_mz,
+    encode_words,
+)
+from omigami.spectra_matching.storage import FSDataGateway
+
+DocumentFormats = Literal["pickle", "tokens"]
+
+DOCUMENTS_FILE = "documents.pickle"
+# the files of a directory of token documents, the documents file being saved last
+TOKEN_DOCUMENTS_FILES = ["tokens.npy", "weights.npy", "offsets.npy", DOCUMENTS_FILE]
+
+
+def is_token_documents(path: str) -> bool:
+    """Documents are pickled to a .pickle file, or saved as token ids to a
+    directory."""
+    return not str(path).endswith(".pickle")
+
+
+class TokenDocuments:
+    """The spectrum documents of a chunk of spectra as token ids, instead of
+    pickled `SpectrumDocument`s with their words and a copy of their metadata.
+
+    The int32 token ids and float32 weights of the words of all documents are
+    concatenated, with the offset of the words of each document, and saved as .npy
+    files that are memory-mapped when they are read from the local filesystem. The
+    spectrum ids of the documents are pickled apart.
+
+    Parameters
+    ----------
+    spectrum_ids:
+        Spectrum id of each document
+    n_decimals:
+        Number of decimals of the m/z values of the words
+    tokens:
+        Token ids of the words of all documents, see `encode_words`
+    weights:
+        Weights of the words of all documents
+    offsets:
+        Offset of the words of each document, and their total number
+    """
+
+    def __init__(
+        self,
+        spectrum_ids: List[str],
+        n_decimals: int,
+        tokens: np.ndarray,
+        weights: np.ndarray,
+        offsets: np.ndarray,
+    ):
+        self.spectrum_ids = spectrum_ids
+        self.n_decimals = n_decimals
+        self.tokens = tokens
+        self.weights = weights
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.spectrum_ids)
+
+    def __iter__(self) -> Iterator[TokenDocument]:
+        """Yields the documents, decoding each distinct token of the chunk once."""
+        vocabulary, inverse = np.unique(self.tokens, return_inverse=True)
+        words = decode_tokens(vocabulary, self.n_decimals)
+        for i, spectrum_id in enumerate(self.spectrum_ids):
+            start, stop = self.offsets[i], self.offsets[i + 1]
+            yield TokenDocument(
+                self.tokens[start:stop],
+                self.weights[start:stop],
+                self.n_decimals,
+                spectrum_id,
+                [words[j] for j in inverse[start:stop]],
+            )
+
+    @classmethod
+    def from_documents(
+        cls,
+        documents: Iterable[Union[SpectrumDocument, TokenDocument]],
+        n_decimals: int,
+    ) -> "TokenDocuments":
+        spectrum_ids, tokens, weights = [], [], []
+        for document in documents:
+            spectrum_ids.append(document.get("spectrum_id"))
+            tokens.append(encode_words(document.words))
+            weights.append(document.weights)
+        return cls._concatenate(spectrum_ids, n_decimals, tokens, weights)
+
+    @classmethod
+    def from_spectra(
+        cls, spectra: Iterable[Spectrum], n_decimals: int
+    ) -> "TokenDocuments":
+        """Documents of spectra whose intensities are normalized. Their m/z values are
+        encoded straight into token ids, without making their words."""
+        spectrum_ids, tokens, weights = [], [], []
+        for spectrum in spectra:
+            spectrum_ids.append(spectrum.get("spectrum_id"))
+            spectrum_tokens = [encode_mz(spectrum.peaks.mz, n_decimals)]
+            spectrum_weights = [spectrum.peaks.intensities]
+            if spectrum.losses is not None:
+                spectrum_tokens.append(encode_mz(spectrum.losses.mz, n_decimals, LOSS))
+                spectrum_weights.append(spectrum.losses.intensities)
+            tokens.append(np.concatenate(spectrum_tokens))
+            weights.append(np.concatenate(spectrum_weights))
+        return cls._concatenate(spectrum_ids, n_decimals, tokens, weights)
+
+    @classmethod
+    def _concatenate(
+        cls,
+        spectrum_ids: List[str],
+        n_decimals: int,
+        tokens: List[np.ndarray],
+        weights: List[np.ndarray],
+    ) -> "TokenDocuments":
+        n_words = [len(document_tokens) for document_tokens in tokens]
+        return cls(
+            spectrum_ids,
+            n_decimals,
+            np.concatenate(tokens or [np.zeros(0, dtype=np.int32)]),
+            np.concatenate(weights or [np.zeros(0)]).astype(np.float32),
+            np.concatenate([[0], np.cumsum(n_words, dtype=np.int64)]),
+        )
+
+    def save(self, fs_dgw: FSDataGateway, directory: str):
+        for name, array in zip(
+            TOKEN_DOCUMENTS_FILES, [self.tokens, self.weights, self.offsets]
+        ):
+            fs_dgw.save_array(f"{directory}/{name}", array)
+        fs_dgw.serialize_to_file(
+            f"{directory}/{DOCUMENTS_FILE}",
+            {"spectrum_ids": self.spectrum_ids, "n_decimals": self.n_decimals},
+        )
+
+    @classmethod
+    def load(cls, fs_dgw: FSDataGateway, directory: str) -> "TokenDocuments":
+        documents = fs_dgw.read_from_file(f"{directory}/{DOCUMENTS_FILE}")
+        return cls(
+            documents["spectrum_ids"],
+            documents["n_decimals"],
+            *(
+                fs_dgw.load_array(f"{directory}/{name}")
+                for name in TOKEN_DOCUMENTS_FILES[:3]
+            ),
+        )
+
+
+def read_documents(
+    fs_dgw: FSDataGateway, path: str
+) -> Union[List[SpectrumDocument], TokenDocuments]:
+    """Reads the documents of a chunk of spectra saved by `CreateDocuments`, in
+    either format."""
+    if is_token_documents(path):
+        return TokenDocuments.load(fs_dgw, path)
+    return fs_dgw.read_from_file(path)
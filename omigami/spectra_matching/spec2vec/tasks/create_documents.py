@@ -12,15 +12,33 @@ from omigami.common.progress_logger import (
 from omigami.spectra_matching.spec2vec.entities.spectrum_document import (
     SpectrumDocumentData,
 )
+from omigami.spectra_matching.spec2vec.storage.token_documents import (
+    DOCUMENTS_FILE,
+    DocumentFormats,
+    TokenDocuments,
+)
 from omigami.spectra_matching.storage import FSDataGateway
 from omigami.utils import merge_prefect_task_configs
 
 
 @dataclass
 class CreateDocumentsParameters:
+    """
+    output_directory:
+        Directory where the documents of each chunk of spectra are saved
+    ion_mode:
+        Ion mode of the spectra
+    n_decimals:
+        Number of decimals of the m/z values of the words of the documents
+    document_format:
+        "pickle" to pickle the `SpectrumDocument`s of each chunk to a file, or
+        "tokens" to save them as token ids to a directory, see `TokenDocuments`
+    """
+
     output_directory: str
     ion_mode: str
     n_decimals: int = 2
+    document_format: DocumentFormats = "pickle"
 
 
 class CreateDocuments(Task):
@@ -34,6 +52,7 @@ class CreateDocuments(Task):
         self._n_decimals = parameters.n_decimals
         self._output_directory = parameters.output_directory
         self._ion_mode = parameters.ion_mode
+        self._document_format = parameters.document_format
         config = merge_prefect_task_configs(kwargs)
         super().__init__(**config)
 
@@ -55,8 +74,15 @@ class CreateDocuments(Task):
         document_output_path = (
             f"{self._output_directory}/{DRPath(cleaned_spectra_path).name}"
         )
-
-        if DRPath(document_output_path).exists():
+        # the documents file of token documents is saved last
+        saved_path = document_output_path
+        if self._document_format == "tokens":
+            document_output_path = (
+                f"{self._output_directory}/{DRPath(cleaned_spectra_path).stem}"
+            )
+            saved_path = f"{document_output_path}/{DOCUMENTS_FILE}"
+
+        if DRPath(saved_path).exists():
             self.logger.info(f"Using cached existing file on {document_output_path}")
             return document_output_path
 
@@ -75,7 +101,12 @@ class CreateDocuments(Task):
         # this is weird. if we only use doc.documents why do we need the rest?
         spectrum_documents = [doc.document for doc in documents]
         self.logger.info(f"Saving documents to {document_output_path}.")
-        self._fs_dgw.serialize_to_file(document_output_path, spectrum_documents)
+        if self._document_format == "tokens":
+            TokenDocuments.from_documents(spectrum_documents, self._n_decimals).save(
+                self._fs_dgw, document_output_path
+            )
+        else:
+            self._fs_dgw.serialize_to_file(document_output_path, spectrum_documents)
 
         return document_output_path
 
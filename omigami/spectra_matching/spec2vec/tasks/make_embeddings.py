@@ -4,13 +4,14 @@ from typing import Union, Set
 from gensim.models import Word2Vec
 from prefect import Task
 
-from omigami.common.progress_logger import (
-    TaskProgressLogger,
-)
 from omigami.config import IonModes
+from omigami.spectra_matching.entities.embedding import normalize_embeddings
 from omigami.spectra_matching.spec2vec.helper_classes.embedding_maker import (
     EmbeddingMaker,
 )
+from omigami.spectra_matching.spec2vec.storage.token_documents import (
+    read_documents,
+)
 from omigami.spectra_matching.storage import (
     RedisSpectrumDataGateway,
     FSDataGateway,
@@ -67,36 +68,32 @@ class MakeEmbeddings(Task):
         model_run_id:
             Registered model's `run_id`
         document_path: str
-            Directory which documents are saved
+            Path of the documents of a chunk of spectra, in either format saved by
+            `CreateDocuments`
 
         Returns
         -------
         Set of spectrum_ids
 
         """
-        documents = self._fs_gtw.read_from_file(document_path)
+        documents = read_documents(self._fs_gtw, document_path)
 
         self.logger.info(f"Loaded {len(documents)} documents from filesystem.")
 
-        embeddings = []
-        progress_logger = TaskProgressLogger(
-            self.logger, len(documents), 25, "Make Embeddings task progress"
+        embeddings = self._embedding_maker.make_embeddings(
+            model,
+            documents,
+            self._intensity_weighting_power,
+            self._allowed_missing_percentage,
         )
 
-        for i, document in enumerate(documents):
-            embeddings.append(
-                self._embedding_maker.make_embedding(
-                    model,
-                    document,
-                    self._intensity_weighting_power,
-                    self._allowed_missing_percentage,
-                )
-            )
-            progress_logger.log(i)
-
+        embeddings = normalize_embeddings(embeddings)
         self.logger.info(
             f"Finished creating embeddings. Saving {len(embeddings)} embeddings to database."
         )
         self.logger.debug(f"Using Redis DB {REDIS_DB} and model id {model_run_id}.")
-        self._spectrum_dgw.write_embeddings(embeddings, self._ion_mode, self.logger)
-        return set(doc.get("spectrum_id") for doc in documents)
+        self._spectrum_dgw.write_embeddings(
+            embeddings, self._ion_mode, self.logger, run_id=model_run_id
+        )
+        self._spectrum_dgw.bump_embedding_generation(self._ion_mode)
+        return set(embedding.spectrum_id for embedding in embeddings)
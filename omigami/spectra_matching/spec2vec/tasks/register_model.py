@@ -5,6 +5,7 @@ from pandas import Timestamp
 from prefect import Task
 
 from omigami.config import IonModes
+from omigami.spectra_matching.response_cache import make_response_cache
 from omigami.spectra_matching.spec2vec.config import PREDICTOR_ENV_PATH
 from omigami.spectra_matching.spec2vec.predictor import Spec2VecPredictor
 from omigami.spectra_matching.spec2vec.tasks.train_model import TrainModelParameters
@@ -22,6 +23,9 @@ class RegisterModelParameters:
     intensity_weighting_power: Union[float, int]
     allowed_missing_percentage: Union[float, int]
     model_name: Optional[str]
+    preload_embeddings: bool = False
+    response_cache_size: int = 0
+    response_cache_ttl: Optional[int] = None
 
 
 class RegisterModel(Task):
@@ -39,6 +43,9 @@ class RegisterModel(Task):
         self._intensity_weighting_power = parameters.intensity_weighting_power
         self._allowed_missing_percentage = parameters.allowed_missing_percentage
         self._model_name = parameters.model_name
+        self._preload_embeddings = parameters.preload_embeddings
+        self._response_cache_size = parameters.response_cache_size
+        self._response_cache_ttl = parameters.response_cache_ttl
         self._training_parameters = training_params
         config = merge_prefect_task_configs(kwargs)
         super().__init__(**config)
@@ -75,6 +82,10 @@ class RegisterModel(Task):
             self._n_decimals,
             self._intensity_weighting_power,
             self._allowed_missing_percentage,
+            preload_embeddings=self._preload_embeddings,
+            response_cache=make_response_cache(
+                self._response_cache_size, self._response_cache_ttl
+            ),
         )
 
         params = {
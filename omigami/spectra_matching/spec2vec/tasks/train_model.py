@@ -1,4 +1,5 @@
-from typing import List, Any, Dict
+import tempfile
+from typing import List, Any, Dict, Optional
 
 import gensim
 import prefect
@@ -24,11 +25,19 @@ class TrainModelParameters:
         Number of training iterations
     window:
         Window size for context around the word
+    documents_cache_directory:
+        Local directory where the document files are cached after they are first
+        read. If None, they are cached in a temporary directory during training
+    corpus_file:
+        Whether to write the documents to a local text file and train on it with
+        gensim's `corpus_file` mode, whose workers are not limited by the GIL
     """
 
     model_directory: str
     epochs: int = 25
     window: int = 500
+    documents_cache_directory: Optional[str] = None
+    corpus_file: bool = False
 
     @property
     def model_tmp_path(self) -> str:
@@ -46,6 +55,8 @@ class TrainModel(Task):
         self._model_tmp_path = training_parameters.model_tmp_path
         self._epochs = training_parameters.epochs
         self._window = training_parameters.window
+        self._documents_cache_directory = training_parameters.documents_cache_directory
+        self._corpus_file = training_parameters.corpus_file
 
         config = merge_prefect_task_configs(kwargs)
         super().__init__(**config, trigger=prefect.triggers.all_successful)
@@ -67,15 +78,30 @@ class TrainModel(Task):
 
         self.logger.info(f"Loading documents from {document_paths}")
 
-        documents = FileSystemDocumentIterator(
-            fs_dgw=self._fs_dgw, document_paths=document_paths
-        )
+        with tempfile.TemporaryDirectory() as tmp_directory:
+            documents = FileSystemDocumentIterator(
+                fs_dgw=self._fs_dgw,
+                document_paths=document_paths,
+                cache_directory=self._documents_cache_directory
+                or f"{tmp_directory}/documents",
+            )
+            settings = self._create_spec2vec_settings()
+
+            if self._corpus_file:
+                corpus_path = f"{tmp_directory}/corpus.txt"
+                n_documents = documents.write_corpus_file(corpus_path)
+                self.logger.info(
+                    f"Started training the Word2Vec model on {n_documents} documents "
+                    f"from the corpus file {corpus_path}."
+                )
+                model = gensim.models.Word2Vec(corpus_file=corpus_path, **settings)
+            else:
+                self.logger.info(
+                    f"Started training the Word2Vec model on {len(documents)} "
+                    f"documents."
+                )
+                model = gensim.models.Word2Vec(sentences=documents, **settings)
 
-        self.logger.info(
-            "Started training the Word2Vec model on {len(documents)} documents."
-        )
-        settings = self._create_spec2vec_settings()
-        model = gensim.models.Word2Vec(sentences=documents, **settings)
         output_path = self._model_tmp_path.format(
             flow_run_id=prefect.context.get("flow_run_id", "local")
         )
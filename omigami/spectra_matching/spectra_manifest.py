@@ -0,0 +1,51 @@
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Dict, List, Set
+
+from omigami.spectra_matching.storage import FSDataGateway
+
+CONTENT_HASHES_FILE = "content_hashes.pickle"
+
+
+def manifest_path(manifest_directory: str, ion_mode: str) -> str:
+    return f"{manifest_directory}/{ion_mode}.pickle"
+
+
+def content_hash(spectrum: Dict) -> str:
+    """Hash of all the fields of a raw GNPS spectrum, so that a change to either its
+    peaks or its metadata changes it."""
+    return hashlib.sha1(json.dumps(spectrum, sort_keys=True).encode()).hexdigest()
+
+
+@dataclass
+class SpectraManifest:
+    """Record of the spectra processed by a training run, used by the next run to
+    process only the spectra that were added or modified since.
+
+    content_hashes:
+        Content hash of each raw spectrum of the run, by spectrum id
+    cleaned_paths:
+        Paths of the cleaned spectra of the run
+    """
+
+    content_hashes: Dict[str, str] = field(default_factory=dict)
+    cleaned_paths: List[str] = field(default_factory=list)
+
+    def unchanged_ids(self, content_hashes: Dict[str, str]) -> Set[str]:
+        """Spectrum ids whose content hash is the same in `content_hashes`."""
+        return {
+            spectrum_id
+            for spectrum_id, spectrum_hash in content_hashes.items()
+            if self.content_hashes.get(spectrum_id) == spectrum_hash
+        }
+
+    @classmethod
+    def load(cls, fs_dgw: FSDataGateway, path: str) -> "SpectraManifest":
+        """Loads the manifest at `path`, or an empty one if there is none yet."""
+        if not fs_dgw.exists(path):
+            return cls()
+        return fs_dgw.read_from_file(path)
+
+    def save(self, fs_dgw: FSDataGateway, path: str):
+        fs_dgw.serialize_to_file(path, self)
@@ -0,0 +1,149 @@
+import pickle
+import struct
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+from omigami.spectra_matching.entities.embedding import Embedding
+from omigami.spectra_matching.ms2deepscore.entities.embedding import (
+    MS2DeepScoreEmbedding,
+)
+from omigami.spectra_matching.spec2vec.entities.embedding import Spec2VecEmbedding
+
+# magic, version, flags, embedding type, number of decimals of the spec2vec words,
+# vector dimension, length of the model run id, length of the inchikey of the
+# ms2deepscore embeddings
+_HEADER = struct.Struct("<4sBBBBIHH")
+_MAGIC = b"OEMB"
+_VERSION = 2
+_NORMALIZED_FLAG = 1
+_VECTOR_DTYPE = np.dtype("<f4")
+# embedding types of the header
+_PLAIN_EMBEDDING = 0
+_SPEC2VEC_EMBEDDING = 1
+_MS2DEEPSCORE_EMBEDDING = 2
+
+
+def encode_embedding(
+    embedding: Union[Embedding, MS2DeepScoreEmbedding], run_id: Optional[str] = None
+) -> bytes:
+    """Encodes an embedding as a small header followed by its vector as raw
+    little-endian float32 bytes. The header holds the type of the embedding, the
+    number of decimals of a Spec2VecEmbedding, the vector dimension, whether it is
+    normalized to unit length, the run id of the model that made it and the
+    inchikey of a MS2DeepScoreEmbedding.
+    """
+    vector = np.ravel(embedding.vector).astype(_VECTOR_DTYPE, copy=False)
+    run_id = (run_id or "").encode()
+    flags = _NORMALIZED_FLAG if embedding.normalized else 0
+    embedding_type, n_decimals, inchikey = _PLAIN_EMBEDDING, 0, b""
+    if isinstance(embedding, Spec2VecEmbedding):
+        embedding_type, n_decimals = _SPEC2VEC_EMBEDDING, embedding.n_decimals
+    elif isinstance(embedding, MS2DeepScoreEmbedding):
+        embedding_type = _MS2DEEPSCORE_EMBEDDING
+        inchikey = (embedding.inchikey or "").encode()
+    header = _HEADER.pack(
+        _MAGIC,
+        _VERSION,
+        flags,
+        embedding_type,
+        n_decimals,
+        len(vector),
+        len(run_id),
+        len(inchikey),
+    )
+    return header + run_id + inchikey + vector.tobytes()
+
+
+def is_encoded_embedding(value: bytes) -> bool:
+    """Tells an encoded embedding apart from a pickled one."""
+    return value[: len(_MAGIC)] == _MAGIC
+
+
+def read_header(value: bytes) -> Tuple[int, bool, str, int]:
+    """Returns the vector dimension, normalization flag, model run id and vector
+    offset of an encoded embedding."""
+    _, _, dim, normalized, run_id, _, offset = _unpack_header(value)
+    return dim, normalized, run_id, offset
+
+
+def _unpack_header(value: bytes) -> Tuple[int, int, int, bool, str, str, int]:
+    """Returns the embedding type, number of decimals, vector dimension,
+    normalization flag, model run id, inchikey and vector offset of an encoded
+    embedding."""
+    version = value[len(_MAGIC)]
+    if version != _VERSION:
+        raise ValueError(f"Unsupported embedding encoding version {version}.")
+
+    (
+        _,
+        _,
+        flags,
+        embedding_type,
+        n_decimals,
+        dim,
+        run_id_length,
+        inchikey_length,
+    ) = _HEADER.unpack_from(value)
+    inchikey_start = _HEADER.size + run_id_length
+    offset = inchikey_start + inchikey_length
+    return (
+        embedding_type,
+        n_decimals,
+        dim,
+        bool(flags & _NORMALIZED_FLAG),
+        value[_HEADER.size : inchikey_start].decode(),
+        value[inchikey_start:offset].decode(),
+        offset,
+    )
+
+
+def decode_embedding(
+    spectrum_id: str, value: bytes
+) -> Union[Embedding, MS2DeepScoreEmbedding]:
+    """Decodes an embedding stored either encoded or pickled. Encoded embeddings are
+    decoded into the type they were encoded from, flagged as normalized if they
+    are."""
+    if not is_encoded_embedding(value):
+        return pickle.loads(value)
+
+    (
+        embedding_type,
+        n_decimals,
+        dim,
+        normalized,
+        _,
+        inchikey,
+        offset,
+    ) = _unpack_header(value)
+    embedding = dict(
+        vector=np.frombuffer(value, _VECTOR_DTYPE, dim, offset).astype(np.float32),
+        spectrum_id=spectrum_id,
+        normalized=normalized,
+    )
+    if embedding_type == _SPEC2VEC_EMBEDDING:
+        return Spec2VecEmbedding(**embedding, n_decimals=n_decimals)
+    if embedding_type == _MS2DEEPSCORE_EMBEDDING:
+        return MS2DeepScoreEmbedding(**embedding, inchikey=inchikey or None)
+    return Embedding(**embedding)
+
+
+def decode_vector_into(value: bytes, out: np.ndarray) -> bool:
+    """Copies the vector of an embedding stored either encoded or pickled into the
+    preallocated row `out`. Returns whether the vector is normalized."""
+    if not is_encoded_embedding(value):
+        embedding = pickle.loads(value)
+        out[:] = np.ravel(embedding.vector)
+        return embedding.normalized
+
+    dim, normalized, _, offset = read_header(value)
+    out[:] = np.frombuffer(value, _VECTOR_DTYPE, dim, offset)
+    return normalized
+
+
+def vector_dim(value: bytes) -> int:
+    """Returns the vector dimension of an embedding stored either encoded or
+    pickled."""
+    if not is_encoded_embedding(value):
+        return np.size(pickle.loads(value).vector)
+    return read_header(value)[0]
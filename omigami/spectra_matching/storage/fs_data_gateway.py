@@ -1,11 +1,14 @@
+import io
 import pickle
-from typing import List, Optional, Any
+from typing import List, Optional, Any, Dict
 
 import ijson
+import numpy as np
 import requests
 from drfs import DRPath
 from drfs.filesystems import get_fs
 from drfs.filesystems.base import FileSystemBase
+from drfs.filesystems.local import LocalFileSystem
 
 from omigami.spectra_matching.entities.data_models import SpectrumInputData
 from omigami.spectra_matching.storage import DataGateway
@@ -51,6 +54,13 @@ KEYS = [
 ]
 
 
+def _iterate_spectra(file, path: str):
+    """Iterates over the spectra of a json list file or, if its extension is
+    `.jsonl`, of a file with one json spectrum per line."""
+    prefix = "" if str(path).endswith(".jsonl") else "item"
+    return ijson.items(file, prefix, multiple_values=True)
+
+
 class FSDataGateway(DataGateway):
     def __init__(self, fs: Optional[FileSystemBase] = None):
         self.fs = fs
@@ -99,7 +109,7 @@ class FSDataGateway(DataGateway):
         self.init_fs(path)
 
         with self.fs.open(DRPath(path), "rb") as f:
-            items = ijson.items(f, "item", multiple_values=True)
+            items = _iterate_spectra(f, path)
             results = [{k: item[k] for k in KEYS} for item in items]
         return results
 
@@ -110,7 +120,7 @@ class FSDataGateway(DataGateway):
         self.init_fs(path)
 
         with self.fs.open(DRPath(path), "rb") as f:
-            items = ijson.items(f, "item", multiple_values=True)
+            items = _iterate_spectra(f, path)
             results = [
                 {k: item[k] for k in KEYS}
                 for item in items
@@ -122,7 +132,7 @@ class FSDataGateway(DataGateway):
         self.init_fs(path)
 
         with self.fs.open(DRPath(path), "rb") as f:
-            items = ijson.items(f, "item", multiple_values=True)
+            items = _iterate_spectra(f, path)
             ids = [item["SpectrumID"] for item in items]
 
         return ids
@@ -157,6 +167,11 @@ class FSDataGateway(DataGateway):
 
         self.fs.put(tmp_path, path)
 
+    def move(self, path: str, new_path: str):
+        self.init_fs(path)
+
+        self.fs.mv(path, new_path)
+
     def save(self, obj, output_path: str):
         pass
 
@@ -174,3 +189,32 @@ class FSDataGateway(DataGateway):
         self.init_fs(path)
 
         return self.fs.exists(path)
+
+    def info(self, path: str) -> Dict[str, Any]:
+        """Returns the details the filesystem keeps about a file, like its last
+        modification time, and its size and ETag on object stores."""
+        path = DRPath(path)
+        self.init_fs(path)
+
+        return self.fs.info(path)
+
+    def save_array(self, path: str, array: np.ndarray):
+        """Saves the array in the .npy format to the given path on the selected
+        filesystem."""
+        path = DRPath(path)
+        self.init_fs(path)
+
+        with self.fs.open(path, "wb") as f:
+            np.save(f, array)
+
+    def load_array(self, path: str) -> np.ndarray:
+        """Loads an array saved by `save_array`. It is memory-mapped if it is on the
+        local filesystem, so that only the parts that are used are read."""
+        path = DRPath(path)
+        self.init_fs(path)
+
+        if isinstance(self.fs, LocalFileSystem):
+            return np.load(str(path), mmap_mode="r")
+
+        with self.fs.open(path, "rb") as f:
+            return np.load(io.BytesIO(f.read()))
@@ -0,0 +1,30 @@
+import json
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+
+def encode_metadata(metadata: Dict[str, Any]) -> bytes:
+    """Encodes the metadata of a spectrum as JSON, without its peaks, so that it is
+    read without unpickling the whole spectrum. Numpy values are written as plain
+    numbers and lists.
+    """
+    return json.dumps(metadata, default=_to_json).encode()
+
+
+def decode_metadata(
+    value: bytes, fields: Optional[Iterable[str]] = None
+) -> Dict[str, Any]:
+    """Decodes the metadata of a spectrum, keeping only `fields` if they are given."""
+    metadata = json.loads(value)
+    if fields is None:
+        return metadata
+    return {field: metadata[field] for field in fields if field in metadata}
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Metadata of type {type(value).__name__} can't be encoded.")
@@ -2,21 +2,48 @@ from __future__ import annotations
 
 import pickle
 from logging import Logger
-from typing import List, Iterable, Set
+from typing import List, Iterable, Set, Tuple, Sequence, Optional, Dict
 
+import numpy as np
 from matchms import Spectrum
 
 from omigami.config import (
     SPECTRUM_ID_PRECURSOR_MZ_SORTED_SET,
     SPECTRUM_HASHES,
+    SPECTRUM_METADATA_HASHES,
     EMBEDDING_HASHES,
+    BINARY_EMBEDDING_PROJECTS,
+    EMBEDDING_GENERATION,
+    RESPONSE_CACHE,
 )
-from omigami.spectra_matching.entities.embedding import Embedding
+from omigami.spectra_matching.entities.embedding import Embedding, EmbeddingMatrix
+from omigami.spectra_matching.entities.precursor_mz_index import PrecursorMzIndex
 from omigami.spectra_matching.storage import RedisDataGateway
+from omigami.spectra_matching.storage.embedding_encoding import (
+    encode_embedding,
+    decode_embedding,
+    decode_vector_into,
+    vector_dim,
+)
+from omigami.spectra_matching.storage.metadata_encoding import (
+    encode_metadata,
+    decode_metadata,
+)
 
 
 class RedisSpectrumDataGateway(RedisDataGateway):
-    """Data gateway for Redis storage."""
+    """Data gateway for Redis storage.
+
+    Embeddings of the projects in `BINARY_EMBEDDING_PROJECTS`, or of any project if
+    `binary_embeddings` is True, are written as raw float32 bytes with a small header
+    instead of pickles. Both formats can always be read.
+    """
+
+    def __init__(self, project: str, binary_embeddings: Optional[bool] = None):
+        super().__init__(project)
+        if binary_embeddings is None:
+            binary_embeddings = project in BINARY_EMBEDDING_PROJECTS
+        self.binary_embeddings = binary_embeddings
 
     def write_raw_spectra(self, spectra: List[Spectrum]):
         """Writes a list of raw spectra to the redis database using the spectrum_id as the key.
@@ -28,16 +55,20 @@ class RedisSpectrumDataGateway(RedisDataGateway):
         """
         self._init_client()
 
+        pipe = self.client.pipeline()
         for spectrum in spectra:
-            self.client.zadd(
+            spectrum_id = spectrum.metadata["spectrum_id"]
+            pipe.zadd(
                 SPECTRUM_ID_PRECURSOR_MZ_SORTED_SET,
-                {spectrum.metadata["spectrum_id"]: spectrum.metadata["precursor_mz"]},
+                {spectrum_id: spectrum.metadata["precursor_mz"]},
             )
-            self.client.hset(
-                SPECTRUM_HASHES,
-                spectrum.metadata["spectrum_id"],
-                pickle.dumps(spectrum),
+            pipe.hset(SPECTRUM_HASHES, spectrum_id, pickle.dumps(spectrum))
+            pipe.hset(
+                SPECTRUM_METADATA_HASHES,
+                spectrum_id,
+                encode_metadata(spectrum.metadata),
             )
+        pipe.execute()
 
     def list_spectrum_ids(self) -> List[str]:
         """List the spectrum ids of all spectra on the redis database."""
@@ -69,6 +100,52 @@ class RedisSpectrumDataGateway(RedisDataGateway):
         spectra = self._read_hashes(SPECTRUM_HASHES, spectrum_ids)
         return spectra
 
+    def read_spectra_metadata(
+        self, spectrum_ids: Iterable[str], fields: Optional[Iterable[str]] = None
+    ) -> Dict[str, Dict]:
+        """Reads only the metadata of spectra, from the metadata store that
+        `write_raw_spectra` writes next to the pickled spectra. The spectra written
+        before there was a metadata store are unpickled instead.
+
+        Parameters
+        ----------
+        spectrum_ids:
+            Ids of the spectra to read the metadata of
+        fields:
+            Metadata fields to keep. If None, all of them are kept
+
+        Returns
+        -------
+        Dictionary of `spectrum_id: metadata` of the spectra found
+
+        """
+        self._init_client()
+        spectrum_ids = list(spectrum_ids)
+        if not spectrum_ids:
+            return {}
+
+        fields = list(fields) if fields is not None else None
+        values = self.client.hmget(SPECTRUM_METADATA_HASHES, spectrum_ids)
+        metadata = {
+            spectrum_id: decode_metadata(value, fields)
+            for spectrum_id, value in zip(spectrum_ids, values)
+            if value
+        }
+
+        missing = [
+            spectrum_id for spectrum_id in spectrum_ids if spectrum_id not in metadata
+        ]
+        for spectrum in self._read_hashes(SPECTRUM_HASHES, missing) if missing else []:
+            spectrum_metadata = spectrum.metadata
+            if fields is not None:
+                spectrum_metadata = {
+                    field: spectrum_metadata[field]
+                    for field in fields
+                    if field in spectrum_metadata
+                }
+            metadata[spectrum.metadata["spectrum_id"]] = spectrum_metadata
+        return metadata
+
     def get_spectrum_ids_within_range(
         self, min_mz: float = 0, max_mz: float = -1
     ) -> List[str]:
@@ -83,6 +160,53 @@ class RedisSpectrumDataGateway(RedisDataGateway):
         ]
         return spectrum_ids_within_range
 
+    def get_spectrum_ids_within_ranges(
+        self, min_mz: Sequence[float], max_mz: Sequence[float]
+    ) -> Tuple[PrecursorMzIndex, np.ndarray, np.ndarray]:
+        """Get the spectrum IDs of spectra stored on redis that have a Precursor_MZ
+        within any of the given ranges. Overlapping ranges are merged and all of them
+        are queried in a single pipeline. Return an index with the union of the IDs
+        sorted by Precursor_MZ, and the `start` and `stop` rows of each range in it."""
+        self._init_client()
+        pipe = self.client.pipeline()
+        for low, high in self._merge_ranges(min_mz, max_mz):
+            pipe.zrangebyscore(
+                SPECTRUM_ID_PRECURSOR_MZ_SORTED_SET, low, high, withscores=True
+            )
+        ids_and_scores = [id_mz for result in pipe.execute() for id_mz in result]
+
+        index = PrecursorMzIndex(
+            spectrum_ids=[id_.decode() for id_, _ in ids_and_scores],
+            precursor_mz=np.array([mz for _, mz in ids_and_scores], dtype=np.float64),
+        )
+        starts, stops = index.rows_within_ranges(min_mz, max_mz)
+        return index, starts, stops
+
+    @staticmethod
+    def _merge_ranges(
+        min_mz: Sequence[float], max_mz: Sequence[float]
+    ) -> List[Tuple[float, float]]:
+        """Merges overlapping ranges so every spectrum is fetched only once and the
+        concatenated results stay sorted by Precursor_MZ."""
+        merged = []
+        for low, high in sorted(zip(map(float, min_mz), map(float, max_mz))):
+            if merged and low <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+            else:
+                merged.append((low, high))
+        return merged
+
+    def read_precursor_mz_index(self) -> PrecursorMzIndex:
+        """Get the IDs of all spectra stored on redis sorted by their Precursor_MZ."""
+        self._init_client()
+        ids_and_scores = self.client.zrange(
+            SPECTRUM_ID_PRECURSOR_MZ_SORTED_SET, 0, -1, withscores=True
+        )
+        return PrecursorMzIndex(
+            spectrum_ids=[id_.decode() for id_, _ in ids_and_scores],
+            precursor_mz=np.array([mz for _, mz in ids_and_scores], dtype=np.float64),
+        )
+
     def _read_hashes(self, hash_name: str, spectrum_ids: List[str] = None) -> List:
         if spectrum_ids:
             spectra = self.client.hmget(hash_name, spectrum_ids)
@@ -95,6 +219,10 @@ class RedisSpectrumDataGateway(RedisDataGateway):
         # Just used on tests atm. No abstract method.
         self._init_client()
         _ = [self.client.hdel(SPECTRUM_HASHES, id_.encode()) for id_ in spectrum_ids]
+        _ = [
+            self.client.hdel(SPECTRUM_METADATA_HASHES, id_.encode())
+            for id_ in spectrum_ids
+        ]
 
     def _list_missing_spectrum_ids(
         self, hash_name: str, spectrum_ids: List[str]
@@ -107,8 +235,10 @@ class RedisSpectrumDataGateway(RedisDataGateway):
         embeddings: List[Embedding],
         ion_mode: str,
         logger: Logger = None,
+        run_id: str = None,
     ):
-        """Write embeddings data on the redis database."""
+        """Write embeddings data on the redis database. `run_id` is the model run id
+        stored in the header of binary embeddings."""
         self._init_client()
         hash_key = self._format_redis_key(hashes=EMBEDDING_HASHES, ion_mode=ion_mode)
         if logger:
@@ -121,19 +251,60 @@ class RedisSpectrumDataGateway(RedisDataGateway):
             pipe.hset(
                 hash_key,
                 embedding.spectrum_id,
-                pickle.dumps(embedding),
+                self._encode_embedding(embedding, run_id),
             )
         pipe.execute()
 
+    def _encode_embedding(self, embedding: Embedding, run_id: str = None) -> bytes:
+        if self.binary_embeddings:
+            return encode_embedding(embedding, run_id)
+        return pickle.dumps(embedding)
+
     def read_embeddings(
         self, ion_mode: str, spectrum_ids: List[str] = None
     ) -> List[Embedding]:
         """Read the embeddings from spectra IDs.
         Return a list of Embedding objects."""
         self._init_client()
-        return self._read_hashes(
-            self._format_redis_key(hashes=EMBEDDING_HASHES, ion_mode=ion_mode),
-            spectrum_ids,
+        hash_key = self._format_redis_key(hashes=EMBEDDING_HASHES, ion_mode=ion_mode)
+        if spectrum_ids:
+            values = zip(spectrum_ids, self.client.hmget(hash_key, spectrum_ids))
+        else:
+            values = (
+                (sp_id.decode(), value)
+                for sp_id, value in self.client.hgetall(hash_key).items()
+            )
+        return [decode_embedding(sp_id, value) for sp_id, value in values if value]
+
+    def read_embedding_matrix(
+        self, ion_mode: str, index: PrecursorMzIndex = None
+    ) -> EmbeddingMatrix:
+        """Read the embeddings of the spectra in `index`, or of all spectra, into a
+        single matrix whose rows are sorted by the Precursor_MZ of their spectra. The
+        vectors are decoded straight into the preallocated matrix."""
+        self._init_client()
+        hash_key = self._format_redis_key(hashes=EMBEDDING_HASHES, ion_mode=ion_mode)
+        if index is None:
+            index = self.read_precursor_mz_index()
+            stored = self.client.hgetall(hash_key)
+            values = [stored.get(sp_id.encode()) for sp_id in index.spectrum_ids]
+        elif len(index) > 0:
+            values = self.client.hmget(hash_key, index.spectrum_ids)
+        else:
+            values = []
+
+        rows = [i for i, value in enumerate(values) if value]
+        dim = vector_dim(values[rows[0]]) if rows else 0
+        vectors = np.empty((len(rows), dim), dtype=np.float32)
+        normalized = True
+        for row, i in enumerate(rows):
+            normalized &= decode_vector_into(values[i], vectors[row])
+
+        return EmbeddingMatrix(
+            vectors=vectors,
+            spectrum_ids=[index.spectrum_ids[i] for i in rows],
+            precursor_mz=index.precursor_mz[rows],
+            normalized=normalized and bool(rows),
         )
 
     def delete_embeddings(self, ion_mode: str):
@@ -141,3 +312,25 @@ class RedisSpectrumDataGateway(RedisDataGateway):
         self._init_client()
         hash_key = self._format_redis_key(EMBEDDING_HASHES, ion_mode)
         self.client.delete(hash_key)
+
+    def bump_embedding_generation(self, ion_mode: str) -> int:
+        """Increments the generation of the embeddings of an ion mode, which tells
+        that they were rewritten. Return the new generation."""
+        self._init_client()
+        return self.client.incr(self._format_redis_key(EMBEDDING_GENERATION, ion_mode))
+
+    def read_embedding_generation(self, ion_mode: str) -> int:
+        self._init_client()
+        generation = self.client.get(
+            self._format_redis_key(EMBEDDING_GENERATION, ion_mode)
+        )
+        return int(generation) if generation else 0
+
+    def read_cached_response(self, key: str) -> Optional[bytes]:
+        self._init_client()
+        return self.client.get(f"{RESPONSE_CACHE}_{self.project_name}_{key}")
+
+    def write_cached_response(self, key: str, response: bytes, ttl: int):
+        """Writes a prediction response that expires after `ttl` seconds."""
+        self._init_client()
+        self.client.set(f"{RESPONSE_CACHE}_{self.project_name}_{key}", response, ex=ttl)
@@ -1,7 +1,10 @@
+from .build_embedding_index import BuildEmbeddingIndex, BuildEmbeddingIndexParameters
 from .cache_cleaned_spectra import CacheCleanedSpectra
 from .clean_raw_spectra import CleanRawSpectra, CleanRawSpectraParameters
-from .create_chunks import CreateChunks, ChunkingParameters
+from .create_chunks import CreateChunks, ChunkingParameters, ChunkFormats
 from .delete_embeddings import DeleteEmbeddings
 from .deploy_model import DeployModel, DeployModelParameters
 from .download_data import DownloadData, DownloadParameters
 from .list_cleaned_spectra_paths import ListCleanedSpectraPaths
+from .merge_derivation_cache import MergeDerivationCache
+from .reuse_cleaned_spectra import ReuseCleanedSpectra, ReuseCleanedSpectraParameters
@@ -0,0 +1,84 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import mlflow
+from mlflow.entities import Run
+from prefect import Task
+
+from omigami.config import IonModes
+from omigami.spectra_matching.embedding_index import (
+    EmbeddingIndex,
+    EMBEDDING_INDEX_FILE,
+)
+from omigami.spectra_matching.storage import (
+    RedisSpectrumDataGateway,
+    FSDataGateway,
+)
+from omigami.utils import merge_prefect_task_configs
+
+
+@dataclass
+class BuildEmbeddingIndexParameters:
+    ion_mode: IonModes
+    model_registry_uri: str
+    n_lists: Optional[int] = None
+    n_iterations: int = 10
+
+
+class BuildEmbeddingIndex(Task):
+    def __init__(
+        self,
+        spectrum_dgw: RedisSpectrumDataGateway,
+        fs_dgw: FSDataGateway,
+        parameters: BuildEmbeddingIndexParameters,
+        **kwargs,
+    ):
+        self._spectrum_dgw = spectrum_dgw
+        self._fs_dgw = fs_dgw
+        self._ion_mode = parameters.ion_mode
+        self._model_registry_uri = parameters.model_registry_uri
+        self._n_lists = parameters.n_lists
+        self._n_iterations = parameters.n_iterations
+
+        config = merge_prefect_task_configs(kwargs)
+        super().__init__(**config)
+
+    def run(self, model_run_id: str = None) -> str:
+        """
+        Prefect task to build the approximate nearest neighbour index over the
+        embeddings of the ion mode. The index is saved with the artifacts of the
+        registered model, where the predictor loads it from.
+
+        Parameters
+        ----------
+        model_run_id:
+            Registered model's `run_id`
+
+        Returns
+        -------
+        Path of the saved index
+
+        """
+        # the generation is read first so that an index built while the embeddings
+        # are rewritten is never taken as current
+        generation = self._spectrum_dgw.read_embedding_generation(self._ion_mode)
+        embeddings = self._spectrum_dgw.read_embedding_matrix(self._ion_mode)
+        self.logger.info(
+            f"Building embedding index of {len(embeddings)} embeddings of generation "
+            f"{generation}."
+        )
+        index = EmbeddingIndex.build(
+            embeddings,
+            n_lists=self._n_lists,
+            n_iterations=self._n_iterations,
+            generation=generation,
+        )
+
+        mlflow.set_tracking_uri(self._model_registry_uri)
+        run: Run = mlflow.get_run(model_run_id)
+        index_path = f"{run.info.artifact_uri}/model/artifacts/{EMBEDDING_INDEX_FILE}"
+        self.logger.info(
+            f"Saving embedding index with {index.n_lists} lists to {index_path}."
+        )
+        self._fs_dgw.serialize_to_file(index_path, index)
+        return index_path
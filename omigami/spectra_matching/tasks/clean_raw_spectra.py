@@ -1,6 +1,10 @@
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Callable, Tuple
 
+import prefect
 from drfs import DRPath
 from matchms import Spectrum
 from matchms.filtering import (
@@ -17,9 +21,16 @@ from matchms.filtering import (
 from matchms.importing.load_from_json import as_spectrum
 from prefect import Task
 
+from omigami.spectra_matching.derivation_cache import (
+    DerivationCache,
+    Structure,
+    new_entries_directory,
+)
 from omigami.spectra_matching.storage import DataGateway
 from omigami.utils import merge_prefect_task_configs
 
+STRUCTURE_KEYS = ("inchi", "smiles", "inchikey")
+
 
 @dataclass
 class CleanRawSpectraParameters:
@@ -28,9 +39,37 @@ class CleanRawSpectraParameters:
 
     output_directory:
         Directory where the cleaned spectra will be saved
+    n_processes:
+        Number of processes that clean the spectra of a chunk in parallel. With 1,
+        the spectra are cleaned in the task's own process
+    batch_size:
+        Number of spectra sent to a process at a time
+    derivation_cache_path:
+        Path of the cache of the structures derived with RDKit, shared across chunks
+        and runs. Each chunk saves the structures it derived to its own file, which
+        the MergeDerivationCache task merges into the cache. If None, the structures
+        are always derived
+    derivation_cache_size:
+        Number of structures kept in the derivation cache
+    derivation_namespace:
+        Name of the flow, e.g. its project and ion mode. The files of the chunks are
+        saved under it and the flow run, apart from the ones of other flows that
+        share the derivation cache
     """
 
     output_directory: str
+    n_processes: int = 1
+    batch_size: int = 1000
+    derivation_cache_path: Optional[str] = None
+    derivation_cache_size: int = 200000
+    derivation_namespace: str = "default"
+
+
+def new_derivations_directory(derivation_cache_path: str, namespace: str) -> str:
+    """Directory of the structures derived by the chunks of the current flow run,
+    which only the MergeDerivationCache task of the same run merges."""
+    flow_run_id = prefect.context.get("flow_run_id", "local")
+    return new_entries_directory(derivation_cache_path, f"{namespace}/{flow_run_id}")
 
 
 class CleanRawSpectra(Task):
@@ -46,6 +85,11 @@ class CleanRawSpectra(Task):
     ):
         self._fs_dgw = fs_dgw
         self._output_directory = parameters.output_directory
+        self._n_processes = parameters.n_processes
+        self._batch_size = parameters.batch_size
+        self._derivation_cache_path = parameters.derivation_cache_path
+        self._derivation_cache_size = parameters.derivation_cache_size
+        self._derivation_namespace = parameters.derivation_namespace
         self._spectrum_cleaner = SpectrumCleaner()
         config = merge_prefect_task_configs(kwargs)
 
@@ -77,18 +121,136 @@ class CleanRawSpectra(Task):
         spectra = self._fs_dgw.load_spectrum(raw_spectra_path)
         spectrum_ids = [sp["spectrum_id"] for sp in spectra]
 
+        derivation_cache = self._load_derivation_cache()
+
         self.logger.info(f"Cleaning {len(spectrum_ids)} spectra.")
-        clean_spectra = self._spectrum_cleaner.clean(spectra)
+        if self._n_processes > 1:
+            clean_spectra, filter_timings = self._clean_in_processes(
+                spectra, derivation_cache
+            )
+        else:
+            self._spectrum_cleaner.derivation_cache = derivation_cache
+            clean_spectra = self._spectrum_cleaner.clean(spectra)
+            filter_timings = self._spectrum_cleaner.filter_timings
         clean_spectrum_ids = [sp.metadata["spectrum_id"] for sp in clean_spectra]
         self.logger.info(f"There are {len(clean_spectrum_ids)} spectra after cleaning.")
+        self._log_filter_timings(filter_timings)
+
+        if derivation_cache is not None:
+            self._save_new_derivations(derivation_cache, raw_spectra_path)
 
         self.logger.info(f"Saving cleaned spectra to file {output_path}.")
         self._fs_dgw.serialize_to_file(output_path, clean_spectra)
         return output_path
 
+    def _load_derivation_cache(self) -> Optional[DerivationCache]:
+        if self._derivation_cache_path is None:
+            return None
+
+        derivation_cache = DerivationCache.load(
+            self._fs_dgw, self._derivation_cache_path, self._derivation_cache_size
+        )
+        self.logger.info(
+            f"Loaded {len(derivation_cache)} structures from the derivation cache "
+            f"{self._derivation_cache_path}."
+        )
+        return derivation_cache
+
+    def _save_new_derivations(
+        self, derivation_cache: DerivationCache, raw_spectra_path: str
+    ):
+        """Saves the structures derived for this chunk to a file of its own, since
+        the chunks are cleaned in parallel and would overwrite each other's cache."""
+        if derivation_cache.hit_rate is not None:
+            self.logger.info(
+                f"Derivation cache hit rate was {derivation_cache.hit_rate:.1%} "
+                f"({derivation_cache.hits} hits, {derivation_cache.misses} misses)."
+            )
+        new_entries = derivation_cache.pop_new_entries()
+        if new_entries:
+            directory = new_derivations_directory(
+                self._derivation_cache_path, self._derivation_namespace
+            )
+            self._fs_dgw.serialize_to_file(
+                f"{directory}/{DRPath(raw_spectra_path).stem}.pickle",
+                list(new_entries.items()),
+            )
+
+    def _clean_in_processes(
+        self, spectra: List[Dict], derivation_cache: Optional[DerivationCache] = None
+    ) -> Tuple[List[Spectrum], Dict[str, float]]:
+        """Cleans batches of spectra in a pool of processes. The cleaned spectra keep
+        the order of `spectra`, and the filter timings are summed over all batches.
+
+        Each process starts with a copy of the derivation cache. The structures they
+        derive and their hits and misses are merged back into `derivation_cache`.
+        """
+        batches = [
+            spectra[start : start + self._batch_size]
+            for start in range(0, len(spectra), self._batch_size)
+        ]
+
+        clean_spectra = []
+        filter_timings = defaultdict(float)
+        with ProcessPoolExecutor(
+            max_workers=self._n_processes,
+            initializer=_init_worker,
+            initargs=(derivation_cache,),
+        ) as executor:
+            for batch_spectra, batch_timings, batch_derivations in executor.map(
+                _clean_batch, batches
+            ):
+                clean_spectra.extend(batch_spectra)
+                for filter_name, duration in batch_timings.items():
+                    filter_timings[filter_name] += duration
+                if derivation_cache is not None:
+                    derivation_cache.merge(*batch_derivations)
+        return clean_spectra, filter_timings
+
+    def _log_filter_timings(self, filter_timings: Dict[str, float]):
+        for filter_name, duration in sorted(
+            filter_timings.items(), key=lambda timing: timing[1], reverse=True
+        ):
+            self.logger.info(f"Filter {filter_name} took {duration:.2f} seconds.")
+
+
+_worker_cleaner: Optional["SpectrumCleaner"] = None
+
+
+def _init_worker(derivation_cache: Optional[DerivationCache]):
+    global _worker_cleaner
+    _worker_cleaner = SpectrumCleaner(derivation_cache)
+
+
+def _clean_batch(
+    spectra: List[Dict],
+) -> Tuple[List[Spectrum], Dict[str, float], Optional[tuple]]:
+    """Cleans a batch in a worker process. Returns the cleaned spectra, the filter
+    timings and the structures derived for the batch with its cache hits and
+    misses."""
+    derivation_cache = _worker_cleaner.derivation_cache
+    if derivation_cache is None:
+        clean_spectra = _worker_cleaner.clean(spectra)
+        return clean_spectra, dict(_worker_cleaner.filter_timings), None
+
+    hits, misses = derivation_cache.hits, derivation_cache.misses
+    clean_spectra = _worker_cleaner.clean(spectra)
+    batch_derivations = (
+        derivation_cache.pop_new_entries(),
+        derivation_cache.hits - hits,
+        derivation_cache.misses - misses,
+    )
+    return clean_spectra, dict(_worker_cleaner.filter_timings), batch_derivations
+
 
 class SpectrumCleaner:
+    def __init__(self, derivation_cache: Optional[DerivationCache] = None):
+        self.derivation_cache = derivation_cache
+        # seconds spent in each filter during the last call to `clean`
+        self.filter_timings: Dict[str, float] = defaultdict(float)
+
     def clean(self, spectra: List[Dict]) -> List[Spectrum]:
+        self.filter_timings = defaultdict(float)
         processed_spectra = []
         for spectrum in spectra:
             spectrum = as_spectrum(spectrum)
@@ -111,16 +273,27 @@ class SpectrumCleaner:
             else None
         )
 
-        spectrum = add_parent_mass(spectrum)
+        spectrum = self._timed(add_parent_mass, spectrum)
         spectrum = self._harmonize_spectrum(spectrum)
         spectrum = self._convert_metadata(spectrum)
         return spectrum
 
+    def _timed(
+        self, spectrum_filter: Callable[[Spectrum], Optional[Spectrum]], spectrum
+    ) -> Optional[Spectrum]:
+        """Applies a filter to the spectrum, adding its duration to its timing."""
+        start_time = time.perf_counter()
+        spectrum = spectrum_filter(spectrum)
+        self.filter_timings[spectrum_filter.__name__] += (
+            time.perf_counter() - start_time
+        )
+        return spectrum
+
     def _apply_filters(self, spectrum: Spectrum) -> Optional[Spectrum]:
         """Applies a collection of filters to normalize data, like convert str to int"""
-        spectrum = default_filters(spectrum)
-        spectrum = self._filter_negative_intensities(spectrum)
-        spectrum = self._filter_empty_spectrum(spectrum)
+        spectrum = self._timed(default_filters, spectrum)
+        spectrum = self._timed(self._filter_negative_intensities, spectrum)
+        spectrum = self._timed(self._filter_empty_spectrum, spectrum)
         return spectrum
 
     @staticmethod
@@ -142,27 +315,47 @@ class SpectrumCleaner:
             return spectrum
         return None
 
-    @staticmethod
-    def _harmonize_spectrum(spectrum: Spectrum) -> Spectrum:
+    def _harmonize_spectrum(self, spectrum: Spectrum) -> Spectrum:
         """
         Here, undefined entries will be harmonized (instead of having a huge variation
         of None,"", "N/A" etc.)
         The ``repair_inchi_inchikey_smiles`` function will correct misplaced metadata
         (e.g. inchikeys entered as inchi etc.) and harmonize the entry strings.
         """
-        spectrum = harmonize_undefined_inchikey(spectrum)
-        spectrum = harmonize_undefined_inchi(spectrum)
-        spectrum = harmonize_undefined_smiles(spectrum)
-        spectrum = repair_inchi_inchikey_smiles(spectrum)
+        spectrum = self._timed(harmonize_undefined_inchikey, spectrum)
+        spectrum = self._timed(harmonize_undefined_inchi, spectrum)
+        spectrum = self._timed(harmonize_undefined_smiles, spectrum)
+        spectrum = self._timed(repair_inchi_inchikey_smiles, spectrum)
         return spectrum
 
-    @staticmethod
-    def _convert_metadata(spectrum: Spectrum) -> Spectrum:
+    def _convert_metadata(self, spectrum: Spectrum) -> Spectrum:
         """
         Where possible (and necessary, i.e. missing): Convert between smiles, inchi,
-        inchikey to complete metadata. This is done using functions from rdkit.
+        inchikey to complete metadata. This is done using functions from rdkit,
+        unless the derivation cache already holds the structures derived from the
+        same ones.
         """
-        spectrum = derive_inchi_from_smiles(spectrum)
-        spectrum = derive_smiles_from_inchi(spectrum)
-        spectrum = derive_inchikey_from_inchi(spectrum)
+        if self.derivation_cache is None:
+            return self._derive_structures(spectrum)
+
+        structure = _get_structure(spectrum)
+        derived = self.derivation_cache.get(structure)
+        if derived is None:
+            spectrum = self._derive_structures(spectrum)
+            self.derivation_cache.put(structure, _get_structure(spectrum))
+            return spectrum
+
+        for key, value in zip(STRUCTURE_KEYS, derived):
+            if value is not None:
+                spectrum.set(key, value)
         return spectrum
+
+    def _derive_structures(self, spectrum: Spectrum) -> Spectrum:
+        spectrum = self._timed(derive_inchi_from_smiles, spectrum)
+        spectrum = self._timed(derive_smiles_from_inchi, spectrum)
+        spectrum = self._timed(derive_inchikey_from_inchi, spectrum)
+        return spectrum
+
+
+def _get_structure(spectrum: Spectrum) -> Structure:
+    return tuple(spectrum.get(key) for key in STRUCTURE_KEYS)
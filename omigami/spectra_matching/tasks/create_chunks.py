@@ -1,28 +1,89 @@
 import json
 import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, List, Optional
 
 import ijson
 from drfs import DRPath
 from drfs.filesystems import get_fs
 from prefect import Task
+from typing_extensions import Literal
 
-from omigami.config import IonModes
+from omigami.config import IonModes, ION_MODES
+from omigami.spectra_matching.spectra_manifest import (
+    SpectraManifest,
+    CONTENT_HASHES_FILE,
+    content_hash,
+    manifest_path,
+)
 from omigami.spectra_matching.storage import DataGateway, KEYS
 from omigami.utils import create_prefect_result_from_path, merge_prefect_task_configs
 
+ChunkFormats = Literal["json", "jsonl"]
+
+
+def _checkpoint_file(output_directory: str) -> str:
+    return f"{output_directory}/raw_chunk_paths.pickle"
+
+
+def _fastest_ijson_items():
+    """Returns `ijson.items` of the C backend if it is installed, which parses many
+    times faster than the pure python one."""
+    try:
+        return ijson.get_backend("yajl2_c").items
+    except ImportError:
+        return ijson.items
+
 
 @dataclass
 class ChunkingParameters:
+    """
+    input_file:
+        GNPS json file to split into chunks
+    output_directory:
+        Directory where the chunks of `ion_mode` are saved
+    chunk_size:
+        Approximate size in bytes of the spectra of each chunk
+    ion_mode:
+        Ion mode of the spectra to chunk
+    chunk_format:
+        Either "json", a json list of spectra, or "jsonl", one json spectrum per line
+    chunk_all_ion_modes:
+        If True, the spectra of the other ion mode are chunked in the same pass over
+        `input_file`, to a sibling directory of `output_directory` named after it, so
+        that the flow of the other ion mode finds its chunks already checkpointed
+    manifest_directory:
+        Directory of the spectra manifests of the previous run. If given, only the
+        spectra that were added or modified since the previous run are chunked, and
+        the content hashes of all spectra are saved next to the chunks
+    """
+
     input_file: str
     output_directory: str
     chunk_size: int
     ion_mode: IonModes
+    chunk_format: ChunkFormats = "json"
+    chunk_all_ion_modes: bool = False
+    manifest_directory: Optional[str] = None
 
     @property
     def checkpoint_file(self) -> str:
-        return f"{self.output_directory}/raw_chunk_paths.pickle"
+        return _checkpoint_file(self.output_directory)
+
+    @property
+    def output_directories(self) -> Dict[str, str]:
+        if not self.chunk_all_ion_modes:
+            return {self.ion_mode: self.output_directory}
+
+        parent_directory = DRPath(self.output_directory).parent
+        return {
+            ion_mode: self.output_directory
+            if ion_mode == self.ion_mode
+            else str(parent_directory / ion_mode)
+            for ion_mode in sorted(ION_MODES)
+        }
 
 
 class CreateChunks(Task):
@@ -30,14 +91,18 @@ class CreateChunks(Task):
         self,
         data_gtw: DataGateway,
         chunking_parameters: ChunkingParameters,
+        max_pending_chunks: int = 2,
         **kwargs,
     ):
         self._data_gtw = data_gtw
         self._chunk_size = chunking_parameters.chunk_size
         self._input_file = chunking_parameters.input_file
-        self._output_directory = chunking_parameters.output_directory
+        self._output_directories = chunking_parameters.output_directories
         self._ion_mode = chunking_parameters.ion_mode
+        self._chunk_format = chunking_parameters.chunk_format
         self._checkpoint_file = chunking_parameters.checkpoint_file
+        self._manifest_directory = chunking_parameters.manifest_directory
+        self._max_pending_chunks = max_pending_chunks
 
         config = merge_prefect_task_configs(kwargs)
 
@@ -53,6 +118,12 @@ class CreateChunks(Task):
         Finally, chunked files are saved to filesystem. This is necessary to
         parallelize task orchestration.
 
+        If all ion modes are chunked, the chunk paths of the other ion mode are
+        checkpointed as well, so its flow does not read the GNPS file again.
+
+        If there is a manifest directory, the spectra that did not change since the
+        previous run are left out of the chunks.
+
         Parameters
         ----------
         spectrum_ids: List[str]
@@ -65,27 +136,35 @@ class CreateChunks(Task):
         """
         self.logger.info(f"Loading file {self._input_file} for chunking.")
         chunk_paths = self._chunk_gnps(self._input_file)
-        self.logger.info(
-            f"Split spectra into {len(chunk_paths)} chunks of size"
-            f"{self._chunk_size}"
-        )
 
-        self.logger.info(f"Saving pickle with file paths to {self._checkpoint_file}")
-        self._data_gtw.serialize_to_file(self._checkpoint_file, chunk_paths)
+        for ion_mode, output_directory in self._output_directories.items():
+            self.logger.info(
+                f"Split {ion_mode} spectra into {len(chunk_paths[ion_mode])} chunks "
+                f"of size {self._chunk_size}"
+            )
 
-        return chunk_paths
+            checkpoint_file = _checkpoint_file(output_directory)
+            self.logger.info(f"Saving pickle with file paths to {checkpoint_file}")
+            self._data_gtw.serialize_to_file(checkpoint_file, chunk_paths[ion_mode])
+
+        return chunk_paths[self._ion_mode]
 
-    def _chunk_gnps(self, gnps_path: str) -> List[str]:
+    def _chunk_gnps(self, gnps_path: str) -> Dict[str, List[str]]:
         """
         The chunking works as following:
         1. Open a stream to the gnps_path json file
-        2. Start looping through the spectra and appending each one to a list
-        3. When the size of the list reaches `chunk_size`:
-          a. save the list to a json identified by the chunk index
+        2. Start looping through the spectra and appending each one to the list of
+           its ion mode
+        3. When the size of a list reaches `chunk_size`:
+          a. hand the list over to a writer thread, that saves it to a file
+             identified by the chunk index while the parsing goes on
           b. empty the list to start looping again
-          c. add the path to the chunk that was just saved to a list of paths
+          c. add the path to the chunk that is being saved to a list of paths
         4. Repeat the previous steps until all file has been read
 
+        At most `max_pending_chunks` chunks wait for the writer at a time, which
+        bounds the memory used when writing is slower than parsing.
+
         Parameters
         ----------
         gnps_path:
@@ -93,46 +172,110 @@ class CreateChunks(Task):
 
         Returns
         -------
-        List of paths:
-            A list of paths for the saved chunked files
+        Dict of lists of paths:
+            The paths of the saved chunked files of each ion mode
 
         """
 
         fs = get_fs(gnps_path)
+        items = _fastest_ijson_items()
+        previous_hashes = self._load_previous_content_hashes()
+        content_hashes = {ion_mode: {} for ion_mode in self._output_directories}
+        n_unchanged = {ion_mode: 0 for ion_mode in self._output_directories}
 
-        with fs.open(DRPath(gnps_path), "rb") as gnps_file:
-            chunk = []
-            chunk_ix = 0
-            chunk_paths = []
-            chunk_bytes = 0
+        chunks = {ion_mode: [] for ion_mode in self._output_directories}
+        chunk_bytes = {ion_mode: 0 for ion_mode in self._output_directories}
+        chunk_paths = {ion_mode: [] for ion_mode in self._output_directories}
+        pending_writes = deque()
 
-            items = ijson.items(gnps_file, "item", multiple_values=True)
-            for item in items:
-                spectrum = {k: item[k] for k in KEYS}
-                if spectrum["Ion_Mode"].lower() != self._ion_mode:
+        def submit_chunk(ion_mode: str):
+            chunk_path = (
+                f"{self._output_directories[ion_mode]}/"
+                f"chunk_{len(chunk_paths[ion_mode])}.{self._chunk_format}"
+            )
+            chunk_paths[ion_mode].append(chunk_path)
+            pending_writes.append(
+                writer.submit(self._write_chunk, fs, chunk_path, chunks[ion_mode])
+            )
+            chunks[ion_mode] = []
+            chunk_bytes[ion_mode] = 0
+
+            while len(pending_writes) > self._max_pending_chunks:
+                pending_writes.popleft().result()
+
+        with ThreadPoolExecutor(max_workers=1) as writer, fs.open(
+            DRPath(gnps_path), "rb"
+        ) as gnps_file:
+            for item in items(gnps_file, "item", multiple_values=True):
+                ion_mode = item["Ion_Mode"].lower()
+                if ion_mode not in chunks:
                     continue
 
-                chunk.append(spectrum)
-                chunk_bytes += sys.getsizeof(spectrum) + sys.getsizeof(
+                spectrum = {k: item[k] for k in KEYS}
+                if previous_hashes is not None:
+                    spectrum_hash = content_hash(spectrum)
+                    content_hashes[ion_mode][spectrum["spectrum_id"]] = spectrum_hash
+                    if (
+                        previous_hashes[ion_mode].get(spectrum["spectrum_id"])
+                        == spectrum_hash
+                    ):
+                        n_unchanged[ion_mode] += 1
+                        continue
+
+                chunks[ion_mode].append(spectrum)
+                chunk_bytes[ion_mode] += sys.getsizeof(spectrum) + sys.getsizeof(
                     spectrum["peaks_json"]
                 )
 
-                if chunk_bytes >= self._chunk_size:
-                    chunk_path = f"{self._output_directory}/chunk_{chunk_ix}.json"
-                    chunk_paths.append(chunk_path)
+                if chunk_bytes[ion_mode] >= self._chunk_size:
+                    submit_chunk(ion_mode)
 
-                    with fs.open(chunk_path, "wb") as chunk_file:
-                        chunk_file.write(json.dumps(chunk).encode("UTF-8"))
-                        chunk = []
-                        chunk_ix += 1
-                        chunk_bytes = 0
+            for ion_mode, chunk in chunks.items():
+                if chunk:
+                    submit_chunk(ion_mode)
 
-                    self.logger.info(f"Saved chunk to path {chunk_path}.")
+            for pending_write in pending_writes:
+                pending_write.result()
 
-            if chunk:
-                chunk_path = f"{self._output_directory}/chunk_{chunk_ix}.json"
-                chunk_paths.append(chunk_path)
-                with fs.open(chunk_path, "wb") as chunk_file:
-                    chunk_file.write(json.dumps(chunk).encode("UTF-8"))
+        if previous_hashes is not None:
+            self._save_content_hashes(content_hashes, n_unchanged)
 
         return chunk_paths
+
+    def _load_previous_content_hashes(self) -> Optional[Dict[str, Dict[str, str]]]:
+        """Content hashes of the spectra of the previous run, by ion mode."""
+        if self._manifest_directory is None:
+            return None
+
+        return {
+            ion_mode: SpectraManifest.load(
+                self._data_gtw, manifest_path(self._manifest_directory, ion_mode)
+            ).content_hashes
+            for ion_mode in self._output_directories
+        }
+
+    def _save_content_hashes(
+        self,
+        content_hashes: Dict[str, Dict[str, str]],
+        n_unchanged: Dict[str, int],
+    ):
+        for ion_mode, output_directory in self._output_directories.items():
+            n_changed = len(content_hashes[ion_mode]) - n_unchanged[ion_mode]
+            self.logger.info(
+                f"{len(content_hashes[ion_mode])} {ion_mode} spectra, of which "
+                f"{n_changed} were added or modified since the previous run."
+            )
+            self._data_gtw.serialize_to_file(
+                f"{output_directory}/{CONTENT_HASHES_FILE}", content_hashes[ion_mode]
+            )
+
+    def _write_chunk(self, fs, chunk_path: str, chunk: List[dict]):
+        if self._chunk_format == "jsonl":
+            content = "".join(f"{json.dumps(spectrum)}\n" for spectrum in chunk)
+        else:
+            content = json.dumps(chunk)
+
+        with fs.open(chunk_path, "wb") as chunk_file:
+            chunk_file.write(content.encode("UTF-8"))
+
+        self.logger.info(f"Saved chunk to path {chunk_path}.")
@@ -34,3 +34,4 @@ class DeleteEmbeddings(Task):
             f"Deleting embeddings for spec2vec model of {self._ion_mode} ion mode"
         )
         self._spectrum_dgw.delete_embeddings(self._ion_mode)
+        self._spectrum_dgw.bump_embedding_generation(self._ion_mode)
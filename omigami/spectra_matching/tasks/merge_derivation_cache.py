@@ -0,0 +1,72 @@
+from typing import List
+
+from prefect import Task
+
+from omigami.spectra_matching.derivation_cache import DerivationCache
+from omigami.spectra_matching.storage import FSDataGateway
+from omigami.spectra_matching.tasks.clean_raw_spectra import (
+    CleanRawSpectraParameters,
+    new_derivations_directory,
+)
+from omigami.utils import merge_prefect_task_configs
+
+
+class MergeDerivationCache(Task):
+    """
+    Prefect task that merges the structures derived while cleaning each chunk into
+    the derivation cache, once all chunks are cleaned.
+    """
+
+    def __init__(
+        self,
+        fs_dgw: FSDataGateway,
+        parameters: CleanRawSpectraParameters,
+        **kwargs,
+    ):
+        self._fs_dgw = fs_dgw
+        self._derivation_cache_path = parameters.derivation_cache_path
+        self._derivation_cache_size = parameters.derivation_cache_size
+        self._derivation_namespace = parameters.derivation_namespace
+        config = merge_prefect_task_configs(kwargs)
+
+        super().__init__(**config)
+
+    def run(self, cleaned_spectra_paths: List[str] = None) -> List[str]:
+        """
+        Merges the structures saved by each CleanRawSpectra task of this flow run
+        into the derivation cache and saves it once, then removes the files of the
+        chunks. The files of other flows sharing the cache are left to them.
+
+        Parameters:
+        ----------
+        cleaned_spectra_paths: List[str]
+            Paths of the cleaned spectra, so that the task runs after all chunks
+            are cleaned
+
+        Returns:
+        --------
+        The paths of the cleaned spectra, unchanged
+
+        """
+        directory = new_derivations_directory(
+            self._derivation_cache_path, self._derivation_namespace
+        )
+        if not self._fs_dgw.exists(directory):
+            self.logger.info("No new structures were derived.")
+            return cleaned_spectra_paths
+
+        derivation_cache = DerivationCache.load(
+            self._fs_dgw, self._derivation_cache_path, self._derivation_cache_size
+        )
+        chunk_paths = self._fs_dgw.list_files(directory)
+        for path in chunk_paths:
+            derivation_cache.merge(dict(self._fs_dgw.read_from_file(path)), 0, 0)
+
+        self.logger.info(
+            f"Saving {len(derivation_cache)} structures derived in "
+            f"{len(chunk_paths)} chunks to {self._derivation_cache_path}."
+        )
+        derivation_cache.save(self._fs_dgw, self._derivation_cache_path)
+        for path in chunk_paths:
+            self._fs_dgw.remove_file(path)
+        return cleaned_spectra_paths
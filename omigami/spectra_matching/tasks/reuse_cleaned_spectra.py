@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+from typing import List
+
+from prefect import Task
+
+from omigami.spectra_matching.spectra_manifest import (
+    SpectraManifest,
+    CONTENT_HASHES_FILE,
+    manifest_path,
+)
+from omigami.spectra_matching.storage import FSDataGateway
+from omigami.utils import create_prefect_result_from_path, merge_prefect_task_configs
+
+
+@dataclass
+class ReuseCleanedSpectraParameters:
+    """
+    Parameters to determine aspects of the ReuseCleanedSpectra task
+
+    raw_directory:
+        Directory of the raw chunks of this run, holding their content hashes
+    output_directory:
+        Directory where the cleaned spectra of this run are saved
+    manifest_directory:
+        Directory of the spectra manifests, shared by all runs
+    ion_mode:
+        Ion mode of the spectra
+    """
+
+    raw_directory: str
+    output_directory: str
+    manifest_directory: str
+    ion_mode: str
+
+    @property
+    def checkpoint_file(self) -> str:
+        # next to the raw chunk paths, since the deploy flows cache every file of the
+        # cleaned spectra directory
+        return f"{self.raw_directory}/cleaned_spectra_paths.pickle"
+
+
+class ReuseCleanedSpectra(Task):
+    """
+    Prefect task that completes the spectra cleaned in an incremental run with the
+    ones of the previous run that did not change since.
+    """
+
+    def __init__(
+        self,
+        fs_dgw: FSDataGateway,
+        parameters: ReuseCleanedSpectraParameters,
+        **kwargs,
+    ):
+        self._fs_dgw = fs_dgw
+        self._content_hashes_path = f"{parameters.raw_directory}/{CONTENT_HASHES_FILE}"
+        self._output_directory = parameters.output_directory
+        self._manifest_path = manifest_path(
+            parameters.manifest_directory, parameters.ion_mode
+        )
+        config = merge_prefect_task_configs(kwargs)
+
+        super().__init__(
+            **config, **create_prefect_result_from_path(parameters.checkpoint_file)
+        )
+
+    def run(self, cleaned_spectra_paths: List[str] = None) -> List[str]:
+        """
+        Copies the unchanged spectra of each cleaned chunk of the previous run to this
+        run, leaving out the spectra that were modified or removed since. Then saves
+        the manifest of this run, which the next run compares against.
+
+        Parameters:
+        ----------
+        cleaned_spectra_paths: List[str]
+            Paths of the spectra added or modified since the previous run, cleaned
+
+        Returns:
+        --------
+        Paths of all cleaned spectra of this run
+
+        """
+        previous_manifest = SpectraManifest.load(self._fs_dgw, self._manifest_path)
+        content_hashes = self._fs_dgw.read_from_file(self._content_hashes_path)
+        unchanged_ids = previous_manifest.unchanged_ids(content_hashes)
+        self.logger.info(
+            f"Reusing {len(unchanged_ids)} unchanged cleaned spectra from "
+            f"{len(previous_manifest.cleaned_paths)} files of the previous run."
+        )
+
+        reused_paths = []
+        for i, previous_path in enumerate(previous_manifest.cleaned_paths):
+            reused_path = f"{self._output_directory}/reused_chunk_{i}.pickle"
+            spectra = [
+                spectrum
+                for spectrum in self._fs_dgw.read_from_file(previous_path)
+                if spectrum.metadata["spectrum_id"] in unchanged_ids
+            ]
+            if spectra:
+                self._fs_dgw.serialize_to_file(reused_path, spectra)
+                reused_paths.append(reused_path)
+
+        all_cleaned_paths = reused_paths + list(cleaned_spectra_paths)
+        self.logger.info(
+            f"Saving manifest of {len(content_hashes)} spectra to "
+            f"{self._manifest_path}."
+        )
+        SpectraManifest(content_hashes, all_cleaned_paths).save(
+            self._fs_dgw, self._manifest_path
+        )
+        return all_cleaned_paths
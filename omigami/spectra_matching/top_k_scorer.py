@@ -0,0 +1,137 @@
+from typing import List, Tuple, Optional
+
+import numpy as np
+
+from omigami.spectra_matching.util import normalize_vectors
+
+TopKResult = Tuple[np.ndarray, np.ndarray]
+
+
+class TopKScorer:
+    """Finds the references with the highest cosine similarity to each query.
+
+    References and queries are normalized once, and queries are scored in blocks with
+    a single matrix product against the reference rows their windows span. Each query
+    only considers the rows of its own `[start, stop)` window, which are the rows of
+    an m/z sorted reference matrix that lie within its precursor m/z window. The best
+    rows are selected with `argpartition`, so the scores are never fully sorted.
+
+    Parameters
+    ----------
+    max_block_queries:
+        Maximum number of queries scored in a single matrix product.
+    max_block_elements:
+        Maximum size of the score matrix of a block. Queries whose windows are far
+        apart are scored in separate blocks to respect it.
+    """
+
+    def __init__(self, max_block_queries: int = 256, max_block_elements: int = 2 ** 24):
+        self._max_block_queries = max_block_queries
+        self._max_block_elements = max_block_elements
+
+    def top_k(
+        self,
+        references: np.ndarray,
+        queries: np.ndarray,
+        n_best: int,
+        starts: Optional[np.ndarray] = None,
+        stops: Optional[np.ndarray] = None,
+        references_normalized: bool = False,
+    ) -> List[TopKResult]:
+        """Returns, for each query, the reference rows of the `n_best` highest scores
+        and their scores, sorted from the highest score. References with an undefined
+        score, e.g. zero vectors, are left out.
+
+        Parameters
+        ----------
+        references:
+            Matrix of reference vectors, one per row.
+        queries:
+            Matrix of query vectors, one per row.
+        n_best:
+            Number of best matches to return per query.
+        starts, stops:
+            Row window of each query on the reference matrix. If not given, every
+            query is scored against all references.
+        references_normalized:
+            If True, the reference vectors are expected to have unit length already.
+        """
+        n_queries = len(queries)
+        if n_best < 1 or len(references) == 0:
+            return [empty_top_k() for _ in range(n_queries)]
+
+        if starts is None or stops is None:
+            starts = np.zeros(n_queries, dtype=np.int64)
+            stops = np.full(n_queries, len(references), dtype=np.int64)
+        starts = np.asarray(starts, dtype=np.int64)
+        stops = np.asarray(stops, dtype=np.int64)
+
+        if not references_normalized:
+            references = normalize_vectors(references)
+        queries = normalize_vectors(queries)
+
+        results: List[TopKResult] = [None] * n_queries
+        for block in self._make_blocks(starts, stops):
+            low, high = starts[block].min(), stops[block].max()
+            if high <= low:
+                for query in block:
+                    results[query] = empty_top_k()
+                continue
+
+            scores = queries[block] @ references[low:high].T
+            columns = np.arange(low, high)
+            outside_window = (columns < starts[block, None]) | (
+                columns >= stops[block, None]
+            )
+            scores[outside_window | np.isnan(scores)] = -np.inf
+
+            rows, best_scores = select_top_k(scores, n_best)
+            for i, query in enumerate(block):
+                valid = np.isfinite(best_scores[i])
+                results[query] = (rows[i][valid] + low, best_scores[i][valid])
+
+        return results
+
+    def _make_blocks(self, starts: np.ndarray, stops: np.ndarray) -> List[np.ndarray]:
+        """Groups the queries with neighbouring windows into blocks, so the score
+        matrix of each block covers few rows outside of the queries' windows."""
+        blocks = []
+        block = []
+        low, high = 0, 0
+        for query in np.argsort(starts, kind="stable"):
+            new_low = min(low, starts[query]) if block else starts[query]
+            new_high = max(high, stops[query]) if block else stops[query]
+            if block and (
+                len(block) >= self._max_block_queries
+                or (len(block) + 1) * (new_high - new_low) > self._max_block_elements
+            ):
+                blocks.append(np.array(block))
+                block = []
+                new_low, new_high = starts[query], stops[query]
+            block.append(query)
+            low, high = new_low, new_high
+
+        if block:
+            blocks.append(np.array(block))
+        return blocks
+
+
+def select_top_k(scores: np.ndarray, n_best: int) -> TopKResult:
+    """Returns the columns of the `n_best` highest scores of each row of `scores` and
+    their scores, sorted from the highest score."""
+    n_columns = scores.shape[1]
+    if n_best < n_columns:
+        rows = np.argpartition(-scores, n_best - 1, axis=1)[:, :n_best]
+    else:
+        rows = np.tile(np.arange(n_columns), (len(scores), 1))
+
+    best_scores = np.take_along_axis(scores, rows, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return (
+        np.take_along_axis(rows, order, axis=1),
+        np.take_along_axis(best_scores, order, axis=1),
+    )
+
+
+def empty_top_k() -> TopKResult:
+    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
@@ -0,0 +1,77 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from omigami.spectra_matching.entities.embedding import (
+    Embedding,
+    EmbeddingMatrix,
+    normalize_embeddings,
+)
+
+
+@pytest.fixture
+def embedding_matrix():
+    embeddings = [
+        Embedding(vector=np.full(3, i, dtype=np.float64), spectrum_id=f"sp-{i}")
+        for i in range(5)
+    ]
+    # sp-5 has no embedding and must be left out of the matrix
+    spectrum_ids = ["sp-3", "sp-0", "sp-5", "sp-1", "sp-4", "sp-2"]
+    precursor_mz = [100.0, 150.0, 175.0, 200.0, 200.0, 300.0]
+    return EmbeddingMatrix.from_embeddings(embeddings, spectrum_ids, precursor_mz)
+
+
+def test_from_embeddings(embedding_matrix):
+    assert len(embedding_matrix) == 5
+    assert embedding_matrix.vectors.dtype == np.float32
+    assert embedding_matrix.vectors.flags["C_CONTIGUOUS"]
+    assert embedding_matrix.spectrum_ids == ["sp-3", "sp-0", "sp-1", "sp-4", "sp-2"]
+    assert embedding_matrix.row("sp-1") == 2
+    assert (embedding_matrix.vectors[embedding_matrix.row("sp-4")] == 4).all()
+    assert (np.diff(embedding_matrix.precursor_mz) >= 0).all()
+
+
+@pytest.mark.parametrize(
+    "min_mz, max_mz, expected_ids",
+    [
+        (150, 200, ["sp-0", "sp-1", "sp-4"]),
+        (99, 101, ["sp-3"]),
+        (400, 500, []),
+    ],
+)
+def test_rows_within_range(embedding_matrix, min_mz, max_mz, expected_ids):
+    start, stop = embedding_matrix.rows_within_range(min_mz, max_mz)
+
+    assert embedding_matrix.spectrum_ids[start:stop] == expected_ids
+
+
+def test_normalize_embeddings():
+    embeddings = [
+        Embedding(vector=np.array([3.0, 4.0]), spectrum_id="sp-0"),
+        Embedding(vector=np.array([[0.0, 2.0]]), spectrum_id="sp-1"),
+    ]
+
+    embeddings = normalize_embeddings(embeddings)
+    embedding_matrix = EmbeddingMatrix.from_embeddings(
+        embeddings, ["sp-0", "sp-1"], [100.0, 200.0]
+    )
+
+    assert embeddings[1].vector.shape == (1, 2)
+    assert all(embedding.normalized for embedding in embeddings)
+    assert embedding_matrix.normalized
+    assert np.allclose(embedding_matrix.vectors, [[0.6, 0.8], [0.0, 1.0]])
+
+
+def test_from_embeddings_not_normalized(embedding_matrix):
+    assert not embedding_matrix.normalized
+
+
+def test_embedding_pickled_before_normalization_is_not_normalized():
+    embedding = Embedding(vector=np.array([3.0, 4.0]), spectrum_id="sp-0")
+    # embeddings were pickled without the `normalized` field before it was added
+    del embedding.__dict__["normalized"]
+
+    loaded_embedding = pickle.loads(pickle.dumps(embedding))
+
+    assert not loaded_embedding.normalized
@@ -0,0 +1,21 @@
+import numpy as np
+
+from omigami.spectra_matching.entities.precursor_mz_index import PrecursorMzIndex
+
+
+def test_rows_within_ranges():
+    index = PrecursorMzIndex(
+        spectrum_ids=["sp-0", "sp-1", "sp-2", "sp-3", "sp-4"],
+        precursor_mz=np.array([100.0, 150.0, 200.0, 200.0, 300.0]),
+    )
+
+    starts, stops = index.rows_within_ranges(
+        np.array([150.0, 99.0, 400.0]), np.array([200.0, 101.0, 500.0])
+    )
+
+    assert [index.spectrum_ids[a:b] for a, b in zip(starts, stops)] == [
+        ["sp-1", "sp-2", "sp-3"],
+        ["sp-0"],
+        [],
+    ]
+    assert index.rows_within_range(150.0, 200.0) == (1, 4)
@@ -1,9 +1,10 @@
 import pickle
+import shutil
 from typing import List
 
 import mlflow
-import pandas as pd
 import pytest
+from drfs.filesystems.local import LocalFileSystem
 from mlflow.entities import Experiment
 from ms2deepscore.models import load_model
 from pytest_redis import factories
@@ -18,6 +19,10 @@ from omigami.spectra_matching.ms2deepscore.flows.training_flow import (
 from omigami.spectra_matching.ms2deepscore.helper_classes.spectrum_processor import (
     SpectrumProcessor,
 )
+from omigami.spectra_matching.ms2deepscore.helper_classes.tanimoto_matrix import (
+    TanimotoMatrix,
+    read_tanimoto_matrix,
+)
 from omigami.spectra_matching.ms2deepscore.predictor import MS2DeepScorePredictor
 from omigami.spectra_matching.ms2deepscore.storage import (
     MS2DeepScoreRedisSpectrumDataGateway,
@@ -105,15 +110,48 @@ def ms2deepscore_predictor(siamese_model):
     return ms2deepscore_predictor
 
 
+class RemoteFileSystem:
+    """A filesystem on the local disk that is not a `LocalFileSystem`, like S3."""
+
+    def __init__(self):
+        self._local = LocalFileSystem()
+
+    def open(self, path, *args, **kwargs):
+        return self._local.open(path, *args, **kwargs)
+
+    def exists(self, path):
+        return self._local.exists(path)
+
+    def put(self, local_path, path):
+        shutil.copyfile(local_path, path)
+
+    def mv(self, path, new_path):
+        self._local.mv(path, new_path)
+
+
+@pytest.fixture
+def remote_fs_dgw():
+    return MS2DeepScoreFSDataGateway(RemoteFileSystem())
+
+
 @pytest.fixture
-def tanimoto_scores_path():
-    return str(ASSETS_DIR / "ms2deepscore" / "to_train" / "tanimoto_scores.pkl")
+def tanimoto_scores_path(tmpdir):
+    """The Tanimoto scores asset, saved as a .npy matrix like the training flow
+    does by default."""
+    fs_dgw = MS2DeepScoreFSDataGateway()
+    scores = read_tanimoto_matrix(
+        fs_dgw, str(ASSETS_DIR / "ms2deepscore" / "to_train" / "tanimoto_scores.pkl")
+    )
+    path = f"{tmpdir}/tanimoto_scores.npy"
+    matrix = TanimotoMatrix.create(fs_dgw, path, scores.inchikeys)
+    matrix.scores[:] = matrix.encode(scores.scores)
+    matrix.flush()
+    return path
 
 
 @pytest.fixture
 def tanimoto_scores(tanimoto_scores_path):
-    tanimoto_score = pd.read_pickle(tanimoto_scores_path, compression="gzip")
-    return tanimoto_score
+    return read_tanimoto_matrix(MS2DeepScoreFSDataGateway(), tanimoto_scores_path)
 
 
 @pytest.fixture
@@ -189,7 +227,7 @@ def ms2ds_build_test_model_flow(tmpdir, flow_config, monkeypatch, clean_chunk_fi
         chunk_size=150000,
         ion_mode="positive",
         # we use everything but the model path as tmpdir. We only want the model from this script
-        scores_output_path=str(tmpdir / "tanimoto_scores.pkl"),
+        scores_output_path=str(tmpdir / "tanimoto_scores.npy"),
         fingerprint_n_bits=2048,
         scores_decimals=5,
         spectrum_binner_n_bins=10000,
@@ -86,7 +86,7 @@ def test_run_training_flow(
         dataset_name="SMALL_GNPS.json",
         chunk_size=150000,
         ion_mode="positive",
-        scores_output_path=str(tmpdir / "tanimoto_scores.pkl"),
+        scores_output_path=str(tmpdir / "tanimoto_scores.npy"),
         fingerprint_n_bits=2048,
         scores_decimals=5,
         spectrum_binner_n_bins=10000,
@@ -116,7 +116,7 @@ def test_run_training_flow(
     flow_run.result[download_task].is_cached()
     assert len(fs.ls(ASSETS_DIR / "raw/positive")) == 4
     assert fs.exists(ASSETS_DIR / "raw/positive/raw_chunk_paths.pickle")
-    assert fs.exists(tmpdir / "tanimoto_scores.pkl")
+    assert fs.exists(tmpdir / "tanimoto_scores.npy")
     assert fs.exists(tmpdir / "model.hdf5")
     assert fs.exists(tmpdir / "spectrum_binner.pkl")
     assert fs.exists(tmpdir / "binned_spectra.pkl")
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from omigami.spectra_matching.ms2deepscore.helper_classes.fingerprint_store import (
+    FingerprintStore,
+    fingerprint_key,
+)
+from omigami.spectra_matching.storage import FSDataGateway
+
+
+def derive(inchis):
+    return np.array([[len(inchi), 1] for inchi in inchis], dtype=np.uint64)
+
+
+def test_get_fingerprints_derives_only_new_ones():
+    store = FingerprintStore()
+    inchis = pd.Series(["InChI=1S/A", "InChI=1S/BB"], index=["KEY1", "KEY2"])
+    store.get_fingerprints(inchis, 128, derive)
+
+    inchis["KEY2"] = "InChI=1S/CCC"
+    inchis["KEY3"] = "InChI=1S/DDDD"
+    keys, fingerprints, n_derived = store.get_fingerprints(inchis, 128, derive)
+
+    assert n_derived == 2
+    assert keys[0] == fingerprint_key("KEY1", "InChI=1S/A", 128)
+    np.testing.assert_array_equal(fingerprints, derive(inchis.values))
+    assert len(store) == 4
+
+
+def test_save_and_load(tmpdir):
+    path = f"{tmpdir}/fingerprints.pickle"
+    fs_dgw = FSDataGateway()
+    store = FingerprintStore()
+    inchis = pd.Series(["InChI=1S/A", "InChI=1S/BB"], index=["KEY1", "KEY2"])
+    store.get_fingerprints(inchis, 128, derive)
+
+    store.save(fs_dgw, path)
+    loaded = FingerprintStore.load(fs_dgw, path)
+    _, fingerprints, n_derived = loaded.get_fingerprints(inchis, 128, derive)
+
+    assert n_derived == 0
+    np.testing.assert_array_equal(fingerprints, derive(inchis.values))
+    assert len(FingerprintStore.load(fs_dgw, f"{tmpdir}/missing.pickle")) == 0
@@ -1,4 +1,5 @@
 import os
+from unittest.mock import Mock
 
 import numpy as np
 import pytest
@@ -27,3 +28,22 @@ def test_make_embedding(binned_spectra, siamese_model):
     embedding = maker.make_embedding(siamese_model, binned_spectra[0])
     assert isinstance(embedding, MS2DeepScoreEmbedding)
     assert isinstance(embedding.vector, np.ndarray)
+
+
+def test_make_embeddings_in_batches(binned_spectra):
+    input_dim = 1 + max(
+        int(bin_index)
+        for binned_spectrum in binned_spectra[:5]
+        for bin_index in binned_spectrum.binned_peaks
+    )
+    model = Mock(input_dim=input_dim)
+    model.base.predict = Mock(side_effect=lambda X, batch_size: X)
+    maker = EmbeddingMaker(batch_size=2)
+
+    embeddings = maker.make_embeddings(model, binned_spectra[:5])
+
+    assert model.base.predict.call_count == 3
+    for embedding, binned_spectrum in zip(embeddings, binned_spectra[:5]):
+        expected_vector = maker._create_input_vector(binned_spectrum, input_dim)
+        assert embedding.spectrum_id == binned_spectrum.metadata["spectrum_id"]
+        np.testing.assert_array_equal(embedding.vector, expected_vector)
@@ -1,7 +1,10 @@
-from ms2deepscore import BinnedSpectrum
+import numpy as np
+import pytest
+from ms2deepscore import BinnedSpectrum, SpectrumBinner
 
 from omigami.spectra_matching.ms2deepscore.helper_classes.spectrum_binner import (
     MS2DeepScoreSpectrumBinner,
+    create_input_matrix,
 )
 
 
@@ -19,3 +22,96 @@ def test_bin_spectra(cleaned_data_ms2deep_score):
     assert [spectra.get("inchikey") for spectra in binned_spectra] == [
         spectra.get("inchikey") for spectra in cleaned_data_ms2deep_score
     ]
+
+
+def test_create_input_matrix(cleaned_data_ms2deep_score):
+    binned_spectra = MS2DeepScoreSpectrumBinner().bin_spectra(
+        cleaned_data_ms2deep_score[:5]
+    )
+    # binned elsewhere, e.g. by the model's binner, so without peak arrays
+    binned_spectra[1] = BinnedSpectrum(
+        {str(k): v for k, v in binned_spectra[1].binned_peaks.items()}, {}
+    )
+    input_dim = 1 + max(
+        int(bin_index)
+        for binned_spectrum in binned_spectra
+        for bin_index in binned_spectrum.binned_peaks
+    )
+
+    X = create_input_matrix(binned_spectra, input_dim)
+
+    assert X.dtype == np.float32
+    for row, binned_spectrum in zip(X, binned_spectra):
+        for bin_index, weight in binned_spectrum.binned_peaks.items():
+            assert row[int(bin_index)] == np.float32(weight)
+        assert np.count_nonzero(row) == np.count_nonzero(
+            list(binned_spectrum.binned_peaks.values())
+        )
+    assert create_input_matrix([], input_dim).shape == (0, input_dim)
+
+
+def test_fit_learns_bins_of_fit_transform(cleaned_data_ms2deep_score):
+    spectrum_binner = MS2DeepScoreSpectrumBinner()
+    spectrum_binner.fit(cleaned_data_ms2deep_score)
+    expected_binner = SpectrumBinner(number_of_bins=10000)
+    expected_binned_spectra = expected_binner.fit_transform(cleaned_data_ms2deep_score)
+
+    binned_spectra = spectrum_binner.transform(cleaned_data_ms2deep_score)
+
+    assert spectrum_binner.spectrum_binner.known_bins == expected_binner.known_bins
+    assert (
+        spectrum_binner.spectrum_binner.peak_to_position
+        == expected_binner.peak_to_position
+    )
+    assert [binned.binned_peaks for binned in binned_spectra] == [
+        binned.binned_peaks for binned in expected_binned_spectra
+    ]
+
+
+def test_fit_chunks(cleaned_data_ms2deep_score):
+    spectrum_binner = MS2DeepScoreSpectrumBinner()
+    expected_binner = MS2DeepScoreSpectrumBinner()
+    expected_binner.fit(cleaned_data_ms2deep_score)
+
+    n_spectra = spectrum_binner.fit_chunks(
+        iter(
+            [
+                cleaned_data_ms2deep_score[:4],
+                [],
+                iter(cleaned_data_ms2deep_score[4:]),
+            ]
+        )
+    )
+
+    assert n_spectra == len(cleaned_data_ms2deep_score)
+    assert (
+        spectrum_binner.spectrum_binner.known_bins
+        == expected_binner.spectrum_binner.known_bins
+    )
+    assert (
+        spectrum_binner.spectrum_binner.peak_to_position
+        == expected_binner.spectrum_binner.peak_to_position
+    )
+
+
+@pytest.mark.parametrize("n_processes", [1, 2])
+def test_transform_chunks(cleaned_data_ms2deep_score, n_processes):
+    spectrum_binner = MS2DeepScoreSpectrumBinner()
+    spectrum_binner.fit(cleaned_data_ms2deep_score)
+    chunks = [cleaned_data_ms2deep_score[:4], [], cleaned_data_ms2deep_score[4:]]
+
+    binned_chunks = list(spectrum_binner.transform_chunks(chunks, n_processes))
+
+    assert [len(binned) for binned in binned_chunks] == [len(chunk) for chunk in chunks]
+    binned_spectra = binned_chunks[0] + binned_chunks[2]
+    expected = spectrum_binner.transform(cleaned_data_ms2deep_score)
+    assert [binned.get("spectrum_id") for binned in binned_spectra] == [
+        binned.get("spectrum_id") for binned in expected
+    ]
+    assert [binned.binned_peaks for binned in binned_spectra] == [
+        binned.binned_peaks for binned in expected
+    ]
+    assert all(
+        np.array_equal(binned.peak_arrays[0], expected_binned.peak_arrays[0])
+        for binned, expected_binned in zip(binned_spectra, expected)
+    )
@@ -1,6 +1,7 @@
 import numpy as np
 import pytest
 from matchms import Spectrum
+from matchms.filtering import normalize_intensities
 from matchms.importing.load_from_json import as_spectrum
 
 from omigami.spectra_matching.ms2deepscore.helper_classes.spectrum_processor import (
@@ -53,6 +54,49 @@ def test_apply_ms2deepscore_filters_not_enough_peaks(
     assert filtered_spectrum is None
 
 
+def test_process_batch(common_cleaned_data, spectrum_processor):
+    spectra = common_cleaned_data[:20] + [
+        Spectrum(
+            mz=common_cleaned_data[0].peaks.mz[:4],
+            intensities=common_cleaned_data[0].peaks.intensities[:4],
+        ),
+        Spectrum(mz=np.array([], dtype=float), intensities=np.array([], dtype=float)),
+    ]
+
+    processed_spectra = spectrum_processor.process_batch(spectra, False)
+
+    assert len(processed_spectra) == len(spectra)
+    assert processed_spectra[-2:] == [None, None]
+    for spectrum, processed_spectrum in zip(spectra, processed_spectra):
+        expected = spectrum_processor._apply_ms2deepscore_filters(
+            normalize_intensities(spectrum)
+        )
+        if expected is None:
+            assert processed_spectrum is None
+        else:
+            np.testing.assert_array_equal(
+                processed_spectrum.peaks.mz, expected.peaks.mz
+            )
+            np.testing.assert_array_equal(
+                processed_spectrum.peaks.intensities, expected.peaks.intensities
+            )
+            assert processed_spectrum.metadata == expected.metadata
+
+
+def test_process_batch_keeps_input_metadata(spectrum_processor):
+    inchi = '"InChI=1S/C2H6O/c1-2-3/h3H, 2H2, 1H3"'
+    spectrum = Spectrum(
+        mz=np.array([100.0, 200.0, 300.0, 400.0, 500.0]),
+        intensities=np.array([0.5, 1.0, 0.2, 0.4, 0.8]),
+        metadata={"inchikey": "LFQSCWFLJHTTHZ-UHFFFAOYSA-N", "inchi": inchi},
+    )
+
+    processed_spectrum = spectrum_processor.process_batch([spectrum], True)[0]
+
+    assert processed_spectrum.get("inchi") == "InChI=1S/C2H6O/c1-2-3/h3H,2H2,1H3"
+    assert spectrum.get("inchi") == inchi
+
+
 @pytest.mark.skip("Uses internet connection.")
 def test_run_missing_smiles_inchi_against_pubchem(
     common_cleaned_data, spectrum_processor
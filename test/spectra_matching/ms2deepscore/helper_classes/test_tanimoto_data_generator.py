@@ -0,0 +1,52 @@
+from copy import deepcopy
+
+import numpy as np
+import pytest
+
+from omigami.spectra_matching.ms2deepscore.helper_classes.tanimoto_data_generator import (
+    TanimotoMatrixDataGenerator,
+)
+
+
+@pytest.fixture()
+def data_generator(binned_spectra_to_train, tanimoto_scores, fitted_spectrum_binner):
+    return TanimotoMatrixDataGenerator(
+        binned_spectrums=binned_spectra_to_train,
+        tanimoto_matrix=tanimoto_scores,
+        dim=len(fitted_spectrum_binner.known_bins),
+        batch_size=8,
+        augment_noise_max=0,
+    )
+
+
+def test_find_match_in_range(data_generator, binned_spectra_to_train):
+    inchikey = binned_spectra_to_train[0].get("inchikey")[:14]
+
+    match = data_generator._find_match_in_range(inchikey, (0.5, 1))
+
+    assert match != inchikey
+    assert any(s.get("inchikey")[:14] == match for s in binned_spectra_to_train)
+
+
+def test_get_item(data_generator, tanimoto_scores):
+    pairs = list(data_generator._spectrum_pair_generator(0))
+    X, y = data_generator._data_generation(iter(pairs))
+
+    expected = [
+        tanimoto_scores.rows([pair[0].get("inchikey")[:14]])[0][
+            tanimoto_scores.index[pair[1].get("inchikey")[:14]]
+        ]
+        for pair in pairs
+    ]
+    assert len(X) == 2
+    assert X[0].shape == X[1].shape == (8, data_generator.dim)
+    np.testing.assert_allclose(y, expected, rtol=1e-6)
+    assert data_generator[1][1].shape == (8,)
+
+
+def test_spectra_missing_from_scores(binned_spectra_to_train, tanimoto_scores):
+    spectrum = deepcopy(binned_spectra_to_train[0])
+    spectrum.set("inchikey", "MISSINGINCHIKE-ABCDEFGHIJ-N")
+
+    with pytest.raises(ValueError):
+        TanimotoMatrixDataGenerator([spectrum], tanimoto_scores, dim=100)
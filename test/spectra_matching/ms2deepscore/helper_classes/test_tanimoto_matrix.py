@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from omigami.spectra_matching.ms2deepscore.helper_classes.tanimoto_matrix import (
+    TanimotoMatrix,
+    calculate_tanimoto_scores,
+    pack_fingerprints,
+    read_tanimoto_matrix,
+)
+from omigami.spectra_matching.storage import FSDataGateway
+
+
+class BitString:
+    def __init__(self, bits: np.ndarray):
+        self.bits = bits
+
+    def ToBitString(self) -> str:
+        return "".join(str(bit) for bit in self.bits)
+
+
+@pytest.fixture()
+def bits():
+    rng = np.random.default_rng(0)
+    bits = (rng.random((40, 100)) < 0.3).astype(np.uint8)
+    bits[-1] = 0
+    bits[-2] = 0
+    return bits
+
+
+def expected_scores(bits: np.ndarray) -> np.ndarray:
+    intersection = bits.astype(int) @ bits.T
+    counts = bits.sum(axis=1)
+    union = counts[:, None] + counts[None, :] - intersection
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(union > 0, intersection / union, 1.0)
+
+
+def test_pack_fingerprints(bits):
+    packed = pack_fingerprints([BitString(row) for row in bits], 100)
+
+    assert packed.dtype == np.uint64
+    assert packed.shape == (40, 2)
+    np.testing.assert_array_equal(
+        np.unpackbits(packed.view(np.uint8), axis=1)[:, :100], bits
+    )
+
+
+@pytest.mark.parametrize("n_processes", [1, 2])
+def test_calculate_tanimoto_scores(bits, n_processes):
+    packed = pack_fingerprints([BitString(row) for row in bits], 100)
+    scores = np.full((40, 40), np.nan)
+
+    calculate_tanimoto_scores(packed, scores, tile_size=16, n_processes=n_processes)
+
+    np.testing.assert_allclose(scores, expected_scores(bits), rtol=1e-6)
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("float16", 1e-3), ("uint8", 1 / 510)])
+def test_tanimoto_matrix(bits, tmpdir, dtype, tolerance):
+    path = f"{tmpdir}/tanimoto_scores.npy"
+    inchikeys = [f"INCHIKEY{i:06d}" for i in range(40)]
+    packed = pack_fingerprints([BitString(row) for row in bits], 100)
+
+    fs_dgw = FSDataGateway()
+
+    matrix = TanimotoMatrix.create(fs_dgw, path, inchikeys, dtype)
+    calculate_tanimoto_scores(packed, matrix.scores, tile_size=16, encode=matrix.encode)
+    matrix.flush()
+    loaded = TanimotoMatrix.load(fs_dgw, path)
+
+    assert isinstance(loaded.scores, np.memmap)
+    assert loaded.inchikeys == inchikeys
+    np.testing.assert_allclose(
+        loaded.rows(inchikeys[3:5]), expected_scores(bits)[3:5], atol=tolerance
+    )
+    scores = read_tanimoto_matrix(fs_dgw, path).to_dataframe()
+    assert list(scores.index) == list(scores.columns) == inchikeys
+    np.testing.assert_allclose(
+        scores.to_numpy(dtype=float), expected_scores(bits), atol=tolerance
+    )
+
+
+def test_read_tanimoto_matrix_from_dataframe(bits, tmpdir):
+    path = f"{tmpdir}/tanimoto_scores.pkl"
+    inchikeys = [f"INCHIKEY{i:06d}-ABCDEFGHIJ-N" for i in range(40)]
+    pd.DataFrame(expected_scores(bits), index=inchikeys, columns=inchikeys).to_pickle(
+        path, compression="gzip"
+    )
+
+    matrix = read_tanimoto_matrix(FSDataGateway(), path)
+
+    assert matrix.inchikeys == [inchikey[:14] for inchikey in inchikeys]
+    np.testing.assert_allclose(
+        matrix.rows(matrix.inchikeys[:3]), expected_scores(bits)[:3], rtol=1e-6
+    )
+
+
+def test_tanimoto_matrix_on_remote_filesystem(bits, tmpdir, remote_fs_dgw):
+    path = f"{tmpdir}/tanimoto_scores.npy"
+    inchikeys = [f"INCHIKEY{i:06d}" for i in range(40)]
+    packed = pack_fingerprints([BitString(row) for row in bits], 100)
+
+    matrix = TanimotoMatrix.create(remote_fs_dgw, path, inchikeys)
+    calculate_tanimoto_scores(packed, matrix.scores, tile_size=16, encode=matrix.encode)
+
+    assert not remote_fs_dgw.exists(path)
+    matrix.flush()
+    loaded = TanimotoMatrix.load(remote_fs_dgw, path)
+
+    assert not isinstance(loaded.scores, np.memmap)
+    assert loaded.inchikeys == inchikeys
+    np.testing.assert_allclose(loaded.rows(inchikeys), expected_scores(bits), atol=1e-3)
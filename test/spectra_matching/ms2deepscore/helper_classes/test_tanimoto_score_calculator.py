@@ -2,11 +2,20 @@ import os
 import random
 import string
 from copy import deepcopy
+from unittest.mock import patch
 
 import numpy as np
 import pandas as pd
 import pytest
+from rdkit import Chem
+from rdkit.DataStructs import BulkTanimotoSimilarity
 
+from omigami.spectra_matching.ms2deepscore.helper_classes.fingerprint_store import (
+    FingerprintStore,
+)
+from omigami.spectra_matching.ms2deepscore.helper_classes.tanimoto_matrix import (
+    TanimotoMatrix,
+)
 from omigami.spectra_matching.ms2deepscore.helper_classes.tanimoto_score_calculator import (
     TanimotoScoreCalculator,
 )
@@ -78,3 +87,62 @@ def test_calculate(tanimoto_calculator, tmpdir):
     tanimoto_calculator.calculate(path)
 
     assert os.path.exists(path)
+
+
+def test_calculate_tanimoto_matrix(tanimoto_calculator, inchis, tmpdir):
+    path = f"{tmpdir}/tanimoto_scores.npy"
+    tanimoto_calculator._calculate_tanimoto_matrix(inchis, path)
+
+    matrix = TanimotoMatrix.load(tanimoto_calculator._fs_dgw, path)
+    fingerprints = [Chem.RDKFingerprint(Chem.MolFromInchi(i)) for i in inchis]
+    expected = [BulkTanimotoSimilarity(fp, fingerprints) for fp in fingerprints]
+    assert matrix.inchikeys == list(inchis.index)
+    np.testing.assert_allclose(matrix.rows(matrix.inchikeys), expected, atol=1e-3)
+
+
+def test_update_tanimoto_matrix(tanimoto_calculator, inchis, tmpdir):
+    path = f"{tmpdir}/tanimoto_scores.npy"
+    tanimoto_calculator._calculate_tanimoto_matrix(inchis[:-2], path)
+
+    with patch.object(
+        tanimoto_calculator,
+        "_derive_fingerprints",
+        wraps=tanimoto_calculator._derive_fingerprints,
+    ) as derive, patch(
+        "omigami.spectra_matching.ms2deepscore.helper_classes."
+        "tanimoto_score_calculator.calculate_tanimoto_scores"
+    ) as calculate_all:
+        tanimoto_calculator._calculate_tanimoto_matrix(inchis, path)
+
+    derive.assert_called_once_with(list(inchis[-2:]))
+    calculate_all.assert_not_called()
+    updated = TanimotoMatrix.load(tanimoto_calculator._fs_dgw, path)
+    tanimoto_calculator._fingerprint_store = FingerprintStore()
+    tanimoto_calculator._calculate_tanimoto_matrix(inchis, f"{tmpdir}/new.npy")
+    expected = TanimotoMatrix.load(tanimoto_calculator._fs_dgw, f"{tmpdir}/new.npy")
+    assert updated.inchikeys == expected.inchikeys
+    np.testing.assert_array_equal(updated.scores, expected.scores)
+
+
+def test_update_tanimoto_matrix_on_remote_filesystem(
+    binned_spectra_to_train_path, inchis, tmpdir, remote_fs_dgw
+):
+    path = f"{tmpdir}/tanimoto_scores.npy"
+    tanimoto_calculator = TanimotoScoreCalculator(
+        fs_dgw=remote_fs_dgw, binned_spectra_path=binned_spectra_to_train_path
+    )
+    tanimoto_calculator._calculate_tanimoto_matrix(inchis[:-2], path)
+
+    with patch(
+        "omigami.spectra_matching.ms2deepscore.helper_classes."
+        "tanimoto_score_calculator.calculate_tanimoto_scores"
+    ) as calculate_all:
+        tanimoto_calculator._calculate_tanimoto_matrix(inchis, path)
+
+    calculate_all.assert_not_called()
+    assert not remote_fs_dgw.exists(f"{tmpdir}/tanimoto_scores.updated.npy")
+    updated = TanimotoMatrix.load(remote_fs_dgw, path)
+    assert updated.inchikeys == list(inchis.index)
+    fingerprints = [Chem.RDKFingerprint(Chem.MolFromInchi(i)) for i in inchis]
+    expected = [BulkTanimotoSimilarity(fp, fingerprints) for fp in fingerprints]
+    np.testing.assert_allclose(updated.rows(updated.inchikeys), expected, atol=1e-3)
@@ -0,0 +1,86 @@
+from unittest.mock import patch
+
+import numpy as np
+
+from omigami.spectra_matching.ms2deepscore.storage.binned_spectra_store import (
+    BinnedSpectraSequence,
+    BinnedSpectraStore,
+    binned_spectra_metadata,
+    read_binned_spectra,
+    read_binned_spectra_metadata,
+)
+from omigami.spectra_matching.ms2deepscore.storage.fs_data_gateway import (
+    MS2DeepScoreFSDataGateway,
+)
+
+
+def test_write_and_read_shards(binned_spectra_to_train, tmpdir):
+    fs_dgw = MS2DeepScoreFSDataGateway()
+    directory = f"{tmpdir}/binned_spectra"
+    store = BinnedSpectraStore(fs_dgw, directory)
+    store.write_shard("shard_0", binned_spectra_to_train[:100])
+    store.write_shard("shard_1", binned_spectra_to_train[100:])
+    store.save_shards(["shard_0", "shard_1"])
+
+    binned_spectra = read_binned_spectra(fs_dgw, directory)
+
+    assert len(binned_spectra) == len(binned_spectra_to_train)
+    for binned_spectrum, expected in zip(binned_spectra, binned_spectra_to_train):
+        assert binned_spectrum.metadata == expected.metadata
+        assert binned_spectrum.binned_peaks.keys() == expected.binned_peaks.keys()
+        np.testing.assert_allclose(
+            list(binned_spectrum.binned_peaks.values()),
+            list(expected.binned_peaks.values()),
+            rtol=1e-6,
+        )
+    assert [
+        metadata["inchikey"]
+        for metadata in read_binned_spectra_metadata(fs_dgw, directory)
+    ] == [spectrum.get("inchikey") for spectrum in binned_spectra_to_train]
+
+
+def test_read_pickled_binned_spectra(binned_spectra_to_train_path):
+    fs_dgw = MS2DeepScoreFSDataGateway()
+
+    binned_spectra = read_binned_spectra(fs_dgw, str(binned_spectra_to_train_path))
+    metadata = list(
+        read_binned_spectra_metadata(fs_dgw, str(binned_spectra_to_train_path))
+    )
+
+    assert len(binned_spectra) == len(metadata)
+    assert metadata[0] == binned_spectra[0].metadata
+
+
+def test_binned_spectra_are_read_lazily(binned_spectra_to_train, tmpdir):
+    fs_dgw = MS2DeepScoreFSDataGateway()
+    directory = f"{tmpdir}/binned_spectra"
+    store = BinnedSpectraStore(fs_dgw, directory)
+    store.write_shard("shard_0", binned_spectra_to_train[:100])
+    store.write_shard("shard_1", binned_spectra_to_train[100:])
+    store.save_shards(["shard_0", "shard_1"])
+
+    with patch.object(
+        BinnedSpectraStore,
+        "read_shard_arrays",
+        autospec=True,
+        side_effect=BinnedSpectraStore.read_shard_arrays,
+    ) as read_shard_arrays:
+        binned_spectra = read_binned_spectra(fs_dgw, directory)
+        assert isinstance(binned_spectra, BinnedSpectraSequence)
+        assert binned_spectra_metadata(binned_spectra) == [
+            spectrum.metadata for spectrum in binned_spectra_to_train
+        ]
+        read_shard_arrays.assert_not_called()
+
+        selected = binned_spectra.take([101, 3, 102])
+        assert [spectrum.get("spectrum_id") for spectrum in selected] == [
+            binned_spectra_to_train[i].get("spectrum_id") for i in [101, 3, 102]
+        ]
+        assert read_shard_arrays.call_count == 2
+
+    assert (
+        selected[0].binned_peaks.keys()
+        == binned_spectra_to_train[101].binned_peaks.keys()
+    )
+    assert len(binned_spectra[98:102]) == 4
+    assert binned_spectra[-1].metadata == binned_spectra_to_train[-1].metadata
@@ -0,0 +1,34 @@
+import pickle
+
+import mlflow
+
+from omigami.config import MLFLOW_DIRECTORY
+from omigami.spectra_matching.ms2deepscore.tasks import (
+    RegisterModel,
+    RegisterModelParameters,
+    TrainModelParameters,
+)
+
+
+def test_register_model_with_response_cache(siamese_model_path, tmpdir):
+    mlflow_uri = f"sqlite:///{tmpdir}/mlflow.sqlite"
+    params = RegisterModelParameters(
+        "test_experiment",
+        mlflow_uri,
+        str(MLFLOW_DIRECTORY),
+        "positive",
+        response_cache_size=100,
+        response_cache_ttl=60,
+    )
+    train_params = TrainModelParameters("path", "positive", "path")
+    register_task = RegisterModel(params, train_params)
+
+    run_id = register_task.run(
+        {"ms2deepscore_model_path": siamese_model_path, "validation_loss": 0.5}
+    )
+
+    artifact_uri = mlflow.get_run(run_id).info.artifact_uri
+    with open(f"{artifact_uri}/model/python_model.pkl", "rb") as f:
+        predictor = pickle.load(f)
+    assert predictor.response_cache.max_size == 100
+    assert predictor.response_cache.redis_ttl == 60
@@ -17,12 +17,21 @@ def test_ms2deepscore_cli():
         "ion_mode",
         "schedule",
         "scores_decimals",
+        "scores_dtype",
+        "tanimoto_processes",
         "spectrum_binner_n_bins",
         "spectrum_ids_chunk_size",
         "test_ratio",
         "train_ratio",
         "validation_ratio",
         "local",
+        "incremental",
+        "chunk_format",
+        "chunk_all_ion_modes",
+        "cleaning_processes",
+        "binning_processes",
+        "response_cache_size",
+        "response_cache_ttl",
     }
 
     assert command.name == "train"
@@ -37,7 +46,7 @@ def test_ms2ds_deploy_model_cli():
     main_args = inspect.getfullargspec(run_deploy_ms2ds_model_flow)
     command = ms2deepscore_cli.commands["deploy-model"]
     required_params = {"model_run_id", "flow_name", "dataset_id"}
-    optional_params = {"ion_mode", "image"}
+    optional_params = {"ion_mode", "image", "build_embedding_index"}
 
     assert command.name == "deploy-model"
     assert set(main_args.args) == {p.name for p in command.params}
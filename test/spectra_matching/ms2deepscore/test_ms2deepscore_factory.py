@@ -1,7 +1,13 @@
+from unittest.mock import patch
+
 from prefect import Flow
 
 from omigami.config import STORAGE_ROOT, MLFLOW_SERVER, REDIS_HOST, OMIGAMI_ENV
+from omigami.spectra_matching.ms2deepscore.config import DIRECTORIES
 from omigami.spectra_matching.ms2deepscore.factory import MS2DeepScoreFlowFactory
+from omigami.spectra_matching.ms2deepscore.helper_classes.tanimoto_matrix import (
+    TanimotoMatrix,
+)
 from omigami.spectra_matching.storage import REDIS_DB
 
 
@@ -18,13 +24,30 @@ def test_build_ms2deep_training_flow():
         fingerprint_n_bits=2048,
         scores_decimals=5,
         spectrum_binner_n_bins=10000,
+        tanimoto_processes=4,
+        scores_dtype="uint8",
+        chunk_format="jsonl",
+        chunk_all_ion_modes=True,
+        cleaning_processes=4,
+        binning_processes=4,
     )
 
     assert isinstance(ms2deep_training_flow, Flow)
     assert ms2deep_training_flow.name == "MS2DeepScore Training Flow"
-    assert len(ms2deep_training_flow.tasks) == 7
+    assert len(ms2deep_training_flow.tasks) == 8
     tanimoto_task = ms2deep_training_flow.get_tasks("CalculateTanimotoScore")[0]
     assert tanimoto_task._decimals == 5
+    assert tanimoto_task._n_processes == 4
+    assert tanimoto_task._scores_dtype == "uint8"
+    assert tanimoto_task._scores_output_path.endswith(".npy")
+    chunks_task = ms2deep_training_flow.get_tasks("CreateChunks")[0]
+    assert chunks_task._chunk_format == "jsonl"
+    assert set(chunks_task._output_directories) == {"positive", "negative"}
+    clean_task = ms2deep_training_flow.get_tasks("CleanRawSpectra")[0]
+    assert clean_task._derivation_namespace == "Raging Flow/positive"
+    assert clean_task._n_processes == 4
+    process_task = ms2deep_training_flow.get_tasks("ProcessSpectrum")[0]
+    assert process_task._n_processes == 4
     assert ms2deep_training_flow.storage.directory == str(STORAGE_ROOT)
     assert ms2deep_training_flow.run_config.env == {
         "REDIS_DB": REDIS_DB,
@@ -35,6 +58,37 @@ def test_build_ms2deep_training_flow():
     }
 
 
+def test_training_flow_updates_tanimoto_matrix(binned_spectra_to_train_path, tmpdir):
+    directories = {**DIRECTORIES, "binned_spectra": "binned_spectra.pkl"}
+    factory = MS2DeepScoreFlowFactory(storage_root=str(tmpdir), directories=directories)
+    ms2deep_training_flow = factory.build_training_flow(
+        flow_name="MS2DeepScore Training Flow",
+        dataset_id="small",
+        fingerprint_n_bits=2048,
+        scores_decimals=5,
+        spectrum_binner_n_bins=10000,
+    )
+    tanimoto_task = ms2deep_training_flow.get_tasks("CalculateTanimotoScore")[0]
+    fs_dgw = tanimoto_task._fs_dgw
+    binned_spectra = fs_dgw.read_from_file(binned_spectra_to_train_path)
+    fs_dgw.serialize_to_file(tanimoto_task._binned_spectra_path, binned_spectra[:-5])
+    scores_path = tanimoto_task.run(set())
+    n_previous = len(TanimotoMatrix.load(fs_dgw, scores_path))
+    fs_dgw.serialize_to_file(tanimoto_task._binned_spectra_path, binned_spectra)
+
+    with patch(
+        "omigami.spectra_matching.ms2deepscore.helper_classes."
+        "tanimoto_score_calculator.calculate_tanimoto_scores"
+    ) as calculate_all:
+        scores_path = tanimoto_task.run(set())
+
+    calculate_all.assert_not_called()
+    matrix = TanimotoMatrix.load(fs_dgw, scores_path)
+    inchikeys = {spectrum.get("inchikey")[:14] for spectrum in binned_spectra}
+    assert set(matrix.inchikeys) == inchikeys
+    assert len(matrix) > n_previous
+
+
 def test_build_model_deployment_flow():
     factory = MS2DeepScoreFlowFactory()
     model_deployment_flow = factory.build_model_deployment_flow(
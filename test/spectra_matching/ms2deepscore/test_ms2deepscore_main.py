@@ -54,9 +54,18 @@ def test_mocked_deploy_training_flow(mock_objects):
         dataset_id="small",
         ion_mode="positive",
         schedule=None,
+        incremental=False,
+        chunk_format="jsonl",
+        chunk_all_ion_modes=True,
+        cleaning_processes=4,
+        binning_processes=4,
+        response_cache_size=100,
+        response_cache_ttl=60,
         spectrum_ids_chunk_size=100,
         fingerprint_n_bits=2048,
         scores_decimals=5,
+        scores_dtype="uint8",
+        tanimoto_processes=4,
         spectrum_binner_n_bins=10000,
         train_ratio=0.8,
         validation_ratio=0.2,
@@ -84,6 +93,7 @@ def test_run_mocked_deploy_model_flow(mock_objects):
         image="star wars episode II wasn't so bad",
         dataset_id="small",
         ion_mode="positive",
+        build_embedding_index=True,
     )
 
     flow_id, flow_run_id = run_deploy_ms2ds_model_flow(
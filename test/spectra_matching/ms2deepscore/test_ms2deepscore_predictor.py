@@ -2,10 +2,12 @@ from copy import deepcopy
 from unittest.mock import Mock
 
 import mlflow
+import numpy as np
 import pandas as pd
 from seldon_core.metrics import SeldonMetrics
 from seldon_core.wrapper import get_rest_microservice
 
+from omigami.spectra_matching.entities.embedding import EmbeddingMatrix
 from test.spectra_matching.conftest import MLFlowServer
 
 
@@ -60,9 +62,17 @@ def test_parse_input(ms2ds_payload, ms2deepscore_predictor):
 
 def test_get_best_matches(ms2ds_saved_embeddings, ms2deepscore_predictor):
     n_best_spectra = 2
-    best_matches = ms2deepscore_predictor._calculate_best_matches(
+    spectrum_ids = [embedding.spectrum_id for embedding in ms2ds_saved_embeddings]
+    references = EmbeddingMatrix.from_embeddings(
         ms2ds_saved_embeddings,
+        spectrum_ids,
+        np.arange(len(spectrum_ids), dtype=float),
+    )
+    best_matches = ms2deepscore_predictor._calculate_best_matches(
+        references,
         ms2ds_saved_embeddings,
+        np.zeros(len(spectrum_ids), dtype=int),
+        np.full(len(spectrum_ids), len(spectrum_ids)),
         n_best_spectra=n_best_spectra,
     )
 
@@ -1,7 +1,10 @@
 import os
 from pathlib import Path
+from unittest.mock import Mock
 
+import prefect
 import pytest
+from prefect import Flow
 
 from omigami.spectra_matching.spec2vec.config import PREDICTOR_ENV_PATH
 from omigami.spectra_matching.spec2vec.flows.deploy_model import (
@@ -9,8 +12,17 @@ from omigami.spectra_matching.spec2vec.flows.deploy_model import (
     build_deploy_model_flow,
 )
 from omigami.spectra_matching.spec2vec.predictor import Spec2VecPredictor
+from omigami.spectra_matching.spectra_manifest import (
+    SpectraManifest,
+    CONTENT_HASHES_FILE,
+    manifest_path,
+)
 from omigami.spectra_matching.storage import RedisSpectrumDataGateway, FSDataGateway
 from omigami.spectra_matching.storage.model_registry import MLFlowDataGateway
+from omigami.spectra_matching.tasks import (
+    ReuseCleanedSpectra,
+    ReuseCleanedSpectraParameters,
+)
 
 
 def test_s2v_deploy_model_flow(flow_config, tmpdir):
@@ -56,6 +68,74 @@ def test_s2v_deploy_model_flow(flow_config, tmpdir):
     assert task_names == expected_tasks
 
 
+def test_s2v_deploy_model_flow_with_embedding_index(flow_config, tmpdir):
+    params = DeployModelFlowParameters(
+        spectrum_dgw=RedisSpectrumDataGateway("project"),
+        fs_dgw=FSDataGateway(),
+        ion_mode="positive",
+        n_decimals=2,
+        documents_directory="directory",
+        dataset_directory=tmpdir,
+        build_embedding_index=True,
+    )
+
+    deploy_model_flow = build_deploy_model_flow("deploy-flow", flow_config, params)
+    build_index_task = deploy_model_flow.get_tasks("BuildEmbeddingIndex")[0]
+    deploy_task = deploy_model_flow.get_tasks("DeployModel")[0]
+
+    assert build_index_task in deploy_model_flow.upstream_tasks(deploy_task)
+
+
+def test_s2v_deploy_model_flow_after_reusing_cleaned_spectra(
+    flow_config, cleaned_data, tmpdir
+):
+    fs_dgw = FSDataGateway()
+    spectrum_ids = [sp.metadata["spectrum_id"] for sp in cleaned_data]
+    previous_path = f"{tmpdir}/previous/chunk_0.pickle"
+    fs_dgw.serialize_to_file(previous_path, cleaned_data)
+    content_hashes = {spectrum_id: "hash" for spectrum_id in spectrum_ids}
+    SpectraManifest(content_hashes, [previous_path]).save(
+        fs_dgw, manifest_path(f"{tmpdir}/manifests", "positive")
+    )
+    fs_dgw.serialize_to_file(
+        f"{tmpdir}/raw/positive/{CONTENT_HASHES_FILE}", content_hashes
+    )
+    # the directories of the incremental training flow
+    reuse_parameters = ReuseCleanedSpectraParameters(
+        raw_directory=f"{tmpdir}/raw/positive",
+        output_directory=f"{tmpdir}/cleaned/positive",
+        manifest_directory=f"{tmpdir}/manifests",
+        ion_mode="positive",
+    )
+    with Flow("training-flow") as training_flow:
+        ReuseCleanedSpectra(fs_dgw, reuse_parameters)([])
+    with prefect.context(checkpointing=True):
+        assert training_flow.run().is_successful()
+    assert fs_dgw.exists(reuse_parameters.checkpoint_file)
+
+    params = DeployModelFlowParameters(
+        spectrum_dgw=RedisSpectrumDataGateway("project"),
+        fs_dgw=fs_dgw,
+        ion_mode="positive",
+        n_decimals=1,
+        documents_directory="directory",
+        dataset_directory=str(tmpdir),
+    )
+    deploy_model_flow = build_deploy_model_flow("deploy-flow", flow_config, params)
+    cache_task = deploy_model_flow.get_tasks("CacheCleanedSpectra")[0]
+    cache_task._spectrum_dgw = Mock(list_spectrum_ids=Mock(return_value=[]))
+
+    cleaned_spectra_paths = deploy_model_flow.get_tasks("ListCleanedSpectraPaths")[
+        0
+    ].run()
+    cached_ids = [cache_task.run(path) for path in cleaned_spectra_paths]
+
+    assert [str(path) for path in cleaned_spectra_paths] == [
+        f"{tmpdir}/cleaned/positive/reused_chunk_0.pickle"
+    ]
+    assert cached_ids == [spectrum_ids]
+
+
 @pytest.fixture()
 def deploy_model_setup(tmpdir_factory, word2vec_model, mock_s2v_deploy_model_task):
     tmpdir = tmpdir_factory.mktemp("model")
@@ -1,10 +1,18 @@
+from copy import deepcopy
+
 import numpy as np
 import pytest
 
 from omigami.spectra_matching.spec2vec.helper_classes.embedding_maker import (
     EmbeddingMaker,
     EmbeddingMakerError,
+    VocabularyTable,
+)
+from omigami.spectra_matching.spec2vec.entities.token_document import (
+    TokenDocument,
+    encode_words,
 )
+from omigami.spectra_matching.spec2vec.storage.token_documents import TokenDocuments
 
 
 def test_check_n_decimals_success(documents_data):
@@ -30,3 +38,78 @@ def test_make_embeddings(documents_data, word2vec_model):
         allowed_missing_percentage=5.0,
     )
     assert isinstance(res.vector, np.ndarray)
+
+
+@pytest.mark.parametrize("token_documents", [False, True])
+def test_make_embeddings_in_batch(documents_data, word2vec_model, token_documents):
+    em = EmbeddingMaker(n_decimals=1)
+    documents = documents_data[:20]
+    batch = (
+        TokenDocuments.from_documents(documents, 1) if token_documents else documents
+    )
+
+    embeddings = em.make_embeddings(word2vec_model, batch, 0.5, 100.0)
+
+    assert len(embeddings) == len(documents)
+    for embedding, document in zip(embeddings, documents):
+        expected = em.make_embedding(word2vec_model, document, 0.5, 100.0)
+        assert embedding.spectrum_id == expected.spectrum_id
+        np.testing.assert_allclose(embedding.vector, expected.vector, rtol=1e-5)
+
+
+def test_make_embeddings_missing_percentage(documents_data, word2vec_model):
+    em = EmbeddingMaker(n_decimals=1)
+    words = ["peak@-1.0"] + documents_data[0].words[1:]
+    document = TokenDocument(
+        encode_words(words), documents_data[0].weights, 1, "spectrum_id", words
+    )
+
+    with pytest.raises(AssertionError):
+        em.make_embedding(word2vec_model, document, 0.5, 0.0)
+    with pytest.raises(AssertionError):
+        em.make_embeddings(word2vec_model, [document], 0.5, 0.0)
+    assert em.make_embeddings(word2vec_model, [document], 0.5, 100.0)
+
+
+def test_vocabulary_table(documents_data, word2vec_model):
+    words = documents_data[0].words + ["peak@-1.0", "loss@12345.6"]
+
+    rows = VocabularyTable(word2vec_model).rows(encode_words(words))
+
+    expected = [
+        word2vec_model.wv.vocab[word].index if word in word2vec_model.wv.vocab else -1
+        for word in words
+    ]
+    assert rows.tolist() == expected
+
+
+def test_make_embeddings_with_vocabulary_table(documents_data, word2vec_model):
+    em = EmbeddingMaker(n_decimals=1)
+    documents = TokenDocuments.from_documents(documents_data[:20], 1)
+    expected = em.make_embeddings(word2vec_model, documents, 0.5, 100.0)
+
+    em.load_vocabulary_table(word2vec_model)
+    embeddings = em.make_embeddings(word2vec_model, documents, 0.5, 100.0)
+
+    for embedding, expected_embedding in zip(embeddings, expected):
+        np.testing.assert_array_equal(embedding.vector, expected_embedding.vector)
+
+
+def test_make_embeddings_with_vocabulary_table_of_other_model(
+    documents_data, word2vec_model
+):
+    em = EmbeddingMaker(n_decimals=1)
+    documents = TokenDocuments.from_documents(documents_data[:20], 1)
+    expected = em.make_embeddings(word2vec_model, documents, 0.5, 100.0)
+    # the same vectors in the reverse order, so the words map to other rows
+    other_model = deepcopy(word2vec_model)
+    for vocab in other_model.wv.vocab.values():
+        vocab.index = len(other_model.wv.vocab) - 1 - vocab.index
+    other_model.wv.vectors = other_model.wv.vectors[::-1].copy()
+
+    em.load_vocabulary_table(other_model)
+    embeddings = em.make_embeddings(word2vec_model, documents, 0.5, 100.0)
+
+    assert em.vocabulary_table.model is word2vec_model
+    for embedding, expected_embedding in zip(embeddings, expected):
+        np.testing.assert_array_equal(embedding.vector, expected_embedding.vector)
@@ -1,4 +1,5 @@
 import os
+from unittest.mock import Mock
 
 import pytest
 
@@ -24,3 +25,83 @@ def test_read_documents_iter(documents_stored, s3_documents_directory, s3_mock):
         document_counter += 1
 
     assert document_counter == len(document_file_names) * 10
+
+
+@pytest.fixture
+def local_document_paths(documents_data, tmpdir):
+    fs_dgw = FSDataGateway()
+    paths = []
+    for i in range(0, 30, 10):
+        path = str(tmpdir / f"documents/test{i}.pickle")
+        fs_dgw.serialize_to_file(path, documents_data[i : i + 10])
+        paths.append(path)
+    return paths
+
+
+@pytest.mark.parametrize("n_prefetch", [0, 1, 2])
+def test_iterate_cached_documents(
+    local_document_paths, documents_data, n_prefetch, tmpdir
+):
+    cache_directory = str(tmpdir / "cache")
+    iterator = FileSystemDocumentIterator(
+        FSDataGateway(), local_document_paths, cache_directory, n_prefetch
+    )
+
+    first_pass = [document.words for document in iterator]
+    for path in local_document_paths:
+        os.remove(path)
+    second_pass = [document.words for document in iterator]
+
+    expected = [document.words for document in documents_data[:30]]
+    assert first_pass == second_pass == expected
+    assert len(os.listdir(cache_directory)) == len(local_document_paths) + 1
+
+
+def test_len_from_manifest(local_document_paths, tmpdir):
+    cache_directory = str(tmpdir / "cache")
+    assert (
+        len(
+            FileSystemDocumentIterator(
+                FSDataGateway(), local_document_paths, cache_directory
+            )
+        )
+        == 30
+    )
+
+    fs_dgw = Mock(wraps=FSDataGateway())
+    iterator = FileSystemDocumentIterator(fs_dgw, local_document_paths, cache_directory)
+
+    assert len(iterator) == 30
+    # only the details of the files are looked up, they are not read again
+    assert {name for name, _, _ in fs_dgw.method_calls} == {"info"}
+
+
+def test_rewritten_documents_are_read_again(
+    local_document_paths, documents_data, tmpdir
+):
+    cache_directory = str(tmpdir / "cache")
+    fs_dgw = FSDataGateway()
+    iterator = FileSystemDocumentIterator(fs_dgw, local_document_paths, cache_directory)
+    assert len(iterator) == 30
+
+    fs_dgw.serialize_to_file(local_document_paths[0], documents_data[40:45])
+    modified_time = os.path.getmtime(local_document_paths[0]) + 10
+    os.utime(local_document_paths[0], (modified_time, modified_time))
+    iterator = FileSystemDocumentIterator(fs_dgw, local_document_paths, cache_directory)
+
+    assert len(iterator) == 25
+    assert [document.words for document in iterator][:5] == [
+        document.words for document in documents_data[40:45]
+    ]
+
+
+def test_write_corpus_file(local_document_paths, documents_data, tmpdir):
+    iterator = FileSystemDocumentIterator(FSDataGateway(), local_document_paths)
+    corpus_path = str(tmpdir / "corpus.txt")
+
+    n_documents = iterator.write_corpus_file(corpus_path)
+
+    with open(corpus_path) as corpus_file:
+        lines = corpus_file.read().splitlines()
+    assert n_documents == len(lines) == 30
+    assert lines[12].split(" ") == documents_data[12].words
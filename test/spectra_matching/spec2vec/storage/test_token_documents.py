@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from omigami.spectra_matching.spec2vec.entities.token_document import (
+    TokenDocument,
+    decode_tokens,
+    encode_mz,
+    encode_words,
+    make_words,
+)
+from omigami.spectra_matching.spec2vec.storage.token_documents import (
+    TokenDocuments,
+    read_documents,
+)
+from omigami.spectra_matching.storage import FSDataGateway
+
+
+@pytest.mark.parametrize("n_decimals", [0, 1, 2, 4])
+def test_encode_and_decode_words(n_decimals):
+    words = [
+        f"{kind}@{mz:.{n_decimals}f}"
+        for kind in ["peak", "loss"]
+        for mz in [0.004, 0.5, 10.0, 99.995, 123.456789, 2345.6]
+    ]
+
+    tokens = encode_words(words)
+
+    assert tokens.dtype == np.int32
+    assert decode_tokens(tokens, n_decimals) == words
+    assert len(set(tokens.tolist())) == len(set(words))
+
+
+def test_encode_mz(documents_data):
+    spectrum = documents_data[0]._obj
+
+    tokens = encode_mz(spectrum.peaks.mz, 1)
+
+    np.testing.assert_array_equal(tokens, encode_words(make_words(spectrum, 1)))
+
+
+def test_token_documents_from_spectra(documents_data):
+    documents = documents_data[:20]
+
+    token_documents = TokenDocuments.from_spectra(
+        [document._obj for document in documents], 1
+    )
+
+    assert len(token_documents) == 20
+    for token_document, document in zip(token_documents, documents):
+        assert token_document.words == document.words
+        np.testing.assert_allclose(token_document.weights, document.weights, 1e-6)
+
+
+def test_token_document_from_spectrum(documents_data):
+    document = documents_data[0]
+
+    token_document = TokenDocument.from_spectrum(document._obj, document.n_decimals)
+
+    assert token_document.words == document.words
+    assert list(token_document) == document.words
+    np.testing.assert_array_equal(token_document.weights, document.weights)
+    assert token_document.get("spectrum_id") == document.get("spectrum_id")
+
+
+def test_save_and_load_token_documents(documents_data, tmpdir):
+    fs_dgw = FSDataGateway()
+    path = str(tmpdir / "documents/chunk_0")
+    TokenDocuments.from_documents(documents_data[:20], 1).save(fs_dgw, path)
+
+    token_documents = read_documents(fs_dgw, path)
+
+    assert isinstance(token_documents.tokens, np.memmap)
+    assert len(token_documents) == 20
+    for token_document, document in zip(token_documents, documents_data):
+        assert token_document.words == document.words
+        np.testing.assert_allclose(token_document.weights, document.weights, 1e-6)
+        assert token_document.get("spectrum_id") == document.get("spectrum_id")
+        assert token_document.n_decimals == document.n_decimals
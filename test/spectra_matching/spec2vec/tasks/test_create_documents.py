@@ -1,6 +1,10 @@
 from prefect import Flow
 from spec2vec import SpectrumDocument
 
+from omigami.spectra_matching.spec2vec.storage.token_documents import (
+    TokenDocuments,
+    read_documents,
+)
 from omigami.spectra_matching.spec2vec.tasks import CreateDocuments
 from omigami.spectra_matching.spec2vec.tasks import CreateDocumentsParameters
 from omigami.spectra_matching.storage import FSDataGateway
@@ -26,6 +30,25 @@ def test_create_documents(cleaned_spectra_paths, cleaned_spectra_chunks, tmpdir)
     assert len(documents) == len(cleaned_spectra_chunks[0])
 
 
+def test_create_token_documents(cleaned_spectra_paths, cleaned_spectra_chunks, tmpdir):
+    fs_dgw = FSDataGateway()
+    documents_directory = tmpdir / "spec2vec/documents/positive/small/2_decimals"
+    parameters = CreateDocumentsParameters(
+        output_directory=str(documents_directory),
+        ion_mode="positive",
+        n_decimals=2,
+        document_format="tokens",
+    )
+
+    path = CreateDocuments(fs_dgw, parameters).run(cleaned_spectra_paths[0])
+
+    assert path == f"{documents_directory}/chunk_0"
+    documents = read_documents(fs_dgw, path)
+    assert isinstance(documents, TokenDocuments)
+    assert len(documents) == len(cleaned_spectra_chunks[0])
+    assert CreateDocuments(fs_dgw, parameters).run(cleaned_spectra_paths[0]) == path
+
+
 def test_create_documents_map(cleaned_spectra_paths, cleaned_spectra_chunks, tmpdir):
     ion_mode = "positive"
     fs_dgw = FSDataGateway()
@@ -24,3 +24,4 @@ def test_make_embeddings(
     assert document_ids
     embeddings = spectrum_dgw.read_embeddings("positive")
     assert isinstance(embeddings[0], Spec2VecEmbedding)
+    assert all(embedding.normalized for embedding in embeddings)
@@ -19,6 +19,16 @@ def test_spec2vec_training_cli():
         "schedule",
         "window",
         "local",
+        "incremental",
+        "chunk_format",
+        "chunk_all_ion_modes",
+        "cleaning_processes",
+        "corpus_file",
+        "document_format",
+        "documents_cache_directory",
+        "preload_embeddings",
+        "response_cache_size",
+        "response_cache_ttl",
         "image",
     }
 
@@ -40,6 +50,7 @@ def test_spec2vec_deploy_model_cli():
         "n_decimals",
         "ion_mode",
         "image",
+        "build_embedding_index",
     }
 
     assert command.name == "deploy-model"
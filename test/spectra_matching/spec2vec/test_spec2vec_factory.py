@@ -19,11 +19,26 @@ def test_build_training_flow():
         ion_mode="positive",
         project_name="Raging Flow",
         chunk_size=int(1e8),
+        chunk_format="jsonl",
+        chunk_all_ion_modes=True,
+        cleaning_processes=4,
+        corpus_file=True,
+        document_format="tokens",
+        documents_cache_directory="documents-cache",
     )
 
     assert isinstance(flow, Flow)
     assert flow.name == "Robert DeFlow"
-    assert len(flow.tasks) == 6
+    assert len(flow.tasks) == 8
+    chunks_task = flow.get_tasks("CreateChunks")[0]
+    assert chunks_task._chunk_format == "jsonl"
+    assert set(chunks_task._output_directories) == {"positive", "negative"}
+    assert flow.get_tasks("CleanRawSpectra")[0]._n_processes == 4
+    documents_task = flow.get_tasks("CreateDocuments")[0]
+    assert documents_task._document_format == "tokens"
+    train_task = flow.get_tasks("TrainModel")[0]
+    assert train_task._corpus_file
+    assert train_task._documents_cache_directory == "documents-cache"
 
 
 def test_build_model_deployment_flow():
@@ -57,6 +57,16 @@ def test_mocked_deploy_training_flow(mock_objects):
         intensity_weighting_power=0.5,
         allowed_missing_percentage=15,
         schedule=None,
+        incremental=False,
+        chunk_format="jsonl",
+        chunk_all_ion_modes=True,
+        cleaning_processes=4,
+        corpus_file=True,
+        document_format="tokens",
+        documents_cache_directory="documents-cache",
+        preload_embeddings=True,
+        response_cache_size=100,
+        response_cache_ttl=60,
     )
 
     flow_id, flow_run_id = run_spec2vec_training_flow(**params)
@@ -83,6 +93,7 @@ def test_run_mocked_deploy_model_flow(mock_objects):
         dataset_id="small",
         n_decimals=2,
         ion_mode="positive",
+        build_embedding_index=True,
     )
 
     flow_id, flow_run_id = run_deploy_spec2vec_model_flow(
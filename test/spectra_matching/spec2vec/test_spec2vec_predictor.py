@@ -3,14 +3,19 @@ from pathlib import Path
 from unittest.mock import Mock
 
 import mlflow
+import numpy as np
 import pandas as pd
 import pytest
 from pytest_redis import factories
 from seldon_core.metrics import SeldonMetrics
 from seldon_core.wrapper import get_rest_microservice
 
-from omigami.spectra_matching.predictor import SpectraMatchingError
-from omigami.spectra_matching.spec2vec.entities.embedding import Spec2VecEmbedding
+from omigami.spectra_matching.embedding_index import EmbeddingIndex
+from omigami.spectra_matching.entities.embedding import EmbeddingMatrix
+from omigami.spectra_matching.predictor import (
+    SpectraMatchingError,
+    APPROXIMATE_SEARCH,
+)
 from omigami.spectra_matching.spec2vec.helper_classes.embedding_maker import (
     EmbeddingMaker,
 )
@@ -92,28 +97,122 @@ def test_pre_process_data(
         intensity_weighting_power=0.5,
         allowed_missing_percentage=25.0,
     )
-    assert all(embedding_from_flow.vector == embeddings_from_model[0].vector)
+    np.testing.assert_allclose(
+        embeddings_from_model[0].vector, embedding_from_flow.vector, rtol=1e-5
+    )
+
+
+def test_get_query_embeddings_from_cache(raw_spectra, spec2vec_predictor):
+    data = raw_spectra[:3]
+    embeddings = spec2vec_predictor._get_query_embeddings(
+        data, spec2vec_predictor._pre_process_data
+    )
+
+    cached_embeddings = spec2vec_predictor._get_query_embeddings(
+        data, lambda data_input: pytest.fail("Cached queries were embedded again.")
+    )
+
+    assert cached_embeddings == embeddings
+    assert spec2vec_predictor.embedding_cache.hits == 3
+    assert spec2vec_predictor.embedding_cache.misses == 3
+
+
+@pytest.fixture()
+def reference_embeddings(spec2vec_embeddings):
+    return EmbeddingMatrix.from_embeddings(
+        spec2vec_embeddings,
+        [embedding.spectrum_id for embedding in spec2vec_embeddings],
+        np.arange(len(spec2vec_embeddings), dtype=float),
+    )
 
 
-def test_get_best_matches(spec2vec_predictor, spec2vec_embeddings):
+def test_get_best_matches(
+    spec2vec_predictor, spec2vec_embeddings, reference_embeddings
+):
     n_best_spectra = 2
-    best_matches = {}
-    for query in spec2vec_embeddings[:2]:
-        input_best_matches = spec2vec_predictor._calculate_best_matches(
-            spec2vec_embeddings,
-            query,
-            n_best_spectra=n_best_spectra,
-        )
-        best_matches[query.spectrum_id] = input_best_matches
+    queries = spec2vec_embeddings[:2]
+    best_matches = spec2vec_predictor._calculate_best_matches(
+        reference_embeddings,
+        queries,
+        np.zeros(len(queries), dtype=int),
+        np.full(len(queries), len(reference_embeddings)),
+        n_best_spectra=n_best_spectra,
+    )
 
-    for query, (best_match_id, best_match) in zip(
-        spec2vec_embeddings, best_matches.items()
-    ):
+    for query, (best_match_id, best_match) in zip(queries, best_matches.items()):
         assert len(best_match) == n_best_spectra
         assert query.spectrum_id == best_match_id
+        assert list(best_match)[0] == query.spectrum_id
         assert "score" in pd.DataFrame(best_match).T.columns
 
 
+def test_get_reference_embeddings_in_memory(
+    spec2vec_predictor, spec2vec_embeddings, reference_embeddings
+):
+    spec2vec_predictor.reference_embeddings = reference_embeddings
+    queries = [spec2vec_embeddings[10], spec2vec_embeddings[50]]
+    data_input = [{"Precursor_MZ": "10"}, {"Precursor_MZ": "50"}]
+
+    references, starts, stops = spec2vec_predictor._get_reference_embeddings(
+        data_input, mz_range=5
+    )
+    best_matches = spec2vec_predictor._calculate_best_matches(
+        references, queries, starts, stops, n_best_spectra=2
+    )
+
+    assert references is reference_embeddings
+    assert list(starts) == [5, 45]
+    assert list(stops) == [16, 56]
+    for query in queries:
+        matches = best_matches[query.spectrum_id]
+        assert len(matches) == 2
+        assert list(matches)[0] == query.spectrum_id
+        assert matches[query.spectrum_id]["score"] == pytest.approx(1, abs=1e-5)
+
+
+def test_get_reference_embeddings_in_memory_empty_window(
+    spec2vec_predictor, reference_embeddings
+):
+    spec2vec_predictor.reference_embeddings = reference_embeddings
+
+    with pytest.raises(RuntimeError):
+        spec2vec_predictor._get_reference_embeddings(
+            [{"Precursor_MZ": "1000"}], mz_range=1
+        )
+
+
+@pytest.mark.parametrize("index_generation, searches", [(1, 1), (0, 0)])
+def test_find_best_matches_with_stale_embedding_index(
+    spec2vec_predictor,
+    spec2vec_embeddings,
+    reference_embeddings,
+    index_generation,
+    searches,
+):
+    spec2vec_predictor.dgw = Mock()
+    spec2vec_predictor.dgw.read_embedding_generation.return_value = 1
+    spec2vec_predictor.reference_embeddings = reference_embeddings
+    spec2vec_predictor.embedding_index = EmbeddingIndex.build(
+        reference_embeddings, generation=index_generation
+    )
+    spec2vec_predictor._search_embedding_index = Mock(
+        wraps=spec2vec_predictor._search_embedding_index
+    )
+    queries = [spec2vec_embeddings[10]]
+
+    best_matches = spec2vec_predictor._find_best_matches(
+        queries,
+        [{"Precursor_MZ": "10"}],
+        mz_range=5,
+        n_best_spectra=2,
+        query_keys=[queries[0].spectrum_id],
+        search=APPROXIMATE_SEARCH,
+    )
+
+    assert spec2vec_predictor._search_embedding_index.call_count == searches
+    assert list(best_matches[queries[0].spectrum_id])[0] == queries[0].spectrum_id
+
+
 @pytest.mark.skipif(
     os.getenv("SKIP_REDIS_TEST", True),
     reason="It can only be run if the Redis is up",
@@ -140,70 +239,44 @@ def test_parse_input(small_payload, spec2vec_predictor):
     os.getenv("SKIP_REDIS_TEST", True),
     reason="It can only be run if the Redis is up",
 )
-def test_get_ref_ids_from_data_input(
-    small_payload, spec2vec_predictor, spec2vec_redis_setup
+def test_local_predictions_preloaded_embeddings(
+    big_payload, spec2vec_redis_setup, word2vec_model
 ):
-    data_input = small_payload.get("data")
-    spectrum_ids = spec2vec_predictor._get_ref_ids_from_data_input(data_input)
-
-    assert spectrum_ids
-    assert isinstance(spectrum_ids[0][0], str)
-
-
-@pytest.mark.skipif(
-    os.getenv("SKIP_REDIS_TEST", True),
-    reason="It can only be run if the Redis is up",
-)
-def test_load_unique_ref_embeddings(spec2vec_predictor, spec2vec_redis_setup):
-    spectrum_ids = [["CCMSLIB00000006878", "CCMSLIB00000007092"]]
-
-    ref_embeddings = spec2vec_predictor._load_unique_ref_embeddings(spectrum_ids)
-
-    assert ref_embeddings
-    assert isinstance(ref_embeddings["CCMSLIB00000006878"], Spec2VecEmbedding)
-
-
-@pytest.mark.skipif(
-    os.getenv("SKIP_REDIS_TEST", True),
-    reason="It can only be run if the Redis is up",
-)
-def test_get_input_ref_embeddings(spec2vec_predictor, spec2vec_redis_setup):
-    input_ref_spectrum_ids = ["CCMSLIB00000006878", "CCMSLIB00000007092"]
-    all_ref_spectrum_ids = [
-        [
-            "CCMSLIB00000006878",
-            "CCMSLIB00000007092",
-            "CCMSLIB00000070262",
-            "CCMSLIB00000070272",
-        ]
-    ]
-    ref_embeddings = spec2vec_predictor._load_unique_ref_embeddings(
-        all_ref_spectrum_ids
+    predictor = Spec2VecPredictor(
+        ion_mode="positive",
+        n_decimals=1,
+        intensity_weighting_power=0.5,
+        allowed_missing_percentage=25,
+        run_id="1",
+        model=word2vec_model,
+        preload_embeddings=True,
     )
+    predictor.load_context(context=None)
 
-    ref_emb_for_input = spec2vec_predictor._get_input_ref_embeddings(
-        input_ref_spectrum_ids, ref_embeddings
+    matches_big = predictor.predict(
+        data_input_and_parameters=big_payload, mz_range=10, context=""
     )
 
-    assert isinstance(ref_emb_for_input[0], Spec2VecEmbedding)
-    assert len(ref_emb_for_input) == len(input_ref_spectrum_ids)
-    assert ref_emb_for_input[0].spectrum_id == input_ref_spectrum_ids[0]
+    assert len(predictor.reference_embeddings) > 0
+    assert len(matches_big) == 2
+    assert len(matches_big["spectrum-0"]) == 2
 
 
 @pytest.mark.skipif(
     os.getenv("SKIP_REDIS_TEST", True),
     reason="It can only be run if the Redis is up",
 )
-def test_add_metadata(spec2vec_predictor, spec2vec_embeddings, spec2vec_redis_setup):
+def test_add_metadata(
+    spec2vec_predictor, spec2vec_embeddings, reference_embeddings, spec2vec_redis_setup
+):
     n_best_spectra = 3
-    best_matches = {}
-    for i, query in enumerate(spec2vec_embeddings):
-        input_best_matches = spec2vec_predictor._calculate_best_matches(
-            spec2vec_embeddings,
-            query,
-            n_best_spectra=n_best_spectra,
-        )
-        best_matches[query.spectrum_id] = input_best_matches
+    best_matches = spec2vec_predictor._calculate_best_matches(
+        reference_embeddings,
+        spec2vec_embeddings,
+        np.zeros(len(spec2vec_embeddings), dtype=int),
+        np.full(len(spec2vec_embeddings), len(reference_embeddings)),
+        n_best_spectra=n_best_spectra,
+    )
 
     best_matches = spec2vec_predictor._add_metadata(best_matches)
 
@@ -214,6 +287,28 @@ def test_add_metadata(spec2vec_predictor, spec2vec_embeddings, spec2vec_redis_se
     assert bm["CCMSLIB00000072099"]["metadata"]["compound_name"] == "Coproporphyrin I"
 
 
+def test_add_metadata_fields(spec2vec_predictor):
+    spec2vec_predictor.dgw = Mock()
+    spec2vec_predictor.dgw.read_spectra_metadata.return_value = {
+        "sp-1": {"compound_name": "Coproporphyrin I"},
+        "sp-2": {"compound_name": "Heme"},
+    }
+    best_matches = {
+        "spectrum-0": {"sp-1": {"score": 0.9}, "sp-2": {"score": 0.8}},
+        "spectrum-1": {"sp-2": {"score": 0.7}},
+    }
+
+    best_matches = spec2vec_predictor._add_metadata(best_matches, ["compound_name"])
+
+    spec2vec_predictor.dgw.read_spectra_metadata.assert_called_once_with(
+        {"sp-1", "sp-2"}, ["compound_name"]
+    )
+    assert best_matches["spectrum-1"]["sp-2"] == {
+        "score": 0.7,
+        "metadata": {"compound_name": "Heme"},
+    }
+
+
 def test_predictor_error_handling(tmpdir):
     predictor = Spec2VecPredictor(
         ion_mode="positive",
@@ -258,7 +353,7 @@ def test_seldon_internal_error_message(registered_s2v_model):
     model_uri = run.info.artifact_uri + "/model"
     predictor = mlflow.pyfunc.load_model(model_uri)
 
-    predictor._model_impl.python_model._get_ref_ids_from_data_input = Mock(
+    predictor._model_impl.python_model._get_reference_embeddings = Mock(
         side_effect=RuntimeError("Funtime error.")
     )
 
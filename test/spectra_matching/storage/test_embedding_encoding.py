@@ -0,0 +1,85 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from omigami.spectra_matching.entities.embedding import Embedding
+from omigami.spectra_matching.ms2deepscore.entities.embedding import (
+    MS2DeepScoreEmbedding,
+)
+from omigami.spectra_matching.spec2vec.entities.embedding import Spec2VecEmbedding
+from omigami.spectra_matching.storage.embedding_encoding import (
+    encode_embedding,
+    decode_embedding,
+    decode_vector_into,
+    is_encoded_embedding,
+    read_header,
+    vector_dim,
+)
+
+
+@pytest.fixture
+def embedding():
+    return Embedding(
+        vector=np.array([[0.6, 0.8, 0.0]]), spectrum_id="sp-0", normalized=True
+    )
+
+
+def test_encode_embedding(embedding):
+    value = encode_embedding(embedding, run_id="run-1")
+
+    assert is_encoded_embedding(value)
+    assert not is_encoded_embedding(pickle.dumps(embedding))
+    assert read_header(value)[:3] == (3, True, "run-1")
+    assert len(value) - read_header(value)[3] == 3 * 4
+
+
+def test_decode_embedding(embedding):
+    decoded = decode_embedding("sp-0", encode_embedding(embedding))
+
+    assert decoded.spectrum_id == "sp-0"
+    assert decoded.normalized
+    assert decoded.vector.dtype == np.float32
+    assert np.allclose(decoded.vector, [0.6, 0.8, 0.0])
+
+
+def test_decode_spec2vec_embedding():
+    embedding = Spec2VecEmbedding(
+        vector=np.array([0.6, 0.8]), spectrum_id="sp-0", n_decimals=1
+    )
+
+    decoded = decode_embedding("sp-0", encode_embedding(embedding, run_id="run-1"))
+
+    assert isinstance(decoded, Spec2VecEmbedding)
+    assert decoded.n_decimals == 1
+    assert not decoded.normalized
+    assert np.allclose(decoded.vector, [0.6, 0.8])
+
+
+def test_decode_ms2deepscore_embedding():
+    embedding = MS2DeepScoreEmbedding(
+        vector=np.array([[0.6, 0.8]]),
+        spectrum_id="sp-0",
+        inchikey="BQJCRHHNABKAKU-KBQPJGBKSA-N",
+        normalized=True,
+    )
+
+    value = encode_embedding(embedding, run_id="run-1")
+    decoded = decode_embedding("sp-0", value)
+
+    assert isinstance(decoded, MS2DeepScoreEmbedding)
+    assert decoded.inchikey == "BQJCRHHNABKAKU-KBQPJGBKSA-N"
+    assert decoded.normalized
+    assert np.allclose(decoded.vector, [0.6, 0.8])
+    assert read_header(value)[:3] == (2, True, "run-1")
+
+
+@pytest.mark.parametrize("encode", [encode_embedding, pickle.dumps])
+def test_decode_vector_into(embedding, encode):
+    value = encode(embedding)
+    vectors = np.zeros((2, vector_dim(value)), dtype=np.float32)
+
+    normalized = decode_vector_into(value, vectors[1])
+
+    assert normalized
+    assert np.allclose(vectors, [[0, 0, 0], [0.6, 0.8, 0.0]])
@@ -1,5 +1,6 @@
 from pathlib import Path
 
+import numpy as np
 import pytest
 import requests_mock
 from drfs import DRPath
@@ -87,3 +88,14 @@ def test_read_from_file(tmpdir, fitted_spectrum_binner_path):
     obj = dgw.read_from_file(fitted_spectrum_binner_path)
 
     assert isinstance(obj, SpectrumBinner)
+
+
+def test_save_and_load_array(tmpdir):
+    path = f"{tmpdir}/array.npy"
+    fs_gtw = FSDataGateway()
+    fs_gtw.save_array(path, np.arange(10, dtype=np.int32))
+
+    array = fs_gtw.load_array(path)
+
+    assert isinstance(array, np.memmap)
+    np.testing.assert_array_equal(array, np.arange(10))
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from omigami.spectra_matching.storage.metadata_encoding import (
+    encode_metadata,
+    decode_metadata,
+)
+
+
+@pytest.fixture
+def metadata():
+    return {
+        "spectrum_id": "sp-0",
+        "compound_name": "Coproporphyrin I",
+        "precursor_mz": np.float64(655.27),
+        "charge": np.int64(1),
+        "fingerprint": np.array([0, 1, 1]),
+        "inchi": None,
+    }
+
+
+def test_encode_and_decode_metadata(metadata):
+    decoded = decode_metadata(encode_metadata(metadata))
+
+    assert decoded == {
+        "spectrum_id": "sp-0",
+        "compound_name": "Coproporphyrin I",
+        "precursor_mz": 655.27,
+        "charge": 1,
+        "fingerprint": [0, 1, 1],
+        "inchi": None,
+    }
+
+
+def test_decode_metadata_fields(metadata):
+    value = encode_metadata(metadata)
+
+    assert decode_metadata(value, ["compound_name", "smiles"]) == {
+        "compound_name": "Coproporphyrin I"
+    }
+    assert decode_metadata(value, []) == {}
+
+
+def test_encode_metadata_of_unknown_type(metadata):
+    with pytest.raises(TypeError):
+        encode_metadata({**metadata, "spectrum": object()})
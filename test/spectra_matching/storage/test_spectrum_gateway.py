@@ -1,11 +1,13 @@
 import os
 
+import numpy as np
 import pytest
 from matchms.Spectrum import Spectrum
 from matchms.importing.load_from_json import as_spectrum
 from pytest_redis import factories
 
 from omigami.config import SPECTRUM_ID_PRECURSOR_MZ_SORTED_SET, EMBEDDING_HASHES
+from omigami.spectra_matching.entities.embedding import Embedding
 from omigami.spectra_matching.spec2vec import SPEC2VEC_PROJECT_NAME
 from omigami.spectra_matching.storage import RedisSpectrumDataGateway
 
@@ -62,6 +64,36 @@ def test_read_spectra_ids_within_range(spectra_stored):
         )
 
 
+def test_get_spectrum_ids_within_ranges(spectra_stored):
+    dgw = RedisSpectrumDataGateway(_PROJECT)
+    min_mz = [300, 550, 800]
+    max_mz = [600, 700, 900]
+
+    index, starts, stops = dgw.get_spectrum_ids_within_ranges(min_mz, max_mz)
+
+    assert len(index) == len(set(index.spectrum_ids))
+    assert (np.diff(index.precursor_mz) >= 0).all()
+    for low, high, start, stop in zip(min_mz, max_mz, starts, stops):
+        assert set(index.spectrum_ids[start:stop]) == set(
+            dgw.get_spectrum_ids_within_range(low, high)
+        )
+
+
+def test_merge_ranges():
+    merged = RedisSpectrumDataGateway._merge_ranges([550, 300, 800], [700, 600, 900])
+
+    assert merged == [(300, 700), (800, 900)]
+
+
+def test_read_precursor_mz_index(spectra_stored, cleaned_data):
+    dgw = RedisSpectrumDataGateway(_PROJECT)
+
+    index = dgw.read_precursor_mz_index()
+
+    assert len(index) == len(cleaned_data)
+    assert (np.diff(index.precursor_mz) >= 0).all()
+
+
 def test_delete_spectrum_ids(spectra_stored):
     dgw = RedisSpectrumDataGateway(_PROJECT)
     stored_ids = dgw.list_spectrum_ids()
@@ -81,6 +113,30 @@ def test_write_raw_spectra(redis_db, raw_spectra):
     assert redis_db.zcard(SPECTRUM_ID_PRECURSOR_MZ_SORTED_SET) == len(db_entries)
 
 
+def test_read_spectra_metadata(redis_db, raw_spectra, spectra_stored, cleaned_data):
+    written_spectra = [as_spectrum(spectrum_data) for spectrum_data in raw_spectra[:3]]
+    stored_spectrum = cleaned_data[0]
+    dgw = RedisSpectrumDataGateway(_PROJECT)
+    dgw.write_raw_spectra(written_spectra)
+    spectrum_ids = [
+        spectrum.metadata["spectrum_id"]
+        for spectrum in written_spectra + [stored_spectrum]
+    ]
+
+    metadata = dgw.read_spectra_metadata(spectrum_ids + ["missing"])
+    compound_names = dgw.read_spectra_metadata(spectrum_ids, ["compound_name"])
+
+    assert set(metadata) == set(spectrum_ids)
+    assert metadata[spectrum_ids[0]]["compound_name"] == written_spectra[0].get(
+        "compound_name"
+    )
+    assert metadata[spectrum_ids[-1]] == stored_spectrum.metadata
+    for spectrum_id in spectrum_ids:
+        assert compound_names[spectrum_id] == {
+            "compound_name": metadata[spectrum_id]["compound_name"]
+        }
+
+
 def test_delete_embeddings(redis_db, ms2deepscore_embeddings_stored):
     dgw = RedisSpectrumDataGateway("ms2deepscore")
     hash_keys = redis_db.scan()[1]
@@ -95,3 +151,33 @@ def test_delete_embeddings(redis_db, ms2deepscore_embeddings_stored):
     # Test that the delete_embeddings method doesn't raise an error if the key is
     # not present in the DB anymore.
     dgw.delete_embeddings("positive")
+
+
+def test_read_embedding_matrix_binary(redis_db, spectra_stored):
+    dgw = RedisSpectrumDataGateway(_PROJECT, binary_embeddings=True)
+    index = dgw.read_precursor_mz_index()
+    embeddings = [
+        Embedding(vector=np.full(4, i, dtype=np.float64), spectrum_id=sp_id)
+        for i, sp_id in enumerate(index.spectrum_ids[:10])
+    ]
+
+    dgw.write_embeddings(embeddings, "positive", run_id="1")
+    embedding_matrix = dgw.read_embedding_matrix("positive", index)
+
+    assert embedding_matrix.spectrum_ids == index.spectrum_ids[:10]
+    assert embedding_matrix.vectors.dtype == np.float32
+    assert (embedding_matrix.vectors[3] == 3).all()
+    assert len(dgw.read_embeddings("positive")) == 10
+
+
+def test_embedding_generation_and_cached_responses(redis_db):
+    dgw = RedisSpectrumDataGateway(project=_PROJECT)
+    assert dgw.read_embedding_generation("positive") == 0
+
+    assert dgw.bump_embedding_generation("positive") == 1
+    dgw.write_cached_response("key", b"response", ttl=60)
+
+    assert dgw.read_embedding_generation("positive") == 1
+    assert dgw.read_embedding_generation("negative") == 0
+    assert dgw.read_cached_response("key") == b"response"
+    assert dgw.read_cached_response("other_key") is None
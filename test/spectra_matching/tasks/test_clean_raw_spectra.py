@@ -6,6 +6,7 @@ from matchms import Spectrum
 from matchms.importing.load_from_json import as_spectrum
 from prefect import Flow
 
+from omigami.spectra_matching.derivation_cache import DerivationCache
 from omigami.spectra_matching.storage import FSDataGateway
 from omigami.spectra_matching.tasks.clean_raw_spectra import (
     SpectrumCleaner,
@@ -109,3 +110,32 @@ def test_apply_ms2deepscore_filters_negative_intensity(
     spectrum.peaks = negative_peak
     spectrum = sc._filter_negative_intensities(spectrum)
     assert spectrum is None
+
+
+def test_clean_in_processes(raw_spectra):
+    params = CleanRawSpectraParameters("", n_processes=2, batch_size=15)
+    t = CleanRawSpectra(FSDataGateway(), params)
+
+    clean_spectra, filter_timings = t._clean_in_processes(raw_spectra)
+
+    expected_spectra = SpectrumCleaner().clean(raw_spectra)
+    assert [sp.metadata["spectrum_id"] for sp in clean_spectra] == [
+        sp.metadata["spectrum_id"] for sp in expected_spectra
+    ]
+    assert {"default_filters", "derive_inchikey_from_inchi"}.issubset(filter_timings)
+
+
+def test_clean_with_derivation_cache(raw_spectra):
+    derivation_cache = DerivationCache()
+    expected_spectra = SpectrumCleaner().clean(raw_spectra)
+
+    first_spectra = SpectrumCleaner(derivation_cache).clean(raw_spectra)
+    misses = derivation_cache.misses
+    cached_spectra = SpectrumCleaner(derivation_cache).clean(raw_spectra)
+
+    assert derivation_cache.misses == misses
+    assert derivation_cache.hits >= len(cached_spectra)
+    for spectra in [first_spectra, cached_spectra]:
+        assert [sp.metadata for sp in spectra] == [
+            sp.metadata for sp in expected_spectra
+        ]
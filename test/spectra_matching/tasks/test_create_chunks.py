@@ -2,6 +2,12 @@ import pytest
 from drfs.filesystems import get_fs
 from prefect import Flow
 
+from omigami.spectra_matching.spectra_manifest import (
+    SpectraManifest,
+    CONTENT_HASHES_FILE,
+    content_hash,
+    manifest_path,
+)
 from omigami.spectra_matching.storage import FSDataGateway
 from omigami.spectra_matching.tasks import CreateChunks, ChunkingParameters
 from test.spectra_matching.conftest import TEST_TASK_CONFIG, ASSETS_DIR
@@ -77,3 +83,85 @@ def test_chunk_gnps_data_consistency(
         chunked_ids += data_gtw.get_spectrum_ids(str(p))
 
     assert set(chunked_ids) == set(spectrum_ids_by_mode[ion_mode])
+
+
+def test_create_chunks_all_ion_modes_jsonl(
+    local_gnps_small_json,
+    clean_chunk_files,
+    spectrum_ids_by_mode,
+):
+    data_gtw = FSDataGateway()
+    output_directory = ASSETS_DIR / "raw" / "positive"
+    chunking_parameters = ChunkingParameters(
+        local_gnps_small_json,
+        str(output_directory),
+        150000,
+        "positive",
+        chunk_format="jsonl",
+        chunk_all_ion_modes=True,
+    )
+    t = CreateChunks(
+        data_gtw=data_gtw,
+        chunking_parameters=chunking_parameters,
+        **TEST_TASK_CONFIG,
+    )
+
+    chunk_paths = t.run()
+
+    assert all(path.endswith(".jsonl") for path in chunk_paths)
+    for ion_mode in ["positive", "negative"]:
+        directory = ASSETS_DIR / "raw" / ion_mode
+        paths = data_gtw.read_from_file(str(directory / "raw_chunk_paths.pickle"))
+
+        chunked_ids = []
+        for p in paths:
+            chunked_ids += [
+                spectrum["spectrum_id"] for spectrum in data_gtw.load_spectrum(p)
+            ]
+        assert chunked_ids == spectrum_ids_by_mode[ion_mode]
+
+
+def test_create_chunks_only_changed_spectra(
+    local_gnps_small_json, clean_chunk_files, raw_spectra, tmpdir
+):
+    data_gtw = FSDataGateway()
+    output_directory = ASSETS_DIR / "raw" / "positive"
+    positive_spectra = [
+        spectrum
+        for spectrum in raw_spectra
+        if spectrum["Ion_Mode"].lower() == "positive"
+    ]
+    previous_hashes = {
+        spectrum["spectrum_id"]: content_hash(spectrum)
+        for spectrum in positive_spectra[:40]
+    }
+    previous_hashes[positive_spectra[0]["spectrum_id"]] = "modified"
+    SpectraManifest(previous_hashes).save(
+        data_gtw, manifest_path(str(tmpdir), "positive")
+    )
+    chunking_parameters = ChunkingParameters(
+        local_gnps_small_json,
+        str(output_directory),
+        150000,
+        "positive",
+        manifest_directory=str(tmpdir),
+    )
+    t = CreateChunks(
+        data_gtw=data_gtw,
+        chunking_parameters=chunking_parameters,
+        **TEST_TASK_CONFIG,
+    )
+
+    chunk_paths = t._chunk_gnps(local_gnps_small_json)
+
+    chunked_ids = []
+    for p in chunk_paths["positive"]:
+        chunked_ids += data_gtw.get_spectrum_ids(p)
+    content_hashes = data_gtw.read_from_file(
+        str(output_directory / CONTENT_HASHES_FILE)
+    )
+    assert chunked_ids == [
+        spectrum["SpectrumID"]
+        for spectrum in positive_spectra[:1] + positive_spectra[40:]
+    ]
+    assert len(content_hashes) == len(positive_spectra)
@@ -0,0 +1,81 @@
+from unittest.mock import Mock
+
+from omigami.spectra_matching.derivation_cache import DerivationCache
+from omigami.spectra_matching.storage import FSDataGateway
+from omigami.spectra_matching.tasks import (
+    CleanRawSpectra,
+    CleanRawSpectraParameters,
+    MergeDerivationCache,
+)
+from omigami.spectra_matching.tasks.clean_raw_spectra import (
+    SpectrumCleaner,
+    new_derivations_directory,
+)
+
+
+def test_merge_derivation_cache(raw_spectra, tmpdir):
+    fs_dgw = FSDataGateway()
+    derivation_cache_path = f"{tmpdir}/derivation_cache.pickle"
+    previous_cache = DerivationCache()
+    previous_cache.put(("a", None, None), ("a", "A", "AA"))
+    previous_cache.save(fs_dgw, derivation_cache_path)
+    raw_paths = [f"{tmpdir}/raw/chunk_0.json", f"{tmpdir}/raw/chunk_1.json"]
+    chunks = dict(zip(raw_paths, [raw_spectra[:10], raw_spectra[10:]]))
+    fs_dgw.load_spectrum = Mock(side_effect=chunks.get)
+    parameters = CleanRawSpectraParameters(
+        f"{tmpdir}/cleaned",
+        derivation_cache_path=derivation_cache_path,
+        derivation_namespace="spec2vec/positive",
+    )
+    directory = new_derivations_directory(derivation_cache_path, "spec2vec/positive")
+
+    cleaned_paths = [
+        CleanRawSpectra(fs_dgw, parameters).run(path) for path in raw_paths
+    ]
+    chunk_files = fs_dgw.list_files(directory)
+    merged_paths = MergeDerivationCache(fs_dgw, parameters).run(cleaned_paths)
+
+    assert merged_paths == cleaned_paths
+    assert len(chunk_files) == 2
+    assert fs_dgw.list_files(directory) == []
+    chunk_entries = DerivationCache()
+    SpectrumCleaner(chunk_entries).clean(raw_spectra)
+    derivation_cache = DerivationCache.load(fs_dgw, derivation_cache_path)
+    assert len(derivation_cache) == len(chunk_entries) + 1
+    assert derivation_cache.get(("a", None, None)) == ("a", "A", "AA")
+
+
+def test_merge_derivation_cache_without_new_structures(tmpdir):
+    parameters = CleanRawSpectraParameters(
+        f"{tmpdir}/cleaned", derivation_cache_path=f"{tmpdir}/derivation_cache.pickle"
+    )
+
+    paths = MergeDerivationCache(FSDataGateway(), parameters).run(["chunk_0.pickle"])
+
+    assert paths == ["chunk_0.pickle"]
+    assert not FSDataGateway().exists(f"{tmpdir}/derivation_cache.pickle")
+
+
+def test_merge_derivation_cache_of_other_flow(raw_spectra, tmpdir):
+    fs_dgw = FSDataGateway()
+    derivation_cache_path = f"{tmpdir}/derivation_cache.pickle"
+    fs_dgw.load_spectrum = Mock(return_value=raw_spectra)
+    negative_parameters = CleanRawSpectraParameters(
+        f"{tmpdir}/cleaned/negative",
+        derivation_cache_path=derivation_cache_path,
+        derivation_namespace="spec2vec/negative",
+    )
+    positive_parameters = CleanRawSpectraParameters(
+        f"{tmpdir}/cleaned/positive",
+        derivation_cache_path=derivation_cache_path,
+        derivation_namespace="spec2vec/positive",
+    )
+    CleanRawSpectra(fs_dgw, negative_parameters).run(f"{tmpdir}/raw/chunk_0.json")
+
+    MergeDerivationCache(fs_dgw, positive_parameters).run([])
+
+    assert not fs_dgw.exists(derivation_cache_path)
+    negative_directory = new_derivations_directory(
+        derivation_cache_path, "spec2vec/negative"
+    )
+    assert len(fs_dgw.list_files(negative_directory)) == 1
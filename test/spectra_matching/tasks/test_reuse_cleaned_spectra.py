@@ -0,0 +1,46 @@
+from omigami.spectra_matching.spectra_manifest import (
+    SpectraManifest,
+    CONTENT_HASHES_FILE,
+    manifest_path,
+)
+from omigami.spectra_matching.storage import FSDataGateway
+from omigami.spectra_matching.tasks import (
+    ReuseCleanedSpectra,
+    ReuseCleanedSpectraParameters,
+)
+
+
+def test_reuse_cleaned_spectra(cleaned_data, tmpdir):
+    fs_dgw = FSDataGateway()
+    spectrum_ids = [sp.metadata["spectrum_id"] for sp in cleaned_data]
+    previous_paths = [f"{tmpdir}/previous/chunk_0.pickle"]
+    fs_dgw.serialize_to_file(previous_paths[0], cleaned_data)
+    previous_hashes = {spectrum_id: "hash" for spectrum_id in spectrum_ids}
+    SpectraManifest(previous_hashes, previous_paths).save(
+        fs_dgw, manifest_path(f"{tmpdir}/manifests", "positive")
+    )
+
+    # the first spectrum was modified and the second removed since the previous run
+    content_hashes = {spectrum_id: "hash" for spectrum_id in spectrum_ids[2:]}
+    content_hashes[spectrum_ids[0]] = "new hash"
+    fs_dgw.serialize_to_file(f"{tmpdir}/raw/{CONTENT_HASHES_FILE}", content_hashes)
+    new_paths = [f"{tmpdir}/cleaned/chunk_0.pickle"]
+    parameters = ReuseCleanedSpectraParameters(
+        raw_directory=f"{tmpdir}/raw",
+        output_directory=f"{tmpdir}/cleaned",
+        manifest_directory=f"{tmpdir}/manifests",
+        ion_mode="positive",
+    )
+
+    cleaned_paths = ReuseCleanedSpectra(fs_dgw, parameters).run(new_paths)
+
+    assert cleaned_paths == [f"{tmpdir}/cleaned/reused_chunk_0.pickle"] + new_paths
+    reused_ids = [
+        sp.metadata["spectrum_id"] for sp in fs_dgw.read_from_file(cleaned_paths[0])
+    ]
+    assert reused_ids == spectrum_ids[2:]
+    manifest = SpectraManifest.load(
+        fs_dgw, manifest_path(f"{tmpdir}/manifests", "positive")
+    )
+    assert manifest.content_hashes == content_hashes
+    assert manifest.cleaned_paths == cleaned_paths
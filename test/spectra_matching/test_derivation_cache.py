@@ -0,0 +1,45 @@
+from omigami.spectra_matching.derivation_cache import DerivationCache
+from omigami.spectra_matching.storage import FSDataGateway
+
+
+def test_derivation_cache_drops_least_recently_used():
+    cache = DerivationCache(max_size=2)
+    cache.put(("a", None, None), ("a", "A", "AA"))
+    cache.put(("b", None, None), ("b", "B", "BB"))
+    cache.get(("a", None, None))
+    cache.put(("c", None, None), ("c", "C", "CC"))
+
+    assert cache.get(("b", None, None)) is None
+    assert cache.get(("a", None, None)) == ("a", "A", "AA")
+    assert len(cache) == 2
+    assert cache.hits == 2
+    assert cache.misses == 1
+    assert cache.hit_rate == 2 / 3
+
+
+def test_derivation_cache_merge():
+    worker_cache = DerivationCache()
+    worker_cache.put(("a", None, None), ("a", "A", "AA"))
+    cache = DerivationCache()
+
+    cache.merge(worker_cache.pop_new_entries(), hits=3, misses=1)
+
+    assert cache.get(("a", None, None)) == ("a", "A", "AA")
+    assert worker_cache.pop_new_entries() == {}
+    assert cache.hits == 4
+    assert cache.misses == 1
+
+
+def test_derivation_cache_save_and_load(tmpdir):
+    fs_dgw = FSDataGateway()
+    path = f"{tmpdir}/derivation_cache.pickle"
+    cache = DerivationCache()
+    cache.put(("a", None, None), ("a", "A", "AA"))
+    cache.put(("b", None, None), ("b", "B", "BB"))
+
+    cache.save(fs_dgw, path)
+    loaded_cache = DerivationCache.load(fs_dgw, path, max_size=1)
+
+    assert len(loaded_cache) == 1
+    assert loaded_cache.get(("b", None, None)) == ("b", "B", "BB")
+    assert len(DerivationCache.load(fs_dgw, f"{tmpdir}/missing.pickle")) == 0
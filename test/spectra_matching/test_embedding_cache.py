@@ -0,0 +1,82 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from omigami.spectra_matching.embedding_cache import EmbeddingCache, query_key
+from omigami.spectra_matching.entities.embedding import Embedding
+
+
+def _embedding(spectrum_id: str, size: int = 4) -> Embedding:
+    return Embedding(vector=np.zeros(size, dtype=np.float64), spectrum_id=spectrum_id)
+
+
+def test_query_key():
+    data = {"peaks_json": [[80.0, 1.0], [90.5, 0.2]], "Precursor_MZ": "100.0"}
+
+    key = query_key(data, "run_1")
+
+    assert key == query_key(
+        {"peaks_json": "[[90.5, 0.2], [80.0, 1.0]]", "Precursor_MZ": 100.0}, "run_1"
+    )
+    assert key != query_key(data, "run_2")
+    assert key != query_key({**data, "Precursor_MZ": "100.1"}, "run_1")
+    assert key != query_key({**data, "peaks_json": [[80.0, 1.0]]}, "run_1")
+    assert query_key({"peaks_json": "[[80.0,", "Precursor_MZ": "1"}, "run_1") is None
+    assert query_key({"peaks_json": [[80.0, 1.0]]}, "run_1") is None
+
+
+def test_embedding_cache_drops_least_recently_used():
+    cache = EmbeddingCache(max_size=2)
+    cache.put("a", _embedding("a"))
+    cache.put("b", _embedding("b"))
+    cache.get("a")
+    cache.put("c", _embedding("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a").spectrum_id == "a"
+    assert len(cache) == 2
+    assert cache.hits == 2
+    assert cache.misses == 1
+    assert cache.hit_rate == 2 / 3
+
+
+def test_embedding_cache_max_bytes():
+    cache = EmbeddingCache(max_bytes=70)
+    cache.put("a", _embedding("a"))
+    cache.put("b", _embedding("b"))
+    cache.put("c", _embedding("c"))
+    cache.put("d", _embedding("d", size=100))
+
+    assert cache.get("a") is None
+    assert cache.get("b").spectrum_id == "b"
+    assert cache.get("c").spectrum_id == "c"
+    assert cache.get("d") is None
+    assert cache.n_bytes == 2 * (4 * 8 + 1)
+
+
+def test_embedding_cache_threads():
+    cache = EmbeddingCache(max_size=50)
+
+    def put_and_get(i):
+        cache.put(str(i % 100), _embedding(str(i % 100)))
+        cache.get(str(i % 100))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(put_and_get, range(2000)))
+
+    assert len(cache) == 50
+    assert cache.n_bytes == 50 * (4 * 8) + sum(len(key) for key in cache._entries)
+    assert cache.hits + cache.misses == 2000
+
+
+def test_pickled_embedding_cache_is_empty():
+    cache = EmbeddingCache(max_size=2)
+    cache.put("a", _embedding("a"))
+
+    loaded_cache = pickle.loads(pickle.dumps(cache))
+
+    assert len(loaded_cache) == 0
+    assert loaded_cache.max_size == 2
+    loaded_cache.put("a", _embedding("a"))
+    assert loaded_cache.get("a").spectrum_id == "a"
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from omigami.spectra_matching.embedding_index import EmbeddingIndex, recall
+from omigami.spectra_matching.entities.embedding import EmbeddingMatrix
+from omigami.spectra_matching.top_k_scorer import TopKScorer
+
+
+@pytest.fixture
+def embeddings():
+    rng = np.random.default_rng(42)
+    vectors = rng.random((500, 16)).astype(np.float32)
+    vectors[3] = 0  # zero vectors have an undefined score
+    return EmbeddingMatrix(
+        vectors=vectors,
+        spectrum_ids=[f"sp-{i}" for i in range(len(vectors))],
+        precursor_mz=np.linspace(100, 600, len(vectors)),
+    )
+
+
+@pytest.fixture
+def queries():
+    return np.random.default_rng(0).random((20, 16))
+
+
+def test_build(embeddings):
+    index = EmbeddingIndex.build(embeddings, n_lists=10)
+
+    assert len(index) == len(embeddings)
+    assert index.n_lists == 10
+    assert index.list_offsets[-1] == len(embeddings)
+    assert sorted(index.spectrum_ids) == sorted(embeddings.spectrum_ids)
+    assert np.allclose(np.linalg.norm(index.centroids, axis=1), 1, atol=1e-5)
+    assert index.generation is None
+    assert EmbeddingIndex.build(embeddings, generation=3).generation == 3
+
+
+def test_search_all_lists_is_exact(embeddings, queries):
+    index = EmbeddingIndex.build(embeddings, n_lists=10)
+
+    approximate = index.search(queries, 5, n_probe=10)
+    exact = TopKScorer().top_k(embeddings.vectors, queries, 5)
+
+    for (rows, scores), (exact_rows, exact_scores) in zip(approximate, exact):
+        assert [index.spectrum_ids[row] for row in rows] == [
+            embeddings.spectrum_ids[row] for row in exact_rows
+        ]
+        assert np.allclose(scores, exact_scores, atol=1e-5)
+        assert "sp-3" not in [index.spectrum_ids[row] for row in rows]
+
+
+def test_search_precursor_mz_filter(embeddings, queries):
+    index = EmbeddingIndex.build(embeddings, n_lists=10)
+    min_mz = np.full(len(queries), 200.0)
+    max_mz = np.full(len(queries), 250.0)
+
+    results = index.search(queries, 5, n_probe=3, min_mz=min_mz, max_mz=max_mz)
+
+    for rows, _ in results:
+        assert (
+            (index.precursor_mz[rows] >= 200) & (index.precursor_mz[rows] <= 250)
+        ).all()
+
+
+def test_build_empty():
+    embeddings = EmbeddingMatrix(
+        vectors=np.empty((0, 4), dtype=np.float32),
+        spectrum_ids=[],
+        precursor_mz=np.empty(0),
+    )
+
+    index = EmbeddingIndex.build(embeddings)
+
+    assert len(index) == 0
+    assert len(index.search(np.ones((2, 4)), 5)[1][0]) == 0
+
+
+def test_recall():
+    assert recall([["a", "b"], ["c"]], [["a", "x"], ["c"]]) == pytest.approx(2 / 3)
+    assert recall([[]], [[]]) is None
@@ -0,0 +1,108 @@
+import pickle
+from unittest.mock import MagicMock
+
+from omigami.spectra_matching.predictor import Predictor
+from omigami.spectra_matching.response_cache import (
+    ResponseCache,
+    make_response_cache,
+    response_key,
+)
+
+DATA_INPUT = [{"peaks_json": [[80.0, 1.0]], "Precursor_MZ": "100.0"}]
+MATCHES = {"spectrum-0": {"CCMSLIB00000001": {"score": 0.9}}}
+
+
+class FakeRedis:
+    def __init__(self):
+        self.responses = {}
+
+    def read_cached_response(self, key):
+        return self.responses.get(key)
+
+    def write_cached_response(self, key, response, ttl):
+        self.responses[key] = response
+
+
+def test_response_key():
+    key = response_key(DATA_INPUT, {"n_best_spectra": 5}, 1, "run_1", 0)
+
+    assert key == response_key(DATA_INPUT, {"n_best_spectra": 5}, 1, "run_1", 0)
+    assert key != response_key(DATA_INPUT, {"n_best_spectra": 6}, 1, "run_1", 0)
+    assert key != response_key(DATA_INPUT, {"n_best_spectra": 5}, 2, "run_1", 0)
+    assert key != response_key(DATA_INPUT, {"n_best_spectra": 5}, 1, "run_2", 0)
+    assert key != response_key(DATA_INPUT, {"n_best_spectra": 5}, 1, "run_1", 1)
+
+
+def test_response_cache_returns_copies():
+    cache = ResponseCache(max_size=1)
+    cache.put("a", MATCHES, dgw=None)
+
+    response = cache.get("a", dgw=None)
+    response["spectrum-0"].clear()
+
+    assert cache.get("a", dgw=None) == MATCHES
+    assert cache.get("b", dgw=None) is None
+    assert cache.hits == 2
+    assert cache.misses == 1
+
+
+def test_response_cache_redis_tier():
+    dgw = FakeRedis()
+    ResponseCache(redis_ttl=60).put("a", MATCHES, dgw)
+    cache = ResponseCache(redis_ttl=60)
+
+    assert cache.get("a", dgw) == MATCHES
+    assert len(cache) == 1
+    assert ResponseCache().get("a", dgw) is None
+
+
+def test_make_response_cache():
+    assert make_response_cache(0) is None
+    assert make_response_cache(0, redis_ttl=60).redis_ttl == 60
+    assert make_response_cache(10).max_size == 10
+
+
+def test_pickled_response_cache_is_empty():
+    cache = ResponseCache(max_size=2, redis_ttl=60)
+    cache.put("a", MATCHES, FakeRedis())
+
+    loaded_cache = pickle.loads(pickle.dumps(cache))
+
+    assert len(loaded_cache) == 0
+    assert loaded_cache.redis_ttl == 60
+
+
+def test_predict_with_cache_invalidated_by_embedding_generation():
+    dgw = MagicMock()
+    dgw.read_embedding_generation.return_value = 0
+    predictor = Predictor(dgw, response_cache=ResponseCache())
+    predictor.ion_mode = "positive"
+    predictor.set_run_id("run_1")
+    predict = MagicMock(return_value=MATCHES)
+
+    for _ in range(2):
+        predictor._predict_with_cache(DATA_INPUT, {}, 1, predict)
+    dgw.read_embedding_generation.return_value = 1
+    matches = predictor._predict_with_cache(DATA_INPUT, {}, 1, predict)
+
+    assert matches == MATCHES
+    assert predict.call_count == 2
+    dgw.read_embedding_generation.assert_called_with("positive")
+
+
+def test_predict_reloads_preloaded_embeddings_of_new_generation():
+    dgw = MagicMock()
+    dgw.read_embedding_generation.return_value = 0
+    dgw.read_embedding_matrix.side_effect = ["embeddings_0", "embeddings_1"]
+    predictor = Predictor(dgw, response_cache=ResponseCache())
+    predictor.ion_mode = "positive"
+    predictor.set_run_id("run_1")
+    predictor._load_reference_embeddings(0)
+
+    predictor._predict_with_cache(DATA_INPUT, {}, 1, MagicMock(return_value=MATCHES))
+    assert predictor.reference_embeddings == "embeddings_0"
+    dgw.read_embedding_generation.return_value = 1
+    predictor._predict_with_cache(DATA_INPUT, {}, 1, MagicMock(return_value=MATCHES))
+
+    assert predictor.reference_embeddings == "embeddings_1"
+    assert dgw.read_embedding_matrix.call_count == 2
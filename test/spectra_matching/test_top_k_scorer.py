@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from omigami.spectra_matching.top_k_scorer import TopKScorer
+
+
+@pytest.fixture
+def references():
+    rng = np.random.default_rng(42)
+    references = rng.random((200, 8))
+    references[7] = 0  # zero vectors have an undefined score
+    return references
+
+
+@pytest.fixture
+def queries():
+    return np.random.default_rng(0).random((30, 8))
+
+
+def _expected_top_k(references, query, n_best, start, stop):
+    references = references[start:stop]
+    norms = np.linalg.norm(references, axis=1) * np.linalg.norm(query)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = references @ query / norms
+    rows = [row for row in np.argsort(-scores) if not np.isnan(scores[row])]
+    return np.array(rows[:n_best], dtype=int) + start
+
+
+@pytest.mark.parametrize(
+    "scorer",
+    [TopKScorer(), TopKScorer(max_block_queries=4, max_block_elements=500)],
+)
+def test_top_k_within_windows(scorer, references, queries):
+    starts = np.arange(len(queries)) * 5
+    stops = starts + 40
+
+    top_k = scorer.top_k(references, queries, 5, starts, stops)
+
+    for query, start, stop, (rows, scores) in zip(queries, starts, stops, top_k):
+        expected_rows = _expected_top_k(references, query, 5, start, stop)
+        assert list(rows) == list(expected_rows)
+        assert np.all((rows >= start) & (rows < stop))
+        assert np.all(np.diff(scores) <= 0)
+
+
+def test_top_k_all_references(references, queries):
+    top_k = TopKScorer().top_k(references, queries, 3)
+
+    for query, (rows, scores) in zip(queries, top_k):
+        expected_rows = _expected_top_k(references, query, 3, 0, len(references))
+        assert list(rows) == list(expected_rows)
+        assert 7 not in rows
+
+
+def test_top_k_small_and_empty_windows(references, queries):
+    starts = np.array([5, 7, 10])
+    stops = np.array([8, 8, 10])
+
+    top_k = TopKScorer().top_k(references, queries[:3], 10, starts, stops)
+
+    assert sorted(top_k[0][0]) == [5, 6]
+    assert len(top_k[1][0]) == 0
+    assert len(top_k[2][0]) == 0